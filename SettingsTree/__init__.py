@@ -29,872 +29,6743 @@ import posixpath
 import collections
 import numbers
 import inspect
+import weakref
+import re
+import fnmatch
+import bisect
+import array
 
 if sys.hexversion >= 0x2070000:
     from collections import OrderedDict
 else:
     from ordereddict import OrderedDict
 
+# The abstract base classes are in collections.abc in Python >= 3.3
+# (and only there in Python >= 3.10).
+try:
+    from collections.abc import Iterable, Mapping
+except ImportError:
+    from collections import Iterable, Mapping
+
+# Read-only views of dict are only available in Python >= 3.3 (dict
+# values can't be frozen without them).
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = None
+
+# dict keeps the order things were put in it in Python >= 3.7, so it is
+# used instead of the larger OrderedDict for the children of a Tree.
+if sys.hexversion >= 0x3070000:
+    _ordered_dict = dict
+else:
+    _ordered_dict = OrderedDict
+
+# The extra parameters of a Leaf or Tree are only allocated when one is
+# first set. Until then, this empty read-only mapping stands in for
+# them.
+if MappingProxyType is not None:
+    _no_extra_parameters = MappingProxyType(dict())
+else:
+    _no_extra_parameters = dict()
+
+
+class _SharedDict(dict):
+    """ Extra parameters shared by more than one Leaf or Tree.
+
+    Made by ``Tree.dedupe``. It must not be changed. The ``Leaf`` or
+    ``Tree`` that has it replaces it with a ``dict`` copy of it before
+    changing its extra parameters (see ``_writable_extra_parameters``).
+    Copies and pickles of it are plain ``dict``.
+
+    """
+    def __reduce_ex__(self, protocol):
+        return (dict, (dict(self), ))
+
+
+def _writable_extra_parameters(node):
+    """ Gets the extra parameters of a Leaf or Tree to change them.
+
+    They are made if there aren't any yet and copied if they are shared
+    (see ``_SharedDict``).
+
+    """
+    extra = node._extra_parameters
+    if extra is None:
+        extra = dict()
+        node._extra_parameters = extra
+    elif type(extra) is _SharedDict:
+        extra = dict(extra)
+        node._extra_parameters = extra
+    return extra
+
+
+def _extra_id(extra):
+    """ Gets what identifies the extra parameters of a Leaf or Tree.
+
+    Used by ``Tree.dedupe`` once those that are the same have been made
+    the same object, so it is their id unless there aren't any.
+
+    """
+    if extra is None:
+        return None
+    elif len(extra) == 0:
+        return ()
+    return id(extra)
+
+# numpy is optional. It is only needed to store numpy arrays without
+# copying them on every get and to compare them.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+#: Information on the path cache returned by ``path_cache_info``.
+PathCacheInfo = collections.namedtuple('PathCacheInfo',
+                                       ['hits', 'misses', 'maxsize',
+                                        'currsize'])
+
+
+#: What is returned by ``Tree.memory_usage``.
+MemoryUsage = collections.namedtuple('MemoryUsage',
+                                     ['total', 'nodes', 'values',
+                                      'constraints', 'extra_parameters',
+                                      'leaves', 'trees', 'value_types',
+                                      'subtrees'])
+
+
+class _PathCache(object):
+    """ Bounded LRU cache of parsed POSIX paths.
+
+    Parsing a path (normalizing it, stripping the leading ``'/'`` and
+    splitting it into its parts) is done on every access by path, but
+    the same few paths tend to be used over and over again. So, the
+    parsed forms are cached by the path ``str`` with the least recently
+    used ones discarded once there are more than `maxsize` of them.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of parsed paths to keep.
+
+    Attributes
+    ----------
+    maxsize : int
+    hits : int
+        The number of paths that were found in the cache.
+    misses : int
+        The number of paths that had to be parsed.
+
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def parse(self, path):
+        """ Parses a path, using the cached result if there is one.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path.
+
+        Returns
+        -------
+        key : str
+            The normalized absolute path with a single leading ``'/'``
+            and no trailing ``'/'`` (``'/'`` for the root).
+        names : tuple of str
+            The names of each part of the path in order (empty for the
+            root).
+        trailing : bool
+            Whether `path` has a trailing ``'/'``.
+        is_root : bool
+            Whether `path` points to the root.
+
+        """
+        try:
+            parsed = self._cache[path]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            try:
+                _move_to_end(self._cache, path)
+            except KeyError:
+                pass
+            return parsed
+
+        self.misses += 1
+        spath = posixpath.normpath(path).lstrip(posixpath.sep)
+        if spath in ('', '.'):
+            names = ()
+        else:
+            names = tuple(spath.split(posixpath.sep))
+        parsed = (posixpath.sep + posixpath.sep.join(names), names,
+                  path.endswith(posixpath.sep), len(names) == 0)
+        if self.maxsize > 0:
+            self._cache[path] = parsed
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        """ Empties the cache and resets the counters."""
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        """ Returns the counters and sizes as a ``PathCacheInfo``."""
+        return PathCacheInfo(self.hits, self.misses, self.maxsize,
+                             len(self._cache))
+
+
+if hasattr(OrderedDict, 'move_to_end'):
+    def _move_to_end(d, key):
+        d.move_to_end(key)
+else:
+    def _move_to_end(d, key):
+        d[key] = d.pop(key)
+
+
+_path_cache = _PathCache(maxsize=4096)
+_parse_path = _path_cache.parse
+
+# The paths to everything nested in the Tree at a path are all those
+# starting with it followed by a '/', which when sorted are all those
+# from that up to (but not including) it followed by this character.
+_after_sep = chr(ord(posixpath.sep) + 1)
+
+
+def path_cache_info():
+    """ Returns information on the cache of parsed paths.
+
+    All access by path (``Tree`` get, set, delete, membership, etc.)
+    parses the path through a bounded LRU cache shared by all of them.
+
+    Returns
+    -------
+    info : PathCacheInfo
+        The number of hits and misses since the cache was last
+        cleared, the maximum number of paths kept (`maxsize`), and the
+        number currently kept (`currsize`).
+
+    See Also
+    --------
+    clear_path_cache
+    set_path_cache_size
+
+    """
+    return _path_cache.info()
+
+
+def clear_path_cache():
+    """ Empties the cache of parsed paths and resets its counters.
+
+    See Also
+    --------
+    path_cache_info
+
+    """
+    _path_cache.clear()
+
+
+def set_path_cache_size(maxsize):
+    """ Sets the maximum number of parsed paths that are cached.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of paths to keep. ``0`` disables caching.
+
+    Raises
+    ------
+    TypeError
+        If `maxsize` is not an ``int``.
+    ValueError
+        If `maxsize` is negative.
+
+    See Also
+    --------
+    path_cache_info
+
+    """
+    if not isinstance(maxsize, numbers.Integral) \
+            or isinstance(maxsize, bool):
+        raise TypeError('maxsize must be an int.')
+    if maxsize < 0:
+        raise ValueError('maxsize must be non-negative.')
+    _path_cache.maxsize = maxsize
+    while len(_path_cache._cache) > maxsize:
+        _path_cache._cache.popitem(last=False)
+
+
+# Every time a Tree with children is put into or removed from another
+# Tree, the paths of everything nested in it change. Rather than going
+# through all of them, a counter in the root Tree it was in is
+# incremented which makes the paths cached by everything in that root
+# Tree (see _locate) stale. The copy policies that apply to everything
+# nested in it are cached along with them (see _resolve_copy_policy),
+# so it is also incremented when the copy policy of a Tree with
+# children is set.
+def _moved(node, root):
+    """ Marks that a Tree or Leaf is being put into or removed from a Tree.
+
+    Parameters
+    ----------
+    node : Tree or Leaf
+        The ``Tree`` or ``Leaf``.
+    root : Tree or None
+        The root ``Tree`` it was in before (`node` itself if it was a
+        root ``Tree``), or ``None`` if there wasn't one.
+
+    """
+    node._path_cache = None
+    if root is not None and isinstance(node, Tree) \
+            and len(node._children) != 0:
+        root._moves += 1
+
+
+# A Tree or Leaf can be put in a second place (in the same Tree or
+# another one) while still being in the first. Its parent is then the
+# last place it was put in, and the others are kept (as weak references
+# to the Tree and the names in them) in _others until it is removed from
+# them. A change in it (or in anything nested in it) is then made in
+# every root Tree it is in (see _places), throwing away the indices of
+# those that have it in a place other than the one their index is kept
+# up to date for (they are rebuilt when next needed).
+def _parents(node):
+    """ Gets every Tree a Tree or Leaf is in and the names it has there.
+
+    Returns
+    -------
+    parents : list of tuple
+        ``(tree, name)`` for each place, the one that is its parent
+        first. Places it is no longer in are forgotten.
+
+    """
+    parents = []
+    if node._parent is not None:
+        parent = node._parent()
+        if parent is not None \
+                and parent._children.get(node._name) is node:
+            parents.append((parent, node._name))
+    if node._others is not None:
+        others = [(ref, name) for ref, name in node._others
+                  if ref() is not None
+                  and ref()._children.get(name) is node]
+        node._others = others or None
+        parents.extend([(ref(), name) for ref, name in others])
+    return parents
+
+
+def _places(node):
+    """ Gets every place a Tree or Leaf is in.
+
+    Only follows the parents up (O(1) amortized, see ``_locate``)
+    unless it or a ``Tree`` it is nested in is in more than one place.
+
+    Returns
+    -------
+    places : list of tuple
+        ``(root, path)`` for each root ``Tree`` `node` is in (`node`
+        itself for a root ``Tree``) and the absolute POSIX path to it
+        there (a root ``Tree`` can be in it more than once). It is
+        empty for a ``Leaf`` that is not in a ``Tree``.
+
+    """
+    root, path = _locate(node)
+    if root is None:
+        return []
+    if not node._path_cache[3]:
+        return [(root, path)]
+    places = []
+    stack = [(node, [])]
+    while len(stack) != 0:
+        child, names = stack.pop()
+        parents = _parents(child)
+        if len(parents) == 0:
+            if isinstance(child, Tree):
+                places.append((child, posixpath.sep
+                               + posixpath.sep.join(reversed(names))))
+            continue
+        for parent, name in parents:
+            stack.append((parent, names + [name]))
+    return places
+
+
+def _nested_in(tree, node):
+    """ Checks if a Tree is or is nested in a Tree (in any place).
+
+    Returns
+    -------
+    nested : bool
+        Whether `tree` is `node` or is nested in it.
+
+    """
+    stack = [tree]
+    while len(stack) != 0:
+        child = stack.pop()
+        if child is node:
+            return True
+        stack.extend([parent for parent, name in _parents(child)])
+    return False
+
+
+def _fix_parent(node):
+    """ Makes another place a Tree or Leaf is in its parent if it can.
+
+    Used when the parent of `node` no longer exists or no longer has it
+    as a child (it was copied with `node` in it).
+
+    Returns
+    -------
+    fixed : bool
+        Whether `node` is in another place, which is now its parent.
+
+    """
+    node._parent = None
+    node._name = None
+    if node._others is None:
+        return False
+    parents = _parents(node)
+    if len(parents) == 0:
+        return False
+    node._parent = weakref.ref(parents[0][0])
+    node._name = parents[0][1]
+    node._others = [(weakref.ref(p), k) for p, k in parents[1:]] or None
+    return True
+
+
+def _add_place(node, tree, name):
+    """ Makes a Tree or Leaf a child of a Tree.
+
+    It becomes the parent of `node` (with the name `name`). If `node` is
+    still in the place it was in before, it is kept as another place it
+    is in (see ``_others``), unless `node` is an interned ``Tree`` (see
+    ``_is_interned``) that is still in it. Since an interned ``Tree``
+    can't change, nothing has to be done in the other places it is in,
+    so they aren't kept track of (there can be very many of them).
+
+    """
+    if isinstance(node, Tree) and node._interned == 2 \
+            and len(_parents(node)) != 0:
+        return
+    others = [(ref, k) for ref, k in (node._others or ())
+              if ref() is not None and (ref() is not tree or k != name)]
+    if node._parent is not None:
+        parent = node._parent()
+        if parent is not None \
+                and parent._children.get(node._name) is node \
+                and (parent is not tree or node._name != name):
+            others.append((node._parent, node._name))
+    node._others = others or None
+    node._parent = weakref.ref(tree)
+    node._name = name
+
+
+# Identical subtrees are made into a single shared Tree by Tree.dedupe,
+# which is then in many places. Unlike a Tree put in more than one place
+# by hand, it can't be changed (it is interned) and only its parent is
+# kept track of (see _add_place). A change by path first gives the
+# place being changed its own copy of it (see Tree._unshare). Every
+# Tree it is nested in is marked as maybe having interned ones in it,
+# so that Trees that don't skip looking for them. _interned is 0 for a
+# Tree with nothing interned in it, 1 for one that may have, and 2 for
+# an interned one.
+def _is_interned(node):
+    """ Checks if a Tree or Leaf can't be changed since it is shared.
+
+    A ``Leaf`` is interned if it is in an interned ``Tree``.
+
+    """
+    if isinstance(node, Tree):
+        return node._interned == 2
+    if node._others is None:
+        if node._parent is None:
+            return False
+        parent = node._parent()
+        return parent is not None and parent._interned == 2 \
+            and parent._children.get(node._name) is node
+    return any([tree._interned == 2 for tree, name in _parents(node)])
+
+
+def _intern(tree):
+    """ Marks a Tree and every Tree nested in it as interned."""
+    stack = [tree]
+    while len(stack) != 0:
+        node = stack.pop()
+        node._interned = 2
+        stack.extend([v for v in node._children.values()
+                      if isinstance(v, Tree) and v._interned != 2])
+
+
+def _mark_interned_above(tree):
+    """ Marks a Tree and those it is nested in as maybe having interned.
+
+    Stops at those already marked since everything they are nested in
+    is then too.
+
+    """
+    stack = [tree]
+    while len(stack) != 0:
+        node = stack.pop()
+        if node._interned == 0:
+            node._interned = 1
+            stack.extend([parent for parent, name in _parents(node)])
+
+
+def _slots(cls):
+    """ Gets the names of all the slots of a class and its bases.
+
+    ``'__weakref__'`` and ``'__dict__'`` are not included.
+
+    """
+    names = _slots_cache.get(cls)
+    if names is None:
+        names = []
+        for c in reversed(cls.__mro__):
+            slots = c.__dict__.get('__slots__', ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            names.extend([k for k in slots
+                          if k not in ('__weakref__', '__dict__')])
+        names = tuple(names)
+        _slots_cache[cls] = names
+    return names
+
+
+_slots_cache = dict()
+
+
+def _get_attributes(obj):
+    """ Gets a ``dict`` of all the attributes of an object with slots.
+
+    Includes those in its ``__dict__`` if it has one (a subclass without
+    ``__slots__``).
+
+    """
+    state = dict()
+    for k in _slots(type(obj)):
+        if hasattr(obj, k):
+            state[k] = getattr(obj, k)
+    state.update(getattr(obj, '__dict__', ()))
+    return state
+
+
+def _set_attributes(obj, state):
+    """ Sets the attributes of an object with slots from a ``dict``."""
+    for k, v in state.items():
+        setattr(obj, k, v)
+
+
+# Every snapshot (see Tree.snapshot) gets the next generation number.
+# The first time a Tree or Leaf is changed after a snapshot is taken,
+# what it was is saved in its history (see _changing) if a snapshot
+# that is still around could need it. Only snapshots of the root Tree
+# it is in (or of a Tree in it) can, which that root Tree keeps track
+# of (see _SnapshotClock). The generations of all the snapshots still
+# around are also kept sorted.
+_snapshot_gen = 0
+_live_snapshot_gens = []
+_snapshot_refs = dict()
+
+
+def _insort_gen(gens, gen):
+    """ Puts a generation into a sorted list of them."""
+    bisect.insort(gens, gen)
+
+
+def _remove_gen(gens, gen):
+    """ Removes a generation from a sorted list of them if it is there.
+    """
+    i = bisect.bisect_left(gens, gen)
+    if i < len(gens) and gens[i] == gen:
+        del gens[i]
+
+
+def _gens_need(gens, lo, hi):
+    """ Checks if any of the sorted generations are in ``(lo, hi]``."""
+    i = bisect.bisect_right(gens, lo)
+    return i < len(gens) and gens[i] <= hi
+
+
+class _SnapshotClock(object):
+    """ The snapshots still around of one root Tree or what is in it.
+
+    Kept by the root ``Tree`` (made when the first snapshot is taken).
+    When the root ``Tree`` is put into another ``Tree``, it is merged
+    into the one of the new root ``Tree``.
+
+    Attributes
+    ----------
+    gens : list of int
+        The sorted generations of the snapshots still around.
+    nodes : weakref.WeakSet
+        The ``Tree`` and ``Leaf`` whose history has anything for them.
+    merged : _SnapshotClock or None
+        The one it was merged into, if it was.
+
+    """
+    __slots__ = ('gens', 'nodes', 'merged')
+
+    def __init__(self):
+        self.gens = []
+        self.nodes = weakref.WeakSet()
+        self.merged = None
+
+    def current(self):
+        """ Gets the one it was merged into (or itself if it wasn't)."""
+        clock = self
+        while clock.merged is not None:
+            clock = clock.merged
+        return clock
+
+    def needs(self, lo, hi):
+        """ Checks if any snapshot still around is in ``(lo, hi]``."""
+        return _gens_need(self.gens, lo, hi)
+
+    def merge_into(self, clock):
+        """ Merges it into another one."""
+        for gen in self.gens:
+            _insort_gen(clock.gens, gen)
+        clock.nodes |= self.nodes
+        self.gens = []
+        self.nodes = weakref.WeakSet()
+        self.merged = clock
+
+
+class _SnapshotGeneration(object):
+    """ Keeps a generation of snapshots alive while it is referenced.
+
+    Every ``TreeSnapshot`` of the same generation holds the same one.
+    When it is garbage collected, the histories of the ``Tree`` and
+    ``Leaf`` stop keeping what they were for that generation.
+
+    Parameters
+    ----------
+    clock : _SnapshotClock
+        That of the root ``Tree`` the snapshot is taken in.
+
+    """
+    def __init__(self, clock):
+        global _snapshot_gen
+        _snapshot_gen += 1
+        self.gen = _snapshot_gen
+        _live_snapshot_gens.append(self.gen)
+        clock.gens.append(self.gen)
+        _snapshot_refs[self.gen] = weakref.ref(
+            self, lambda ref, gen=self.gen: _snapshot_gone(gen, clock))
+
+
+def _snapshot_gone(gen, clock):
+    """ Forgets a generation of snapshots that is no longer around.
+
+    Only the histories of the ``Tree`` and ``Leaf`` that saved anything
+    for the snapshots of the same root ``Tree`` are pruned.
+
+    """
+    _snapshot_refs.pop(gen, None)
+    _remove_gen(_live_snapshot_gens, gen)
+    clock = clock.current()
+    _remove_gen(clock.gens, gen)
+    for node in list(clock.nodes):
+        if _prune_history(node):
+            clock.nodes.discard(node)
+
+
+def _snapshot_needs(lo, hi):
+    """ Checks if any snapshot still around is in ``(lo, hi]``."""
+    return _gens_need(_live_snapshot_gens, lo, hi)
+
+
+def _prune_history(node):
+    """ Removes what no snapshot still around needs from a history.
+
+    Returns whether the history is now empty.
+
+    """
+    history = [r for r in (node._history or ())
+               if _snapshot_needs(r[0], r[1])]
+    if len(history) == 0:
+        node._history = None
+        return True
+    node._history = history
+    return False
+
+
+class _Validation(object):
+    """ What a root Tree keeps for validating incrementally.
+
+    See ``Tree.find_invalids``. The paths are absolute POSIX paths in
+    the root ``Tree``.
+
+    Attributes
+    ----------
+    invalids : set of str
+        The paths to every ``Leaf`` that was invalid when last checked.
+    dirty : set of str
+        The paths to every ``Leaf`` that was changed or put in since
+        the last validation.
+    removed : set of str
+        The paths to everything removed since the last validation.
+    functions : set of str
+        The paths to every ``Leaf`` that had a validator function
+        without declared dependencies (see ``Leaf.depends_on``) when
+        last checked, which are always checked again since they can
+        depend on any of the other settings.
+    dependencies : dict
+        The compiled dependencies (see ``_compile_dependencies``) of
+        every ``Leaf`` that had a validator function with declared
+        dependencies when last checked, with their paths as the keys.
+    dependents : dict
+        The reverse of `dependencies` for the paths without wildcards.
+        The keys are the paths depended on and the values are the
+        ``set`` of the paths to the ``Leaf`` depending on them.
+    wildcards : dict
+        The ``tuple`` of ``GlobPattern`` depended on by each ``Leaf``
+        (the keys are their paths) that depends on any.
+
+    """
+    __slots__ = ('invalids', 'dirty', 'removed', 'functions',
+                 'dependencies', 'dependents', 'wildcards')
+
+    def __init__(self):
+        self.invalids = set()
+        self.dirty = set()
+        self.removed = set()
+        self.functions = set()
+        self.dependencies = dict()
+        self.dependents = dict()
+        self.wildcards = dict()
+
+    def track(self, path, spec):
+        """ Keeps track of what the Leaf at path depends on.
+
+        Parameters
+        ----------
+        path : str
+            The path to the ``Leaf``.
+        spec : LeafSpec
+            Its constraints.
+
+        """
+        self.untrack(path)
+        if spec._validator_function is None:
+            return
+        dependencies = spec._dependencies
+        if dependencies is None:
+            self.functions.add(path)
+            return
+        self.dependencies[path] = dependencies
+        for k in dependencies[0]:
+            self.dependents.setdefault(k, set()).add(path)
+        if len(dependencies[1]) != 0:
+            self.wildcards[path] = dependencies[1]
+
+    def untrack(self, path):
+        """ Stops keeping track of what the Leaf at path depends on."""
+        self.functions.discard(path)
+        dependencies = self.dependencies.pop(path, None)
+        if dependencies is None:
+            return
+        for k in dependencies[0]:
+            dependents = self.dependents[k]
+            dependents.discard(path)
+            if len(dependents) == 0:
+                del self.dependents[k]
+        self.wildcards.pop(path, None)
+
+    def forget(self, paths):
+        """ Forgets everything about paths that were removed."""
+        self.invalids.difference_update(paths)
+        self.dirty.difference_update(paths)
+        self.removed.update(paths)
+        for k in paths:
+            self.untrack(k)
+
+    def dependents_of(self, paths):
+        """ Gets the paths to every Leaf depending on any of paths.
+
+        Parameters
+        ----------
+        paths : set of str
+            The paths depended on.
+
+        Returns
+        -------
+        dependents : set of str
+            The paths to the ``Leaf`` that declared that they depend on
+            any of `paths`.
+
+        """
+        dependents = set()
+        for k in paths:
+            dependents.update(self.dependents.get(k, ()))
+        for k, patterns in self.wildcards.items():
+            for pattern in patterns:
+                if any([pattern.match(v) for v in paths]):
+                    dependents.add(k)
+                    break
+        return dependents
+
+
+def _changing(node):
+    """ Saves what a Tree or Leaf is before it is changed, if needed.
+
+    Must be called before a ``Tree`` has a child put in or removed or
+    its extra parameters changed, or a ``Leaf`` has anything about it
+    set. The first time after a snapshot is taken, what it is (a copy of
+    the children and extra parameters of a ``Tree`` or a shallow copy of
+    a ``Leaf``) is put in its history for the snapshots taken since it
+    was last changed, which it is the same as, if any of them are of
+    a root ``Tree`` it is in (or of a ``Tree`` in it). Only the history
+    still needed by snapshots that are still around is kept. A ``Leaf``
+    is also marked as changed in every root ``Tree`` it is in that
+    validates incrementally (see ``Tree.find_invalids``).
+
+    Raises
+    ------
+    TypeError
+        If `node` is shared by ``Tree.dedupe`` (see ``_is_interned``).
+
+    """
+    if _is_interned(node):
+        raise TypeError('Can''t change a Tree or Leaf shared by dedupe. '
+                        + 'Set it by path from a Tree it is in to give '
+                        + 'that place its own copy.')
+    places = None
+    if isinstance(node, Leaf):
+        places = _places(node)
+        for root, path in places:
+            if root._validation is not None:
+                root._validation.dirty.add(path)
+    lo = node._saved_gen
+    if lo == _snapshot_gen:
+        return
+    node._saved_gen = _snapshot_gen
+    if len(_live_snapshot_gens) == 0:
+        return
+    if places is None:
+        places = _places(node)
+    clocks = _clocks_needing(places, lo)
+    if len(clocks) != 0:
+        _save_state(node, lo, clocks)
+
+
+def _clocks_needing(places, lo):
+    """ Gets the snapshots that need what is saved for a generation.
+
+    Parameters
+    ----------
+    places : list of tuple
+        The places (see ``_places``) a ``Tree`` or ``Leaf`` is in.
+    lo : int
+        The generation of snapshots it was last saved for.
+
+    Returns
+    -------
+    clocks : list of _SnapshotClock
+        The snapshots of the root ``Tree`` in `places` that need what
+        it is now (those after `lo`).
+
+    """
+    clocks = []
+    for root, path in places:
+        clock = root._snapshots
+        if clock is not None and clock not in clocks \
+                and clock.needs(lo, _snapshot_gen):
+            clocks.append(clock)
+    return clocks
+
+
+def _save_state(node, lo, clocks):
+    """ Puts what a Tree or Leaf is in its history.
+
+    Parameters
+    ----------
+    node : Tree or Leaf
+        The ``Tree`` or ``Leaf``.
+    lo : int
+        The generation of snapshots it was last saved for, so what it
+        is now is for the snapshots after that up to now.
+    clocks : list of _SnapshotClock
+        The snapshots that need it, which prune its history.
+
+    """
+    if isinstance(node, Tree):
+        state = (node._children.copy(), copy.copy(node._extra_parameters))
+    else:
+        state = node._clone(dict(), False)
+    if node._history is None:
+        node._history = []
+    node._history.append((lo, _snapshot_gen, state))
+    for clock in clocks:
+        clock.nodes.add(node)
+
+
+def _leaving(node, tree):
+    """ Saves what is needed before a Tree or Leaf is removed from a Tree.
+
+    Once removed from the root ``Tree`` that `tree` is in, changes to
+    `node` and what is nested in it are no longer saved for the
+    snapshots of them, so what they are now is saved for those that
+    need it.
+
+    Parameters
+    ----------
+    node : Tree, Leaf, or other
+        What is being removed.
+    tree : Tree
+        The ``Tree`` it is being removed from.
+
+    """
+    if not isinstance(node, (Tree, Leaf)) \
+            or len(_live_snapshot_gens) == 0:
+        return
+    places = _places(tree)
+    if all([root._snapshots is None or len(root._snapshots.gens) == 0
+            for root, path in places]):
+        return
+    nodes = [node]
+    if isinstance(node, Tree):
+        nodes.extend([v for k, v in node._walk()])
+    for v in nodes:
+        lo = v._saved_gen
+        if lo != _snapshot_gen:
+            v._saved_gen = _snapshot_gen
+            clocks = _clocks_needing(places, lo)
+            if len(clocks) != 0:
+                _save_state(v, lo, clocks)
+
+
+def _state_at(node, gen):
+    """ Gets what a Tree or Leaf was for a generation of snapshots.
+
+    Returns
+    -------
+    state : dict or Leaf
+        The children of `node` if it is a ``Tree``, or the ``Leaf``
+        as it was (a copy if it has since changed, or `node` itself) if
+        it is a ``Leaf``.
+
+    """
+    if node._history is not None:
+        for lo, hi, state in node._history:
+            if lo < gen <= hi:
+                if isinstance(node, Tree):
+                    return state[0]
+                return state
+    if isinstance(node, Tree):
+        return node._children
+    return node
+
+
+def _extra_parameters_at(tree, gen):
+    """ Gets the extra parameters a Tree had for a generation.
+
+    Returns
+    -------
+    extra_parameters : dict or None
+        The extra parameters of `tree` (``None`` if there weren't
+        any) for the generation of snapshots `gen`.
+
+    """
+    if tree._history is not None:
+        for lo, hi, state in tree._history:
+            if lo < gen <= hi:
+                return state[1]
+    return tree._extra_parameters
+
+
+def _locate(node):
+    """ Gets the root Tree that a Tree or Leaf is in and its path there.
+
+    Only the parents are followed up (see ``_places`` for everywhere it
+    is). The result is cached in the node and used until a ``Tree``
+    with children is moved in or out of that root ``Tree`` (see
+    ``_moved``), making this O(1) amortized. Whether it or any ``Tree``
+    it is nested in is in more than one place is cached with it.
+
+    Parameters
+    ----------
+    node : Tree or Leaf
+        The ``Tree`` or ``Leaf`` to locate.
+
+    Returns
+    -------
+    root : Tree or None
+        The root ``Tree`` `node` is in (`node` itself for a root
+        ``Tree``), or ``None`` for a ``Leaf`` that is not in a ``Tree``.
+    path : str or None
+        The absolute POSIX path to `node` in `root` (``'/'`` for a root
+        ``Tree``), or ``None`` if `root` is ``None``.
+
+    """
+    cache = node._path_cache
+    if cache is not None:
+        root = cache[0]()
+        if root is not None and root._moves == cache[1]:
+            return root, cache[2]
+
+    # Follow the parents up, checking that each one really has the node
+    # below it as a child (copies of a node could have been made with
+    # its parent in them).
+    names = []
+    child = node
+    shared = False
+    while child._parent is not None:
+        parent = child._parent()
+        if parent is None \
+                or parent._children.get(child._name) is not child:
+            if _fix_parent(child):
+                continue
+            break
+        shared = shared or child._others is not None
+        names.append(child._name)
+        child = parent
+    if not isinstance(child, Tree):
+        node._path_cache = None
+        return None, None
+    path = posixpath.sep + posixpath.sep.join(reversed(names))
+    node._path_cache = (weakref.ref(child), child._moves, path, shared,
+                        None)
+    return child, path
+
+
+#: The ways the value of a ``Leaf`` can be copied when it is gotten or
+#: set (see ``Leaf.copy_policy``).
+copy_policies = ('deep', 'shallow', 'none', 'freeze')
+
+
+def _check_copy_policy(policy):
+    """ Checks that a copy policy is valid or ``None``.
+
+    Raises
+    ------
+    TypeError
+        If `policy` is not ``None`` or one of ``copy_policies``.
+
+    """
+    if policy is not None and policy not in copy_policies:
+        raise TypeError('copy_policy must be None, deep, shallow, '
+                        + 'none, or freeze.')
+
+
+def _copy_value(value, policy):
+    """ Copies a value according to a copy policy.
+
+    Parameters
+    ----------
+    value : any
+        The value to copy.
+    policy : {'deep', 'shallow', 'none', 'freeze'}
+        ``'deep'`` uses ``copy.deepcopy``, ``'shallow'`` uses
+        ``copy.copy``, and ``'none'`` doesn't copy it at all.
+        ``'freeze'`` is the same as ``'deep'`` (it is what is done with
+        values that can't be frozen).
+
+    Returns
+    -------
+    copied : any
+        The copy of `value` (`value` itself if `policy` is ``'none'``).
+
+    """
+    if policy == 'deep' or policy == 'freeze':
+        return copy.deepcopy(value)
+    elif policy == 'shallow':
+        return copy.copy(value)
+    else:
+        return value
+
+
+# The types whose instances can't be changed and don't hold anything
+# that could be, which are stored as is when freezing.
+if sys.hexversion >= 0x3000000:
+    _immutable_types = (type(None), bool, int, float, complex, str,
+                        bytes, range, type(Ellipsis), type)
+else:
+    _immutable_types = (type(None), bool, int, long, float, complex,
+                        str, unicode, type(Ellipsis), type)
+
+
+class _ThawedMemoryview(object):
+    """ The contents of a frozen memoryview for copying and pickling.
+
+    ``memoryview`` can't be copied or pickled, so this holds a copy of
+    what is in one and its format and shape, which ``_freeze`` turns
+    back into a ``memoryview``.
+
+    """
+    def __init__(self, view):
+        self.data = view.tobytes()
+        self.format = view.format
+        self.shape = view.shape
+
+
+def _is_buffer(value):
+    """ Checks whether a value is a numpy array or memoryview.
+
+    Only those that ``_freeze`` can make a read-only copy of, which
+    excludes subclasses of ``numpy.ndarray`` and those holding python
+    objects.
+
+    """
+    return type(value) is memoryview \
+        or (numpy is not None and type(value) is numpy.ndarray
+            and not value.dtype.hasobject)
+
+
+def _view(value):
+    """ Gets a new read-only view of a frozen value to hand out.
+
+    Frozen numpy arrays and ``memoryview`` are handed out as new views
+    of them so that the frozen ones themselves can't be messed with
+    (e.g. released), which doesn't copy the data. Everything else is
+    handed out as is.
+
+    """
+    tp = type(value)
+    if tp is memoryview:
+        return memoryview(value)
+    elif numpy is not None and tp is numpy.ndarray:
+        return value.view()
+    return value
+
+
+def _freeze(value, memo=None):
+    """ Converts a value into an immutable form.
+
+    ``list`` and ``tuple`` become ``tuple``, ``dict`` become read-only
+    views (``types.MappingProxyType``) of a ``dict`` only they have,
+    and ``set`` and ``frozenset`` become ``frozenset``, all with their
+    elements frozen. Things that are already immutable (``None``,
+    numbers, ``str``, etc.) are kept as is, as are ``tuple`` and
+    ``frozenset`` whose elements are. numpy arrays and ``memoryview``
+    become read-only copies of them (see ``_is_buffer``). Like
+    ``copy.deepcopy``, something that is in `value` more than once is
+    only frozen once.
+
+    Parameters
+    ----------
+    value : any
+        The value to freeze.
+    memo : dict, optional
+        What has been frozen already (or is being frozen) by the ids
+        of what was frozen.
+
+    Returns
+    -------
+    frozen : any
+        The frozen value.
+
+    Raises
+    ------
+    TypeError
+        If `value` or something in it can't be frozen (including if it
+        contains itself, which an immutable value can't).
+
+    See Also
+    --------
+    Leaf.copy_policy
+
+    """
+    tp = type(value)
+    if tp in _immutable_types:
+        return value
+    elif tp is list or tp is tuple or tp is set or tp is frozenset \
+            or tp is dict or tp is OrderedDict \
+            or (MappingProxyType is not None and tp is MappingProxyType):
+        # What is being frozen is kept in the memo along with what it
+        # is frozen to so that its id can't be reused in the meantime.
+        if memo is None:
+            memo = dict()
+        done = memo.get(id(value))
+        if done is not None:
+            if done[1] is _freezing:
+                raise TypeError('Can''t freeze a ' + tp.__name__
+                                + ' that contains itself.')
+            return done[1]
+        memo[id(value)] = (value, _freezing)
+        frozen = _freeze_container(value, memo)
+        memo[id(value)] = (value, frozen)
+        return frozen
+    elif _is_buffer(value) and tp is not memoryview:
+        frozen = numpy.array(value, copy=True)
+        frozen.setflags(write=False)
+        return frozen
+    elif tp is memoryview or tp is _ThawedMemoryview:
+        if tp is memoryview:
+            value = _ThawedMemoryview(value)
+        frozen = memoryview(value.data)
+        if frozen.format != value.format \
+                or frozen.shape != value.shape:
+            try:
+                frozen = frozen.cast(value.format, value.shape)
+            except (AttributeError, ValueError):
+                raise TypeError('Can''t freeze the memoryview.')
+        return frozen
+    raise TypeError('Can''t freeze a ' + tp.__name__ + '.')
+
+
+# Stands in the memo of _freeze for what is being frozen.
+_freezing = object()
+
+
+def _freeze_container(value, memo):
+    """ Freezes a list, tuple, set, frozenset, dict, or view of one.
+
+    See ``_freeze``.
+
+    """
+    tp = type(value)
+    if tp is list or tp is tuple:
+        frozen = tuple([_freeze(v, memo) for v in value])
+        if tp is tuple and all([a is b for a, b in zip(frozen, value)]):
+            return value
+        return frozen
+    elif tp is set or tp is frozenset:
+        frozen = [_freeze(v, memo) for v in value]
+        if tp is frozenset and all([a is b
+                                    for a, b in zip(frozen, value)]):
+            return value
+        return frozenset(frozen)
+    elif MappingProxyType is None:
+        raise TypeError('Can''t freeze a ' + tp.__name__ + '.')
+    elif tp is MappingProxyType:
+        return _freeze(_thaw(value), memo)
+    return MappingProxyType(tp([(k, _freeze(v, memo))
+                                for k, v in value.items()]))
+
+
+def _thaw(value):
+    """ Converts the views in a frozen value to what can be pickled.
+
+    The inverse of ``_freeze`` for the things that can't be copied or
+    pickled (the read-only views of ``dict`` become ``dict`` and
+    ``memoryview`` become ``_ThawedMemoryview``). ``tuple`` and
+    ``frozenset`` are kept as ``tuple`` and ``frozenset``.
+
+    """
+    tp = type(value)
+    if tp is tuple:
+        return tuple([_thaw(v) for v in value])
+    elif tp is frozenset:
+        return frozenset([_thaw(v) for v in value])
+    elif MappingProxyType is not None and tp is MappingProxyType:
+        return dict([(k, _thaw(v)) for k, v in value.items()])
+    elif tp is memoryview:
+        return _ThawedMemoryview(value)
+    return value
+
+
+def _values_differ(value1, value2):
+    """ Checks whether two values are different.
+
+    numpy arrays are compared with ``numpy.array_equal`` (comparing
+    them with ``!=`` gives an array, not a ``bool``) and everything
+    else with ``!=``.
+
+    """
+    if numpy is not None and (isinstance(value1, numpy.ndarray)
+                              or isinstance(value2, numpy.ndarray)):
+        return not numpy.array_equal(value1, value2)
+    return value1 != value2
+
+
+def _content_key(value, frozen=False):
+    """ Gets a key for a value that can't be changed.
+
+    The key of one value only equals that of another if they have the
+    same contents of the same types. Unlike the values themselves,
+    ``1``, ``1.0``, and ``True`` all have different keys, as do ``0.0``
+    and ``-0.0``. Only values of the immutable types and ``tuple`` and
+    ``frozenset`` holding them get keys, as well as read-only views of
+    ``dict`` holding them if `frozen` is ``True`` (they can only be
+    relied on not changing in frozen values, see ``_freeze``).
+
+    Returns
+    -------
+    key : tuple or None
+        The key, or ``None`` if `value` doesn't get one.
+
+    """
+    tp = type(value)
+    if tp is float or tp is complex:
+        return (tp, repr(value))
+    elif tp in _immutable_types:
+        return (tp, value)
+    elif tp is tuple or tp is frozenset:
+        keys = tuple([_content_key(v, frozen) for v in value])
+        if any([k is None for k in keys]):
+            return None
+        if tp is frozenset:
+            return (tp, frozenset(keys))
+        return (tp, keys)
+    elif frozen and MappingProxyType is not None \
+            and tp is MappingProxyType:
+        keys = _items_key(value, frozen)
+        if keys is not None:
+            return (tp, keys)
+    return None
+
+
+def _items_key(mapping, frozen=False):
+    """ Gets the content key (see _content_key) of a mapping in order.
+
+    Returns ``None`` if any of the keys or values doesn't have one.
+
+    """
+    keys = tuple([(_content_key(k, frozen), _content_key(v, frozen))
+                  for k, v in mapping.items()])
+    if any([k is None or v is None for k, v in keys]):
+        return None
+    return keys
+
+
+def _spec_key(spec):
+    """ Gets the content key of a LeafSpec (see _content_key) or None."""
+    keys = (_content_key(spec._valid_value_types),
+            _content_key(spec._allowed_values),
+            _content_key(spec._forbidden_values),
+            _content_key(spec._validators),
+            _content_key(spec._depends_on))
+    if any([k is None for k in keys]):
+        return None
+    return keys + (spec._validator_function, )
+
+
+def _sizeof(value):
+    """ Estimates the bytes used by a value and what it holds.
+
+    Goes into ``tuple``, ``frozenset``, ``dict``, read-only views of
+    ``dict``, and ``LeafSpec``, adding up ``sys.getsizeof`` of
+    everything.
+
+    """
+    tp = type(value)
+    size = sys.getsizeof(value)
+    if tp is tuple or tp is frozenset:
+        size += sum([_sizeof(v) for v in value])
+    elif isinstance(value, dict) or (MappingProxyType is not None
+                                     and tp is MappingProxyType):
+        size += sum([_sizeof(k) + _sizeof(v) for k, v in value.items()])
+    elif tp is LeafSpec:
+        size += sum([_sizeof(getattr(value, k)) for k in _slots(LeafSpec)
+                     if k != '_validator_function'])
+    return size
+
+
+def _memory_of(value, seen, deep=True):
+    """ Adds up the bytes used by a value and what it holds.
+
+    Uses ``sys.getsizeof``. numpy arrays that are views of another
+    array or buffer count the bytes of what they are a view of, and
+    ``memoryview`` count the bytes of what they are a view of if
+    `deep`.
+
+    Parameters
+    ----------
+    value : any
+        The value.
+    seen : set
+        The ids of everything counted already, which are not counted
+        again. Everything counted is added to it.
+    deep : bool, optional
+        Whether to go into containers (``list``, ``tuple``, ``dict``,
+        ``set``, etc.), ``LeafSpec``, and the ``__dict__`` of other
+        objects, adding up what they hold too. Functions, classes, and
+        modules are never gone into.
+
+    Returns
+    -------
+    size : int
+        The number of bytes.
+
+    """
+    size = 0
+    stack = [value]
+    while len(stack) != 0:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+        tp = type(value)
+        if numpy is not None and isinstance(value, numpy.ndarray):
+            if value.base is not None:
+                stack.append(value.base)
+        elif not deep or tp in _immutable_types:
+            pass
+        elif isinstance(value, (list, tuple, set, frozenset,
+                                collections.deque)):
+            stack.extend(value)
+        elif isinstance(value, dict) or (MappingProxyType is not None
+                                         and tp is MappingProxyType):
+            for k, v in value.items():
+                stack.append(k)
+                stack.append(v)
+        elif tp is memoryview:
+            stack.append(getattr(value, 'obj', None))
+        elif tp is LeafSpec:
+            stack.extend([getattr(value, k) for k in _slots(LeafSpec)])
+        elif not inspect.isroutine(value) and not inspect.isclass(value) \
+                and not inspect.ismodule(value) \
+                and hasattr(value, '__dict__'):
+            stack.append(value.__dict__)
+    return size
+
+
+def _int_array():
+    """ Makes an empty array of 64 bit (or the longest there are) ints."""
+    try:
+        return array.array('q')
+    except ValueError:
+        return array.array('l')
+
+
+def _as_numpy(values):
+    """ Gets a numpy array that is a view of an ``array.array``."""
+    if len(values) == 0:
+        return numpy.zeros(0, dtype=values.typecode)
+    return numpy.frombuffer(values, dtype=values.typecode)
+
+
+def _resolve_copy_policy(node):
+    """ Gets the copy policy that applies to a Tree or Leaf.
+
+    It is the ``copy_policy`` of `node` if it is set. Otherwise, it is
+    that of the nearest ``Tree`` it is nested in that has it set, or
+    ``'deep'`` if none of them do. That is cached along with the path
+    of `node` (see ``_locate``), making this O(1) amortized.
+
+    """
+    if node._copy_policy is not None:
+        return node._copy_policy
+    cache = node._path_cache
+    if cache is not None and cache[4] is not None:
+        root = cache[0]()
+        if root is not None and root._moves == cache[1]:
+            return cache[4]
+
+    # Locating it first fixes the parents that are gone (see _locate).
+    _locate(node)
+    policy = 'deep'
+    child = node
+    while child._parent is not None:
+        parent = child._parent()
+        if parent is None \
+                or parent._children.get(child._name) is not child:
+            break
+        if parent._copy_policy is not None:
+            policy = parent._copy_policy
+            break
+        child = parent
+    cache = node._path_cache
+    if cache is not None:
+        node._path_cache = cache[:4] + (policy, )
+    return policy
+
+
+# The simple validators (see Leaf.available_validators) and the number
+# of parameters each takes.
+_available_validators = (('GreaterThan', 'GreaterThanOrEqualTo',
+                          'LessThan', 'LessThanOrEqualTo', 'Between',
+                          'NotBetween', 'NotEqual'),
+                         (1, 1, 1, 1, 2, 2, 1))
+
+
+def _check_valid_value_types(value2):
+    """ Checks and converts valid_value_types (see Leaf)."""
+    if value2 is None:
+        return None
+    elif isinstance(value2, type):
+        return (value2,)
+    elif isinstance(value2, Iterable):
+        for v in value2:
+            if not isinstance(v, type):
+                raise TypeError('An element of the iterable was not'
+                                ' a type.')
+        return tuple(value2)
+    else:
+        raise TypeError('Set to something invalid.')
+
+
+def _check_values(value2):
+    """ Checks and converts allowed_values or forbidden_values.
+
+    See ``Leaf``.
+
+    """
+    if value2 is None:
+        return None
+    elif isinstance(value2, Iterable):
+        return tuple(copy.deepcopy(value2))
+    else:
+        raise TypeError('Set to something invalid.')
+
+
+def _check_validators(value2):
+    """ Checks and converts validators (see Leaf)."""
+    if value2 is None:
+        return None
+    elif not isinstance(value2, Iterable):
+        raise TypeError('Must be set to an iterable of iterables.')
+
+    # Check every simple validator to see if it is available and the
+    # parameters match up.
+    avail_vals, nparams = _available_validators
+    for v in value2:
+        if not isinstance(v, Iterable) \
+                or len(v) != 2 or v[0] not in avail_vals:
+            raise TypeError('Each element must be a 2 element'
+                            ' iterable with an available'
+                            ' simple validator.')
+        # If one parameter, it must be a number. If two parameters it
+        # must be an iterable of two numbers.
+        if 1 == nparams[avail_vals.index(v[0])]:
+            if not isinstance(v[1], numbers.Number):
+                raise TypeError('Parameter must be a Number')
+        else:
+            if not isinstance(v[1], Iterable) \
+                    or len(v[1]) != 2 \
+                    or not isinstance(v[1][0], numbers.Number) \
+                    or not isinstance(v[1][1], numbers.Number):
+                raise TypeError('Parameters must be an '
+                                'iterable of two Numbers')
+    # It is valid.
+    return tuple([(v[0], copy.deepcopy(v[1])) for v in value2])
+
+
+def _check_validator_function(value2):
+    """ Checks validator_function (see Leaf)."""
+    if value2 is None:
+        return None
+    elif inspect.isfunction(value2) \
+            and ((sys.hexversion < 0x3040000 \
+            and 2 == len(inspect.getargspec(value2).args)) \
+            or (sys.hexversion >= 0x3040000 \
+            and 2 == len(inspect.signature(value2).parameters))):
+        return copy.deepcopy(value2)
+    else:
+        raise TypeError('Must be set to a function taking 2 '
+                        'arguments or None.')
+
+
+def _check_depends_on(value2):
+    """ Checks and converts depends_on (see Leaf)."""
+    if value2 is None:
+        return None
+    elif isinstance(value2, str):
+        value2 = (value2, )
+    elif not isinstance(value2, Iterable):
+        raise TypeError('Must be set to a str or an iterable of str.')
+    value2 = tuple(value2)
+    for v in value2:
+        if not isinstance(v, str):
+            raise TypeError('An element of the iterable was not'
+                            ' a str.')
+    return tuple([_parse_path(v)[0] for v in value2])
+
+
+# The function to check each constraint in a LeafSpec with.
+_constraint_checks = {'valid_value_types': _check_valid_value_types,
+                      'allowed_values': _check_values,
+                      'forbidden_values': _check_values,
+                      'validators': _check_validators,
+                      'validator_function': _check_validator_function,
+                      'depends_on': _check_depends_on}
+
+
+def _simple_validator(name, params):
+    """ Makes the function that checks a value with a simple validator.
+
+    Parameters
+    ----------
+    name : str
+        The name of the simple validator (see
+        ``Leaf.available_validators``).
+    params : number or iterable of two numbers
+        Its parameters.
+
+    Returns
+    -------
+    check : function
+        Function taking the value and returning whether it is valid.
+
+    """
+    if name == 'GreaterThan':
+        return lambda v: v > params
+    elif name == 'LessThan':
+        return lambda v: v < params
+    elif name == 'GreaterThanOrEqualTo':
+        return lambda v: v >= params
+    elif name == 'LessThanOrEqualTo':
+        return lambda v: v <= params
+    elif name == 'NotEqual':
+        return lambda v: v != params
+    low = min(params)
+    high = max(params)
+    if name == 'Between':
+        return lambda v: v >= low and v <= high
+    elif name == 'NotBetween':
+        return lambda v: v <= low or v >= high
+    raise ValueError(name + ' is not a simple validator.')
+
+
+def _membership(values):
+    """ Makes the function that checks if a value is in some values.
+
+    If all of `values` are hashable, a value is looked for in a
+    ``frozenset`` of them (O(1) rather than going through them one by
+    one), falling back to going through them if the value isn't
+    hashable. Either way, it is the same as ``value in values`` for
+    everything whose hash is consistent with ``==`` (e.g. ``1``,
+    ``1.0``, and ``True`` are all in ``(1, )``).
+
+    Parameters
+    ----------
+    values : tuple
+        The values.
+
+    Returns
+    -------
+    contains : function
+        Function taking a value and returning whether it is in
+        `values`.
+
+    """
+    try:
+        hashed = frozenset(values)
+    except TypeError:
+        return lambda v: v in values
+
+    def contains(v):
+        try:
+            return v in hashed
+        except TypeError:
+            return v in values
+    return contains
+
+
+def _always_valid(value, all_settings):
+    """ Validator of a LeafSpec without any constraints."""
+    return True
+
+
+def _never_valid(value, all_settings):
+    """ Validator of a LeafSpec whose constraints are damaged."""
+    return False
+
+
+def _compile_validator(spec, use_function=True):
+    """ Compiles the constraints of a LeafSpec into one function.
+
+    Only the constraints that are set are checked by it (the type, the
+    allowed and forbidden values, the simple validators, and then the
+    validator function), with everything they need (the functions for
+    the simple validators, the bounds of ``'Between'``, etc.) made
+    ahead of time.
+
+    Parameters
+    ----------
+    spec : LeafSpec
+        The constraints.
+    use_function : bool, optional
+        Whether the validator function is checked too. Without it, only
+        the constraints on the value alone are.
+
+    Returns
+    -------
+    validator : function
+        Function taking the value and all the settings (see
+        ``Leaf.is_valid``) and returning whether the value is valid
+        (exceptions are passed on). If the constraints are damaged
+        (something invalid slipped in) so that it can't be made, it
+        always returns ``False``.
+
+    """
+    try:
+        checks = []
+        if spec._valid_value_types is not None:
+            types = spec._valid_value_types
+            checks.append(lambda v: type(v) in types)
+        if spec._allowed_values is not None:
+            checks.append(_membership(spec._allowed_values))
+        if spec._forbidden_values is not None:
+            forbidden = _membership(spec._forbidden_values)
+            checks.append(lambda v: not forbidden(v))
+        if spec._validators is not None:
+            checks.extend([_simple_validator(name, params)
+                           for name, params in spec._validators])
+    except Exception:
+        return _never_valid
+    function = None
+    if use_function:
+        function = spec._validator_function
+
+    if len(checks) == 0:
+        if function is None:
+            return _always_valid
+        return function
+
+    checks = tuple(checks)
+
+    def validator(value, all_settings):
+        for check in checks:
+            if not check(value):
+                return False
+        if function is not None:
+            return function(value, all_settings)
+        return True
+    return validator
+
+
+def _compile_dependencies(depends_on):
+    """ Compiles the depends_on of a LeafSpec.
+
+    Parameters
+    ----------
+    depends_on : tuple of str or None
+        The paths and glob patterns (see ``Leaf.depends_on``).
+
+    Returns
+    -------
+    dependencies : tuple or None
+        ``None`` if `depends_on` is ``None``, and otherwise the
+        ``frozenset`` of the paths without wildcards and the ``tuple``
+        of the ``GlobPattern`` of the rest.
+
+    """
+    if depends_on is None:
+        return None
+    paths = []
+    patterns = []
+    for v in depends_on:
+        pattern = GlobPattern(v)
+        if all([kind == GlobPattern._LITERAL
+                for kind, part in pattern._parts]):
+            paths.append(v)
+        else:
+            patterns.append(pattern)
+    return (frozenset(paths), tuple(patterns))
+
+
+class LeafSpec(object):
+    """ A set of constraints on the value of a ``Leaf``.
+
+    Holds the constraints that the value of a ``Leaf`` must meet to be
+    valid (see ``Leaf``). They are checked once when it is made and
+    can't be changed after, so any number of ``Leaf`` can share one
+    (``Leaf(spec=...)``) without checking them again or storing them
+    more than once. ``Leaf`` given the same constraints individually
+    share one too (the ones made for the last few hundred different
+    sets of them are kept). Setting a constraint of a ``Leaf`` gives it
+    a new ``LeafSpec`` with the change rather than changing the shared
+    one.
+    The constraints are compiled into one function when it is made,
+    which is what ``Leaf.is_valid`` uses to check the value.
+
+    Parameters
+    ----------
+    valid_value_types : type, iterable of types, optional
+        See ``Leaf.valid_value_types``.
+    allowed_values : iterable, optional
+        See ``Leaf.allowed_values``.
+    forbidden_values : iterable, optional
+        See ``Leaf.forbidden_values``.
+    validators : iterable of iterables, optional
+        See ``Leaf.validators``.
+    validator_function : function, optional
+        See ``Leaf.validator_function``.
+    depends_on : str or iterable of str, optional
+        See ``Leaf.depends_on``.
+
+    Raises
+    ------
+    TypeError
+        If any of them are invalid.
+
+    Attributes
+    ----------
+    valid_value_types : tuple of types or None
+    allowed_values : tuple or None
+    forbidden_values : tuple or None
+    validators : tuple of tuples or None
+    validator_function : function or None
+    depends_on : tuple of str or None
+
+    See Also
+    --------
+    Leaf
+
+    """
+    __slots__ = ('_valid_value_types', '_allowed_values',
+                 '_forbidden_values', '_validators',
+                 '_validator_function', '_depends_on', '_validator',
+                 '_dependencies', '__weakref__')
+
+    def __init__(self, valid_value_types=None, allowed_values=None,
+                 forbidden_values=None, validators=None,
+                 validator_function=None, depends_on=None):
+        self._validator_function = \
+            _check_validator_function(validator_function)
+        self._depends_on = _check_depends_on(depends_on)
+        self._dependencies = _compile_dependencies(self._depends_on)
+        self._valid_value_types = \
+            _check_valid_value_types(valid_value_types)
+        self._allowed_values = _check_values(allowed_values)
+        self._forbidden_values = _check_values(forbidden_values)
+        self._validators = _check_validators(validators)
+        self._validator = _compile_validator(self)
+
+    @property
+    def valid_value_types(self):
+        """ The python types that the value must be a type of.
+
+        tuple of types or None
+
+        """
+        return copy.deepcopy(self._valid_value_types)
+
+    @property
+    def allowed_values(self):
+        """ The allowed values.
+
+        tuple or None
+
+        """
+        return copy.deepcopy(self._allowed_values)
+
+    @property
+    def forbidden_values(self):
+        """ The forbidden values.
+
+        tuple or None
+
+        """
+        return copy.deepcopy(self._forbidden_values)
+
+    @property
+    def validators(self):
+        """ The simple validators to use and their parameters.
+
+        tuple of tuples or None
+
+        """
+        return copy.deepcopy(self._validators)
+
+    @property
+    def validator_function(self):
+        """ Custom validation function to validate the value.
+
+        function or None
+
+        """
+        return self._validator_function
+
+    @property
+    def depends_on(self):
+        """ The paths the validator function depends on.
+
+        tuple of str or None
+
+        """
+        return self._depends_on
+
+    def replace(self, **keywords):
+        """ Makes a copy with some of the constraints changed.
+
+        Only the changed constraints are checked.
+
+        Parameters
+        ----------
+        **keywords :
+            The constraints to change (the names of the parameters
+            given to ``LeafSpec``) and what to change them to.
+
+        Returns
+        -------
+        spec : LeafSpec
+            The copy with the changes.
+
+        Raises
+        ------
+        TypeError
+            If a keyword is not the name of a constraint or what it is
+            changed to is invalid.
+
+        """
+        for k in keywords:
+            if k not in _constraint_checks:
+                raise TypeError(k + ' is not a constraint.')
+        return self._replace(dict([(k, _constraint_checks[k](v))
+                                   for k, v in keywords.items()]))
+
+    def _replace(self, constraints):
+        """ Makes a copy with some constraints changed without checks.
+
+        `constraints` is a ``dict`` of the names of the constraints
+        (without the leading ``'_'``) and what to change them to.
+
+        """
+        spec = LeafSpec.__new__(LeafSpec)
+        for k in _constraint_checks:
+            if k in constraints:
+                setattr(spec, '_' + k, constraints[k])
+            else:
+                setattr(spec, '_' + k, getattr(self, '_' + k))
+        spec._validator = _compile_validator(spec)
+        spec._dependencies = _compile_dependencies(spec._depends_on)
+        return spec
+
+    def __copy__(self):
+        """ Returns itself since it can't be changed."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """ Returns itself since it can't be changed."""
+        return self
+
+    def __getstate__(self):
+        # The compiled validator and dependencies can't be pickled, so
+        # they are compiled again when restored.
+        state = _get_attributes(self)
+        state.pop('_validator', None)
+        state.pop('_dependencies', None)
+        return state
+
+    def __setstate__(self, state):
+        self._depends_on = None
+        _set_attributes(self, state)
+        self._validator = _compile_validator(self)
+        self._dependencies = _compile_dependencies(self._depends_on)
+
+
+def _spec_attribute(name):
+    """ Makes a property of Leaf for an attribute of its LeafSpec.
+
+    Setting it gives the ``Leaf`` a copy of its ``LeafSpec`` with the
+    attribute set without any checks.
+
+    """
+    def fget(self):
+        return getattr(self._spec, '_' + name)
+
+    def fset(self, value):
+        _changing(self)
+        self._spec = self._spec._replace({name: value})
+    return property(fget, fset)
+
+
+def _constraints_key(value):
+    """ Makes what identifies a constraint given to Leaf in the cache.
+
+    Only ``list`` and ``tuple`` of things that can't be changed
+    (``_immutable_types``) and functions are allowed, since the
+    ``LeafSpec`` made from them keeps copies. The type of everything is
+    included so that values that are equal but of different types
+    (``1``, ``1.0``, and ``True``) don't get the same ``LeafSpec``.
+
+    Raises
+    ------
+    TypeError
+        If something else is in it.
+
+    """
+    tp = type(value)
+    if tp is list or tp is tuple:
+        return (tp, tuple([_constraints_key(v) for v in value]))
+    elif tp in _immutable_types or inspect.isfunction(value):
+        return (tp, value)
+    raise TypeError('Can''t be cached.')
+
+
+class _SpecCache(object):
+    """ Bounded LRU cache of the LeafSpec made for the Leaf constructor.
+
+    Constraints given individually to ``Leaf`` replace those in its
+    ``LeafSpec``, which checks them, makes a new one, and compiles its
+    validator. The same constraints tend to be given to many ``Leaf``,
+    so the ``LeafSpec`` made is cached by the one they replace those in
+    and the constraints as given, and is shared by every ``Leaf`` given
+    the same ones without checking them again. Those with constraints
+    that could be changed after (see ``_constraints_key``) are not
+    cached.
+
+    Parameters
+    ----------
+    maxsize : int
+        The maximum number of ``LeafSpec`` to keep.
+
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def replace(self, spec, constraints):
+        """ Gets `spec` with some constraints changed (checking them).
+
+        Parameters
+        ----------
+        spec : LeafSpec
+            The ``LeafSpec`` to replace the constraints in.
+        constraints : dict
+            The names of the constraints and what to change them to.
+
+        Returns
+        -------
+        spec : LeafSpec
+            The cached one if there is one, and otherwise the new one.
+
+        Raises
+        ------
+        TypeError
+            If a name is not the name of a constraint or what it is
+            changed to is invalid.
+
+        """
+        try:
+            key = (spec, tuple([(k, _constraints_key(constraints[k]))
+                                for k in sorted(constraints)]))
+            new_spec = self._cache.get(key)
+        except TypeError:
+            return spec.replace(**constraints)
+        if new_spec is not None:
+            _move_to_end(self._cache, key)
+            return new_spec
+        new_spec = spec.replace(**constraints)
+        if self.maxsize > 0:
+            self._cache[key] = new_spec
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return new_spec
+
+
+_spec_cache = _SpecCache(maxsize=256)
+
+
+class Leaf(object):
+    """ An individual setting.
+
+    A setting that is part of a nested tree of settings (see ``Tree``),
+    has a value (``value``), and possibly requires validation checks.
+
+    A setting is valid if it meets several criteria. Note, it is
+    possible to set the criteria such that it can never be valid with
+    any value. It is valid (call ``is_valid``) if it meets all the
+    following criteria.
+
+    1. It's type is one of the types contained in ``valid_value_types``,
+       if given.
+    2. It is one of the values in ``allowed_values``, if given.
+    3. It is not one of the values in ``forbidden_values``, if given.
+    4. It passes all the simple validators in ``validators``, if given.
+       See ``available_validators`` for the available ones and how to
+       set their parameters. More than one can be used in combination.
+       They are meant for numerical settings to make sure they are
+       less than a value, greater than, in a range, outside a range,
+       etc.
+    5. It passes the custom validation function provided
+       (``validator_function``), if given. It must be a function
+       (includes those made by ``lambda``). It must return a ``bool``
+       indicating whether the setting is valid (``True``) or not
+       (``False``) and take two arguments. The first is the value of
+       this setting and the second is a read-only ``Mapping``
+       containing all the other settings in the root settings ``Tree``
+       that this is a part of with the POSIX paths to the individual
+       setting leaves as the keys and their values as the values (each
+       is only gotten, and copied, when it is looked up). Thowing an
+       exception, which will be caught, is considered as the setting
+       being invalid.
+       The paths of the settings it reads can be declared in
+       ``depends_on`` so that ``Tree.find_invalids`` only calls it
+       again when one of them changes.
+
+    The value is copied when it is set and every time it is gotten so
+    that it can't be changed by changing the object that was given or
+    gotten. How it is copied (deep copy, shallow copy, or not at all) is
+    set by ``copy_policy`` or, if that is ``None``, the ``copy_policy``
+    of the nearest ``Tree`` this ``Leaf`` is in that has it set.
+
+    Additional parameters can be stored in this ``Leaf`` and accessed
+    like a ``dict``. The initial ones are set by `**keywords`, but then
+    can be set and gotten by the usual ways of working with a ``dict``
+    such as ``leaf['a']``.
+
+    Parameters
+    ----------
+    value : any, optional
+        The value of this setting. See Attributes.
+    valid_value_types : type, iterable of types, optional
+        See Attributes.
+    allowed_values : iterable, optional
+        See Attributes.
+    forbidden_values : iterable, optional
+        See Attributes.
+    validators : iterable of iterables, optional
+        See Attributes.
+    validator_function : function, optional
+        See Attributes.
+    copy_policy : {None, 'deep', 'shallow', 'none', 'freeze'}, optional
+        See Attributes.
+    spec : LeafSpec, optional
+        See Attributes. Any of `valid_value_types`, `allowed_values`,
+        `forbidden_values`, `validators`, `validator_function`, and
+        `depends_on` that are given replace those in it (in a copy).
+    depends_on : str or iterable of str, optional
+        See Attributes.
+    **keywords : optional
+        Aditional keyword arguments which are put in this ``Leaf`` to
+        be accessed by accessing this ``Leaf`` like a ``dict``.
+
+    Raises
+    ------
+    TypeError
+        If set to something invalid.
+
+    Attributes
+    ----------
+    value : any type
+    valid_value_types : iterable of classes or None
+    allowed_values : iterable or None
+    forbidden_values : iterable or None
+    validators : iterable of iterables or None
+    validator_function : function or None
+    copy_policy : {None, 'deep', 'shallow', 'none', 'freeze'}
+    spec : LeafSpec
+    depends_on : tuple of str or None
+
+    See Also
+    --------
+    Tree
+    LeafSpec
+    available_validators
+
+    """
+    __slots__ = ('_parent', '_name', '_others', '_path_cache',
+                 '_saved_gen', '_history', '_frozen', '_copy_policy',
+                 '_value', '_spec', '_extra_parameters', '__weakref__')
+
+    # The constraints are all stored in the LeafSpec.
+    _valid_value_types = _spec_attribute('valid_value_types')
+    _allowed_values = _spec_attribute('allowed_values')
+    _forbidden_values = _spec_attribute('forbidden_values')
+    _validators = _spec_attribute('validators')
+    _validator_function = _spec_attribute('validator_function')
+
+    def __init__(self, value=None, valid_value_types=None,
+                 allowed_values=None, forbidden_values=None,
+                 validators=None, validator_function=None,
+                 copy_policy=None, spec=None, depends_on=None,
+                 **keywords):
+        # This Leaf starts out not being in a Tree. When it is put in
+        # one, a weak reference to it is stored along with the name it
+        # has there (and the other places it is in if it is put in more
+        # than one). Its location there is cached when it is looked up.
+        self._parent = None
+        self._name = None
+        self._others = None
+        self._path_cache = None
+
+        # Nothing needs to be saved for snapshots taken before this
+        # Leaf was made.
+        self._saved_gen = _snapshot_gen
+        self._history = None
+
+        # The copy policy must be set before the value since it
+        # determines how the value is copied (and whether it is frozen).
+        self._frozen = False
+        self._copy_policy = None
+        self.copy_policy = copy_policy
+
+        # The value is set without question.
+        self.value = value
+        
+        # The constraints are in the spec (one with none if not given).
+        # Those given individually are checked and replace those in it.
+        if spec is None:
+            spec = _no_constraints
+        elif not isinstance(spec, LeafSpec):
+            raise TypeError('spec must be a LeafSpec.')
+        constraints = dict([(k, v) for k, v in (
+            ('validator_function', validator_function),
+            ('valid_value_types', valid_value_types),
+            ('allowed_values', allowed_values),
+            ('forbidden_values', forbidden_values),
+            ('validators', validators),
+            ('depends_on', depends_on)) if v is not None])
+        if len(constraints) != 0:
+            spec = _spec_cache.replace(spec, constraints)
+        self._spec = spec
+
+        # Copy everything in keywords into the extra parameters
+        # dictionary, which is only made if there are any.
+        if len(keywords) != 0:
+            self._extra_parameters = copy.deepcopy(keywords)
+        else:
+            self._extra_parameters = None
+
+    @property
+    def value(self):
+        """ The value of this particular setting
+
+        any type
+
+        It is copied when set and gotten according to the copy policy
+        (see ``copy_policy``), or frozen when set and then not copied
+        at all.
+
+        numpy arrays (except those holding python objects) and
+        ``memoryview`` are always frozen unless the copy policy is
+        ``'none'``. A read-only copy is made when set and new read-only
+        views of it are handed out when gotten, so that the data is
+        never copied when gotten.
+
+        See Also
+        --------
+        is_valid
+        copy_policy
+
+        """
+        if self._frozen:
+            return _view(self._value)
+        return _copy_value(self._value, _resolve_copy_policy(self))
+
+    @value.setter
+    def value(self, value2):
+        _changing(self)
+        self._value, self._frozen = self._prepare_value(value2)
+
+    def _prepare_value(self, value2):
+        """ Makes what is stored when the value is set to something.
+
+        It is copied or frozen according to the copy policy (see
+        ``copy_policy``).
+
+        Returns
+        -------
+        value : any
+            What to store as the value.
+        frozen : bool
+            Whether it is frozen.
+
+        """
+        policy = _resolve_copy_policy(self)
+        if policy == 'freeze' \
+                or (policy != 'none' and _is_buffer(value2)):
+            try:
+                return _freeze(value2), True
+            except TypeError:
+                pass
+        return _copy_value(value2, policy), False
+
+    @property
+    def copy_policy(self):
+        """ How the value is copied when it is set and gotten.
+
+        {None, 'deep', 'shallow', 'none', 'freeze'}
+
+        ``'deep'`` copies the value with ``copy.deepcopy``,
+        ``'shallow'`` with ``copy.copy``, and ``'none'`` does not copy
+        it at all (the object that was set is stored and handed out
+        directly). ``None`` means that the ``copy_policy`` of the
+        nearest ``Tree`` this ``Leaf`` is in that has one set is used,
+        or ``'deep'`` if there is none.
+
+        ``'freeze'`` converts the value to an immutable form when it is
+        set, which is then handed out directly when gotten without
+        copying it. ``list`` become ``tuple``, ``dict`` become read-only
+        ``types.MappingProxyType`` (Python >= 3.3), and ``set`` become
+        ``frozenset``, all the way down. Values that can't be frozen
+        (anything else that isn't immutable) are deep copied as with
+        ``'deep'`` instead. The policy only matters when the value is
+        set, so a frozen value stays frozen if the policy is changed.
+
+        Warning
+        -------
+        With ``'shallow'`` or ``'none'``, changing the object that was
+        set or gotten (or things in it) changes the value of this
+        setting without it being validated.
+
+        With ``'freeze'``, the type of the value changes (a ``list``
+        becomes a ``tuple`` for example), which must be taken into
+        account by ``valid_value_types``, ``allowed_values``, etc.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        value
+        Tree.copy_policy
+
+        """
+        return self._copy_policy
+
+    @copy_policy.setter
+    def copy_policy(self, value2):
+        _changing(self)
+        _check_copy_policy(value2)
+        self._copy_policy = value2
+
+
+    @property
+    def path(self):
+        """ The absolute POSIX path to this ``Leaf`` in its root ``Tree``.
+
+        str or None
+
+        ``None`` if this ``Leaf`` is not in a ``Tree``. If the same
+        ``Leaf`` was put in more than one place, it is the last one.
+
+        See Also
+        --------
+        root
+
+        """
+        return _locate(self)[1]
+
+    @property
+    def root(self):
+        """ The root ``Tree`` that this ``Leaf`` is in.
+
+        Tree or None
+
+        ``None`` if this ``Leaf`` is not in a ``Tree``. If the same
+        ``Leaf`` was put in more than one place, it is the last one.
+
+        See Also
+        --------
+        path
+
+        """
+        return _locate(self)[0]
+
+    def __getstate__(self):
+        # Where this Leaf is in a Tree and the history kept for
+        # snapshots are not part of its state (the Tree sets the
+        # location when it is restored). The read-only views in a
+        # frozen value can't be copied or pickled, so they are turned
+        # back into dict and the value is frozen again when restored.
+        state = _get_attributes(self)
+        for k in ('_parent', '_name', '_others', '_path_cache',
+                  '_history'):
+            state[k] = None
+        if state.get('_frozen'):
+            state['_value'] = _thaw(state['_value'])
+        return state
+
+    def __setstate__(self, state):
+        self._others = None
+        _set_attributes(self, state)
+        self._saved_gen = _snapshot_gen
+        if state.get('_frozen'):
+            self._value = _freeze(self._value)
+
+    def __copy__(self):
+        """ Makes a shallow copy (the value is not copied).
+
+        The copy is not in any ``Tree``.
+
+        """
+        return self._clone({}, False)
+
+    def __deepcopy__(self, memo):
+        """ Makes a deep copy.
+
+        The copy is not in any ``Tree``.
+
+        """
+        return self._clone(memo, True)
+
+    def _clone(self, memo, deep):
+        """ Copies this Leaf without going through the setters.
+
+        The attributes are copied directly, so nothing is validated
+        again. The constraints are immutable (``tuple`` and functions)
+        and frozen and immutable values can't be changed, so they are
+        shared with the copy.
+
+        Parameters
+        ----------
+        memo : dict
+            The memo of what has been copied already (see
+            ``copy.deepcopy``).
+        deep : bool
+            Whether to deep copy the value and extra parameters
+            (``True``), or use them as is and make a new ``dict`` of the
+            extra parameters with the same items (``False``).
+
+        Returns
+        -------
+        leaf : Leaf
+            The copy, which is not in any ``Tree``.
+
+        """
+        leaf = memo.get(id(self))
+        if leaf is not None:
+            return leaf
+        leaf = type(self).__new__(type(self))
+        for k in _slots(type(self)):
+            setattr(leaf, k, getattr(self, k))
+        if hasattr(self, '__dict__'):
+            leaf.__dict__.update(self.__dict__)
+        leaf._parent = None
+        leaf._name = None
+        leaf._others = None
+        leaf._path_cache = None
+        leaf._saved_gen = _snapshot_gen
+        leaf._history = None
+        if deep:
+            if not self._frozen \
+                    and type(self._value) not in _immutable_types:
+                leaf._value = copy.deepcopy(self._value, memo)
+            if self._extra_parameters is not None:
+                leaf._extra_parameters = copy.deepcopy(
+                    self._extra_parameters, memo)
+        elif self._extra_parameters is not None:
+            leaf._extra_parameters = copy.copy(self._extra_parameters)
+        memo[id(self)] = leaf
+        return leaf
+
+    @property
+    def valid_value_types(self):
+        """ The python types that the setting value must be a type of.
+
+        type, iterable of types, or None
+
+        The type/s that this setting's value must be a type of in
+        order to be valid. ``None`` is used to indicate that any type
+        is allowed. Is stored as ``None`` or a ``tuple`` of types.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        """
+        return copy.deepcopy(self._spec._valid_value_types)
+    
+    @valid_value_types.setter
+    def valid_value_types(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(valid_value_types=value2)
+
+    @property
+    def allowed_values(self):
+        """ The allowed setting values.
+
+        iterable or None
+
+        The valid values allowed for this setting. ``None`` designates
+        that this feature is not used (all values otherwise valid
+        are allowed). Stored as ``None`` or a ``tuple`` (in the order
+        given). If they are all hashable, ``is_valid`` looks the value
+        up in a ``frozenset`` of them.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        forbidden_values
+        
+        """
+        return copy.deepcopy(self._spec._allowed_values)
+
+    @allowed_values.setter
+    def allowed_values(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(allowed_values=value2)
+
+    @property
+    def forbidden_values(self):
+        """ The forbidden setting values.
+
+        iterable or None
+
+        The values forbidden for this setting. ``None`` designates
+        that this feature is not used. Stored as ``None`` or a ``tuple``
+        (in the order given). If they are all hashable, ``is_valid``
+        looks the value up in a ``frozenset`` of them.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        allowed_values
+        
+        """
+        return copy.deepcopy(self._spec._forbidden_values)
+
+    @forbidden_values.setter
+    def forbidden_values(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(forbidden_values=value2)
+
+    @property
+    def validators(self):
+        """ The simple validators to use and their parameters.
+        
+        iterable of iterables, or None
+
+        The simple validators for the setting value to use and their
+        parameters, or ``None`` to not use any. The available ones and
+        how many parameters they required can be found by calling
+        ``available_validators``. Each one must be given as a two
+        element iterable with the string name of the simple validator
+        in the first element and the parameters in the second. If it
+        takes one parameter, the second element should be that
+        parameter. If it takes two parameters, the second element
+        should be an iterable of the two parameters. The parameters
+        must inherit from ``numbers.Number``. The simple validators must
+        be given as an iterable of them, so an iterable of iterables.
+
+        Warning
+        -------
+        It is possible to set the group of simple validators such that
+        no setting is valid.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        available_validators
+        
+        """
+        return copy.deepcopy(self._spec._validators)
+    
+    @validators.setter
+    def validators(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(validators=value2)
+
+    @property
+    def validator_function(self):
+        """ Custom validation function to validate the setting.
+        
+        function or None
+
+        User provided custom validator function to check the validity
+        of this setting after all other checks have been done. ``None``
+        means the feature is not used. It must be a function (includes
+        those made by ``lambda``). It must return a ``bool`` indicating
+        whether the setting is valid (``True``) or not (``False``) and
+        take two arguments. The first is the value of this setting
+        and the second is a read-only ``Mapping`` containing all the
+        other settings in the root settings ``Tree`` that this is a
+        part of with the POSIX paths to the individual setting leaves
+        as the keys and their values as the values (each is only
+        gotten, and copied according to the copy policy, when it is
+        looked up). Thowing an exception, which will be caught, is
+        considered as the setting being invalid.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        Tree.list
+
+        """
+        return self._spec._validator_function
+    
+    @validator_function.setter
+    def validator_function(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(validator_function=value2)
+
+    @property
+    def depends_on(self):
+        """ The paths to the settings the validator function reads.
+
+        tuple of str or None
+
+        The absolute POSIX paths in the root ``Tree`` to the settings
+        that ``validator_function`` reads from all the settings, which
+        can be glob patterns (see ``GlobPattern``). ``None`` means they
+        aren't declared, so it could read any of them. When
+        ``Tree.find_invalids`` validates incrementally, a ``Leaf`` with
+        a validator function that declares them is only checked again
+        when it or one of the settings matching them changes, is put
+        in, or is removed (rather than every time). Can be set to an
+        ``str`` or an iterable of ``str``, which are normalized.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        validator_function
+        Tree.find_invalids
+        GlobPattern
+
+        """
+        return self._spec._depends_on
+
+    @depends_on.setter
+    def depends_on(self, value2):
+        _changing(self)
+        self._spec = self._spec.replace(depends_on=value2)
+
+    @property
+    def spec(self):
+        """ The constraints on the value of this setting.
+
+        LeafSpec
+
+        Holds ``valid_value_types``, ``allowed_values``,
+        ``forbidden_values``, ``validators``, ``validator_function``,
+        and ``depends_on``. It can be shared with any number of
+        other ``Leaf``. Setting one of them gives this ``Leaf`` a new
+        ``LeafSpec`` with the change.
+
+        Raises
+        ------
+        TypeError
+            If set to something other than a ``LeafSpec``.
+
+        See Also
+        --------
+        LeafSpec
+
+        """
+        return self._spec
+
+    @spec.setter
+    def spec(self, value2):
+        _changing(self)
+        if not isinstance(value2, LeafSpec):
+            raise TypeError('Must be set to a LeafSpec.')
+        self._spec = value2
+
+    def available_validators(self):
+        """ Returns the available validators and number of parameters.
+
+        Returns the ``str`` identifiers for the simple validators that
+        are available as well as the number of parameters each take.
+        The available validators are in the table below for convenience.
+        N is the number of parameters it takes. V is the value of this
+        setting. X is the first (or only) parameter and Y is the
+        second.
+
+        ==========================  =  ================================
+        validator                   N  Valid if
+        ==========================  =  ================================
+        ``'GreaterThan'``           1  V > X
+        ``'LessThan'``              1  V < X
+        ``'GreaterThanOrEqualTo'``  1  V >= X
+        ``'LessThanOrEqualTo'``     1  V <= X
+        ``'NotEqual'``              1  V != X
+        ``'Between'``               2  min(X, Y) <= V <= max(X, Y)
+        ``'NotBetween'``            2  V <= min(X, Y) OR V >= max(X, Y)
+        ==========================  =  ================================
+
+        Returns
+        -------
+        available_validators : tuple of str
+            The names of the validators (first column in above table).
+        number_parameters : tuple of ints
+            The number of parameters each validator takes (second
+            column in the above table).
+
+        See Also
+        --------
+        validators
+        
+        """
+        return _available_validators
+
+    def is_valid(self, all_settings):
+        """ Checks and returns whether this setting is valid or not.
+
+        Parameters
+        ----------
+        all_settings : Mapping
+            All the settings from the root ``Tree`` all the way to each
+            end ``Leaf``. The keys are the POSIX paths to each ``Leaf``
+            and the key is the value of the setting of the ``Leaf``.
+            ``Tree.find_invalids`` gives a read-only ``Mapping`` that
+            gets the values from the root ``Tree`` when looked up, but
+            a ``dict`` can be given.
+
+        Returns
+        -------
+        validity : bool
+            Whether this setting is valid (``True``) or not (``False``).
+
+        See Also
+        --------
+        Tree.list
+        
+        """
+        # The constraints are compiled into one function (see
+        # LeafSpec). Wrap in a try block to catch any exceptions that may
+        # be caused by invalid attribute values that could have slipped
+        # in.
+        try:
+            return self._spec._validator(self._value, all_settings)
+        except:
+            return False
+
+    # Implement a dictionary interface for all the extra parameters
+    # by mapping the relevant dict functions to the functions inside
+    # _extra_parameters (which is only made when the first one is set).
+    def __len__(self):
+        """ Returns the number of extra parameters."""
+        return len(self._extra_parameters or _no_extra_parameters)
+
+    def __getitem__(self, key):
+        """ Gets a particular extra parameter."""
+        return (self._extra_parameters or _no_extra_parameters)[key]
+
+    def __setitem__(self, key, value):
+        """ Sets a particular extra parameter."""
+        _changing(self)
+        _writable_extra_parameters(self)[key] = value
+
+    def __delitem__(self, key):
+        """ Removes a particular extra parameter."""
+        if self._extra_parameters is None:
+            raise KeyError(key)
+        _changing(self)
+        del _writable_extra_parameters(self)[key]
+
+    def __contains__(self, item):
+        """ Checks if a key is in the extra parameters."""
+        return item in (self._extra_parameters or _no_extra_parameters)
+
+    def __iter__(self):
+        """ Returns an iterator over the extra parameters."""
+        return iter(self._extra_parameters or _no_extra_parameters)
+
+    def keys(self):
+        """ Returns all the keys for the extra parameters."""
+        return (self._extra_parameters or _no_extra_parameters).keys()
+
+    def items(self):
+        """ Returns the items of the extra parameters."""
+        return (self._extra_parameters or _no_extra_parameters).items()
+
+
+# The LeafSpec of every Leaf made without any constraints.
+_no_constraints = LeafSpec()
+
+
+class Tree(object):
+    """ Object to work with a tree of settings.
+
+    Represents a tree of settings composed of one or more ``Tree`` that
+    can be nested and then one or more ``Leaf`` objects as the settings
+    themselves. The children of this ``Tree`` are ordered by the order
+    that each ``Tree`` and ``Leaf`` are added.
+
+    Parameters
+    ----------
+    children : anything that inherits collections.Mapping, optional
+        A ``dict`` or ``dict`` like object (inherits from
+        ``collections.Mapping``) of one or more ``Tree`` and/or
+        ``Leaf`` to be put into this ``Tree``. They are added in the
+        order that `children` is mapped. Each key is a POSIX path to
+        where to put the ``Leaf`` or ``Tree`` associated with it.
+    copy_policy : {None, 'deep', 'shallow', 'none', 'freeze'}, optional
+        See Attributes.
+    **keywords : optional
+        Aditional keyword arguments which are put in this ``Tree``.
+
+    Raises
+    ------
+    TypeError
+        If set to something invalid.
+
+    Attributes
+    ----------
+    copy_policy : {None, 'deep', 'shallow', 'none', 'freeze'}
+
+    Notes
+    -----
+    No recursion is used in this class. All operations walk through the
+    tree of settings with loops and explicit stacks, so how deep the
+    tree of settings can be nested is limited only by memory.
+
+    Every ``Tree`` and ``Leaf`` keeps a weak reference to the ``Tree``
+    it is in (the last one if put in more than one), so its absolute
+    path and the root ``Tree`` it is in can be looked up (``path`` and
+    ``root``). They are cached until a ``Tree`` is moved.
+
+    A root ``Tree`` (one that is not the child of another ``Tree``)
+    keeps a flat index of the absolute POSIX path of every ``Tree``
+    and ``Leaf`` nested in it along with a sorted ``list`` of the
+    paths, which are built the first time they are needed and then
+    kept up to date on every set and delete (including those done
+    directly on a nested ``Tree``). Getting by path and membership
+    checks are then done with a single lookup in the index instead of
+    walking the tree, and listing the paths (``list_all`` and
+    ``iter_prefix``) is done without sorting them.
+
+    Paths are parsed through a bounded cache shared by all access by
+    path (see ``path_cache_info``), so using the same paths over and
+    over again does not normalize and split them each time.
+
+    ``Tree`` and ``Leaf`` use ``__slots__`` instead of an instance
+    ``__dict__``, and the ``dict`` of extra parameters is only made
+    when the first one is set. On 64-bit CPython 3.9, a ``Leaf`` itself
+    (not counting its value and constraints) takes 128 bytes, down from
+    256, and an empty ``Tree`` (itself and its ``dict`` of children)
+    400 bytes, down from 512. On 3.11, they are 128 bytes (down from
+    416) and 232 bytes (down from 544). The figures vary with the
+    version of Python, so they are only a guide. What is used by a
+    ``Tree`` and everything in it is reported by ``memory_usage``.
+
+    See Also
+    --------
+    Leaf
+    collections.Mapping
+    memory_usage
+    path_cache_info
+
+    """
+    __slots__ = ('_parent', '_name', '_others', '_index',
+                 '_sorted_paths', '_version', '_moves', '_path_cache',
+                 '_saved_gen', '_history', '_snapshots', '_validation',
+                 '_interned', '_copy_policy', '_children',
+                 '_extra_parameters', '__weakref__')
+
+    def __init__(self, children=None, copy_policy=None, **keywords):
+        # This Tree starts out as a root Tree, so it has no parent (a
+        # weak reference to it is stored when it is put into another
+        # Tree along with the name it has there, and the other places
+        # it is in if it is put in more than one). The flat index of
+        # the absolute paths to every node is only built when it is
+        # first needed. The version is incremented every time a Tree
+        # or Leaf is put in or removed from this Tree or any nested in
+        # it, which is used to detect when things obtained from it may
+        # no longer be in it. The paths cached by everything in it are
+        # stale once a Tree with children is moved in or out of it
+        # (see _moved).
+        self._parent = None
+        self._name = None
+        self._others = None
+        self._index = None
+        self._sorted_paths = None
+        self._version = 0
+        self._moves = 0
+        self._path_cache = None
+
+        # What is kept to validate incrementally is only made when
+        # first needed.
+        self._validation = None
+
+        # Nothing is shared by dedupe in a new Tree.
+        self._interned = 0
+
+        # Nothing needs to be saved for snapshots taken before this Tree
+        # was made. The snapshots of it (or of what is in it) are kept
+        # track of once there are any.
+        self._saved_gen = _snapshot_gen
+        self._history = None
+        self._snapshots = None
+
+        # The copy policy is the default for every Leaf nested in this
+        # Tree (that doesn't set its own), so it must be set before the
+        # children are put in.
+        self._children = _ordered_dict()
+        self._copy_policy = None
+        self.copy_policy = copy_policy
+
+        # Add the elements of children one by one if it is dict like
+        if children is not None:
+            if not isinstance(children, Mapping):
+                raise TypeError('children must be a Mapping of '
+                                + 'Tree''s and Leaf''s.')
+            for k, v in children.items():
+                if isinstance(v, (Tree, Leaf)):
+                    self[k] = v
+                else:
+                    raise TypeError('children must be a Mapping of '
+                                    + 'Tree''s and Leaf''s.')
+
+        # Copy everything in keywords into the extra parameters
+        # dictionary, which is only made if there are any.
+        if len(keywords) != 0:
+            self._extra_parameters = copy.deepcopy(keywords)
+        else:
+            self._extra_parameters = None
+
+
+    @property
+    def path(self):
+        """ The absolute POSIX path to this ``Tree`` in its root ``Tree``.
+
+        str
+
+        ``'/'`` if this ``Tree`` is a root ``Tree``. If the same
+        ``Tree`` was put in more than one place, it is the last one
+        (for one shared by ``dedupe``, the first place it was in).
+
+        See Also
+        --------
+        root
+
+        """
+        return _locate(self)[1]
+
+    @property
+    def root(self):
+        """ The root ``Tree`` that this ``Tree`` is in.
+
+        Tree
+
+        This ``Tree`` itself if it is a root ``Tree``. If the same
+        ``Tree`` was put in more than one place, it is the last one
+        (for one shared by ``dedupe``, the first place it was in).
+
+        See Also
+        --------
+        path
+
+        """
+        return _locate(self)[0]
+
+    @property
+    def copy_policy(self):
+        """ The default copy policy of everything nested in this Tree.
+
+        {None, 'deep', 'shallow', 'none', 'freeze'}
+
+        How the value of each ``Leaf`` nested in this ``Tree`` is copied
+        when it is set and gotten, unless the ``Leaf`` or a ``Tree``
+        nested in this one (and that it is nested in) sets its own.
+        ``None`` means that of the ``Tree`` this one is nested in is
+        used, or ``'deep'`` if this is a root ``Tree``.
+
+        Raises
+        ------
+        TypeError
+            If set to something invalid.
+
+        See Also
+        --------
+        Leaf.copy_policy
+
+        """
+        return self._copy_policy
+
+    @copy_policy.setter
+    def copy_policy(self, value2):
+        _check_copy_policy(value2)
+        if self._interned == 2:
+            raise TypeError('Can''t change a Tree shared by dedupe.')
+        self._copy_policy = value2
+        # The copy policies cached by everything nested in this Tree
+        # are now stale.
+        if len(self._children) != 0:
+            _locate(self)[0]._moves += 1
+
+    def _own_state(self):
+        """ Gets the state of this Tree without its children.
+
+        Where this ``Tree`` is in another ``Tree`` and the index are not
+        part of its state (the index is rebuilt when needed and the
+        parent sets the location when it is restored).
+
+        """
+        state = _get_attributes(self)
+        for k in ('_parent', '_name', '_others', '_path_cache',
+                  '_index', '_sorted_paths', '_history', '_snapshots',
+                  '_validation'):
+            state[k] = None
+        state['_children'] = _ordered_dict()
+        return state
+
+    def __getstate__(self):
+        # The Trees nested in this one are put in a flat list along with
+        # everything else in them (as the index of the Tree it is in,
+        # its name there, and what it is) instead of in the children so
+        # that pickling a deeply nested Tree doesn't recurse for every
+        # level. A nested Tree is given as its class and state the first
+        # time it is gotten to and as its index after that.
+        state = self._own_state()
+        nested = []
+        positions = {id(self): 0}
+        stack = [(0, self)]
+        while len(stack) != 0:
+            i, tree = stack.pop()
+            for k, v in tree._children.items():
+                if not isinstance(v, Tree):
+                    nested.append((i, k, 'node', v))
+                elif id(v) in positions:
+                    nested.append((i, k, 'same', positions[id(v)]))
+                else:
+                    positions[id(v)] = len(positions)
+                    nested.append((i, k, 'tree', (type(v),
+                                                  v._own_state())))
+                    stack.append((positions[id(v)], v))
+        state['_nested'] = nested
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        nested = state.pop('_nested', ())
+        self._others = None
+        self._moves = 0
+        self._validation = None
+        self._snapshots = None
+        self._interned = 0
+        _set_attributes(self, state)
+        self._saved_gen = _snapshot_gen
+        for k, v in self._children.items():
+            if isinstance(v, (Tree, Leaf)):
+                _add_place(v, self, k)
+        trees = [self]
+        for i, k, kind, v in nested:
+            if kind == 'tree':
+                node = v[0].__new__(v[0])
+                node.__setstate__(v[1])
+                trees.append(node)
+            elif kind == 'same':
+                node = trees[v]
+            else:
+                node = v
+            trees[i]._children[k] = node
+            if isinstance(node, (Tree, Leaf)):
+                _add_place(node, trees[i], k)
+
+    def __copy__(self):
+        """ Makes a shallow copy (see ``clone``).
+
+        The copy is a root ``Tree``.
+
+        """
+        return self._clone({}, False)
+
+    def __deepcopy__(self, memo):
+        """ Makes a deep copy (see ``clone``).
+
+        The copy is a root ``Tree``.
+
+        """
+        return self._clone(memo, True)
+
+    def clone(self, deep=True):
+        """ Makes a copy of this Tree.
+
+        The whole structure is copied directly, without going through
+        ``__setitem__`` and the ``Leaf`` setters (so nothing is
+        validated again) and sharing the constraints of each ``Leaf``
+        with its copy since they can't be changed. It is what
+        ``copy.deepcopy`` and ``copy.copy`` use.
+
+        Parameters
+        ----------
+        deep : bool, optional
+            Whether to deep copy the ``Leaf`` values and the extra
+            parameters (``True``) or share them with the copy
+            (``False``). Either way, every ``Tree`` and ``Leaf`` is
+            copied since they can only be in one ``Tree``. Frozen values
+            (see ``Leaf.copy_policy``) are always shared.
+
+        Returns
+        -------
+        tree : Tree
+            The copy, which is a root ``Tree``.
+
+        """
+        return self._clone({}, deep)
+
+    def _clone(self, memo, deep, gen=None):
+        """ Does the work of clone (see it).
+
+        Parameters
+        ----------
+        memo : dict
+            The memo of what has been copied already (see
+            ``copy.deepcopy``).
+        deep : bool
+            See ``clone``.
+        gen : int, optional
+            The generation of snapshots to copy this ``Tree`` as it was
+            for, or ``None`` to copy it as it is.
+
+        Returns
+        -------
+        tree : Tree
+            The copy, which is a root ``Tree``.
+
+        """
+        tree = memo.get(id(self))
+        if tree is not None:
+            return tree
+
+        # Go through each Tree, copying it and putting copies of its
+        # children in the copy directly (they are already valid). The
+        # children are put on the stack in reverse so that they are
+        # put in the copies in the same order.
+        root = None
+        stack = [(self, None, None)]
+        while len(stack) != 0:
+            source, parent, name = stack.pop()
+            if isinstance(source, Leaf):
+                if gen is not None:
+                    source = _state_at(source, gen)
+                node = source._clone(memo, deep)
+            elif not isinstance(source, Tree):
+                # Something invalid that slipped in is copied as is.
+                if deep:
+                    source = copy.deepcopy(source, memo)
+                parent._children[name] = source
+                continue
+            else:
+                node = memo.get(id(source))
+                if node is None:
+                    node = type(source).__new__(type(source))
+                    for k in _slots(type(source)):
+                        setattr(node, k, getattr(source, k))
+                    if hasattr(source, '__dict__'):
+                        node.__dict__.update(source.__dict__)
+                    node._others = None
+                    node._index = None
+                    node._sorted_paths = None
+                    node._validation = None
+                    node._version = 0
+                    node._moves = 0
+                    node._saved_gen = _snapshot_gen
+                    node._history = None
+                    node._snapshots = None
+                    node._children = _ordered_dict()
+                    if gen is None:
+                        extra = source._extra_parameters
+                    else:
+                        extra = _extra_parameters_at(source, gen)
+                    if extra is None:
+                        node._extra_parameters = None
+                    elif deep:
+                        node._extra_parameters = copy.deepcopy(extra,
+                                                               memo)
+                    else:
+                        node._extra_parameters = copy.copy(extra)
+                    memo[id(source)] = node
+                    if gen is None:
+                        children = source._children
+                    else:
+                        children = _state_at(source, gen)
+                    for k, v in reversed(list(children.items())):
+                        stack.append((v, node, k))
+            node._path_cache = None
+            if parent is None:
+                root = node
+                node._parent = None
+                node._name = None
+            else:
+                parent._children[name] = node
+                _add_place(node, parent, name)
+
+        # What is nested in the copy that was shared by dedupe is still
+        # shared (and so interned), but the copy itself isn't.
+        if isinstance(root, Tree) and root._interned == 2:
+            root._interned = 1
+        return root
+
+    # Implement a dictionary interface for all the chilren.
+
+    def __len__(self):
+        """ Returns the number of children in this Tree."""
+        return len(self._children)
+
+    def __contains__(self, item):
+        """ Checks if a key is in one of the children.
+
+        Nothing is raised or copied while checking.
+
+        """
+        if not isinstance(item, str):
+            return False
+        key, names, trailing, is_root = _parse_path(item)
+        if self._find_node(key, names) is not None:
+            return True
+        leaf, subpath = self._find_extra_parameter(names, trailing)
+        return leaf is not None and subpath in leaf
+
+    def __iter__(self):
+        """ Returns an iterator over the children."""
+        return self._children.__iter__()
+
+    def keys(self):
+        """ Returns all the keys for the children."""
+        return self._children.keys()
+
+    def items(self):
+        """ Returns all the children and their names in this Tree."""
+        return self._children.items()
+
+    def __getitem__(self, path):
+        """ Gets by path.
+
+        Gets by a POSIX style path. Each subdirectory in the path is a
+        ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
+        file part accesses the particular ``Leaf`` or ``Tree``. In all
+        cases, if a ``Leaf`` is reached in the path and there is more
+        path after that, then the rest references an extra parameter in
+        that ``Leaf``. The value of the ``Leaf`` or ``list`` of the
+        children of the ``Tree`` is obtained if the path does not end in
+        a trailing ``'/'``. If a trailing ``'/'`` is present, then the
+        ``Leaf`` or ``Tree`` pointed to by `path` is returned.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the desired setting. ``'/'`` is the root
+            of this ``Tree``. A trailing ``'/'`` means return the Leaf
+            or Tree pointed to by `path` instead of its value
+            (``Leaf``) or a ``list`` of its children (``Tree``).
+
+        Returns
+        -------
+        value: Tree or Leaf or value or list of str, optional
+            The ``Leaf`` or ``Tree`` pointed to, the value of the
+            ``Leaf``, or a ``list`` of the children of the ``Tree``.
+
+        Raises
+        ------
+        KeyError
+            If the setting pointed to by `path` cannot be found or
+            `path` is not an ``str``.
+
+        See Also
+        --------
+        posixpath
+        Leaf.value
+
+        """
+        return self._getsetdel_item(path, 'get')
+
+    def __setitem__(self, path, value):
+        """ Sets by path.
+
+        Sets by a POSIX style path. Each subdirectory in the path is a
+        ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
+        file part accesses the particular ``Leaf`` or ``Tree``. In all
+        cases, if a ``Leaf`` is reached in the path and there is more
+        path after that, then the rest references an extra parameter in
+        that ``Leaf`` which will be set to `value`. If `value` is a
+        ``Tree`` or ``Leaf``, then the location pointed to by `path` is
+        set to `value` even if parent ``Tree`` need to be
+        made. Otherwise, `path` must point to a ``Leaf``, in which case
+        its value is set to `leaf`.
+ 
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the desired setting. ``'/'`` is the root
+            of this ``Tree``.
+        value : Tree or Leaf or value, optional
+            The value to set. If it is a ``Tree`` or ``Leaf``, then
+            `path` points to the desired name for it. Otherwise, it is a
+            value and `path` must point to a ``Leaf`` which will have
+            its value set to `value`.
+
+        Raises
+        ------
+        KeyError
+            If the setting pointed to by `path` cannot be found or
+            `path` is not an ``str``.
+        TypeError
+            If trying to set a ``Tree`` to not a ``Tree`` or ``Leaf``.
+        ValueError
+            If `value` is a ``Tree`` this one is or is nested in (a
+            ``Tree`` can't be put in itself).
+
+        See Also
+        --------
+        posixpath
+        Leaf.value
+
+        """
+        self._getsetdel_item(path, 'set', value=value)
+
+    def __delitem__(self, path):
+        """ Deletes by path.
+
+        Deletes by a POSIX style path. Each subdirectory in the path is
+        a ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
+        file part accesses the particular ``Leaf`` or ``Tree``. In all
+        cases, if a ``Leaf`` is reached in the path and there is more
+        path after that, then the rest references an extra parameter in
+        that ``Leaf``. The ``Leaf``, ``Tree``, or ``Leaf`` extra
+        parameter pointed to by `path` is deleted.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the desired setting.
+
+        Raises
+        ------
+        KeyError
+            If the setting pointed to by `path` cannot be found or
+            `path` is not an ``str``.
+
+        See Also
+        --------
+        posixpath
+        Leaf.value
+
+        """
+        self._getsetdel_item(path, 'del')
+
+    def get(self, path, default=None):
+        """ Gets by path, returning a default if it isn't there.
+
+        Gets by a POSIX style path just like ``__getitem__`` except that
+        `default` is returned if the setting pointed to by `path` cannot
+        be found or `path` is not an ``str``. No exceptions are raised
+        and nothing is copied while looking for it.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the desired setting (see
+            ``__getitem__``).
+        default : any, optional
+            What to return if the setting can't be found.
+
+        Returns
+        -------
+        value: Tree or Leaf or value or list of str or default
+            What ``__getitem__`` would return, or `default` if the
+            setting can't be found.
+
+        See Also
+        --------
+        __getitem__
+
+        """
+        if not isinstance(path, str):
+            return default
+        if path == 2 * posixpath.sep:
+            return self
+        elif path == posixpath.sep:
+            return list(self._children.keys())
+        key, names, trailing, is_root = _parse_path(path)
+        if trailing and self._interned == 1:
+            self._unshare(names)
+        node = self._find_node(key, names)
+        if node is not None:
+            if trailing:
+                return node
+            elif isinstance(node, Leaf):
+                return node.value
+            else:
+                return list(node._children.keys())
+        leaf, subpath = self._find_extra_parameter(names, trailing)
+        if leaf is not None and subpath in leaf:
+            return leaf[subpath]
+        return default
+
+    def get_many(self, paths):
+        """ Gets by several paths at once.
+
+        Gets by each path like ``__getitem__`` does, but the paths are
+        grouped by the parts they have in common so that each ``Tree``
+        along the way is only gone through once instead of once for
+        each path. If the index of the root ``Tree`` has already been
+        built, it is used instead.
+
+        Parameters
+        ----------
+        paths : iterable of str
+            The POSIX style paths to get by (see ``__getitem__``).
+
+        Returns
+        -------
+        values : list
+            What ``__getitem__`` would return for each path, in the same
+            order as `paths`.
+
+        Raises
+        ------
+        KeyError
+            If the setting pointed to by any path cannot be found or
+            any path is not an ``str``.
+
+        See Also
+        --------
+        __getitem__
+        set_many
+
+        """
+        paths = list(paths)
+        for path in paths:
+            if not isinstance(path, str):
+                raise KeyError('path must be a str.')
+        parsed = [_parse_path(path) for path in paths]
+        if self._interned == 1:
+            for p in parsed:
+                if p[2]:
+                    self._unshare(p[1])
+        nodes = self._find_nodes([p[:2] for p in parsed])
+
+        # Anything that isn't a Tree or Leaf found directly (extra
+        # parameters, the root, missing ones, etc.) is gotten the
+        # normal way.
+        values = []
+        for path, p, node in zip(paths, parsed, nodes):
+            if node is None or p[3]:
+                values.append(self._getsetdel_item(path, 'get'))
+            elif p[2]:
+                values.append(node)
+            elif isinstance(node, Leaf):
+                values.append(node.value)
+            else:
+                values.append(list(node._children.keys()))
+        return values
+
+    def set_many(self, values):
+        """ Sets by several paths at once.
+
+        Sets by each path like ``__setitem__`` does, in the order of
+        `values`. Every path is found and checked before anything is
+        set, so that nothing is set if any of them can't be. If none of
+        the values are a ``Tree`` or ``Leaf``, the paths are grouped by
+        the parts they have in common so that each ``Tree`` along the
+        way is only gone through once instead of once for each path.
+        Each value set on a ``Leaf`` is checked against the constraints
+        on the value itself (``valid_value_types``, ``allowed_values``,
+        ``forbidden_values``, and ``validators``). Validator functions,
+        which depend on the other settings, are not run, so validation
+        (such as ``is_valid``) can be done once after all the values are
+        set. A path into a ``Tree`` or ``Leaf`` that is put in by an
+        earlier path can only be checked when it is set.
+
+        Parameters
+        ----------
+        values : dict or anything inheriting collections.Mapping
+            The POSIX style paths to set by (see ``__setitem__``) as the
+            keys and what to set them to as the values.
+
+        Raises
+        ------
+        TypeError
+            If `values` doesn't inherit from ``collections.Mapping`` or
+            for any reason ``__setitem__`` would raise it.
+        KeyError
+            If the setting pointed to by any path cannot be found or
+            any path is not an ``str``.
+        ValueError
+            If any value isn't valid for the constraints of its
+            ``Leaf`` or for any reason ``__setitem__`` would raise it.
+
+        See Also
+        --------
+        __setitem__
+        get_many
+        set_values
+        Leaf.is_valid
+
+        """
+        if not isinstance(values, Mapping):
+            raise TypeError('values must be dict-like (inherit from '
+                            + 'collections.Mapping).')
+        items = list(values.items())
+        for path, value in items:
+            if not isinstance(path, str):
+                raise KeyError('path must be a str.')
+        parsed = [_parse_path(path) for path, value in items]
+        if self._interned == 1:
+            for key, names, trailing, is_root in parsed:
+                self._unshare(names)
+        nodes = self._find_nodes([p[:2] for p in parsed])
+
+        # What is stored in each Leaf (see Leaf._prepare_value) is made
+        # and checked first, and is None for what is set the normal way
+        # (extra parameters, Trees and Leaves being put in, and paths
+        # into those put in by an earlier path). The compiled validator
+        # of each LeafSpec is used unless it has a validator function,
+        # in which case the one without it is compiled once.
+        prepared = []
+        placed = []
+        validators = dict()
+        for (path, value), (key, names, trailing, is_root), node \
+                in zip(items, parsed, nodes):
+            prepared.append(None)
+            if is_root:
+                raise KeyError('Can''t set or del root Tree.')
+            if len(placed) != 0 \
+                    and any([key == k or key.startswith(k + posixpath.sep)
+                             for k in placed]):
+                continue
+            if isinstance(value, (Tree, Leaf)):
+                tree = self
+                for name in names[:-1]:
+                    child = tree._children.get(name)
+                    if not isinstance(child, Tree):
+                        if child is not None \
+                                and not isinstance(child, Leaf):
+                            raise KeyError(name + ' is not a Tree or '
+                                           + 'Leaf. Only Trees and '
+                                           + 'Leaves can hold things.')
+                        break
+                    tree = child
+                if isinstance(value, Tree) and _nested_in(tree, value):
+                    raise ValueError('Can''t put a Tree in itself or a '
+                                     + 'Tree nested in it.')
+                placed.append(key)
+            elif isinstance(node, Leaf):
+                prepared[-1] = node._prepare_value(value)
+                spec = node._spec
+                validator = spec._validator
+                if spec._validator_function is not None:
+                    if id(spec) not in validators:
+                        validators[id(spec)] = (
+                            spec, _compile_validator(spec, False))
+                    validator = validators[id(spec)][1]
+                try:
+                    valid = validator(prepared[-1][0], None)
+                except Exception:
+                    valid = False
+                if not valid:
+                    raise ValueError(repr(value) + ' is not a valid '
+                                     + 'value for ' + path + '.')
+            elif isinstance(node, Tree):
+                raise TypeError('Can''t set a Tree to a value.')
+            elif self._find_extra_parameter(names, trailing)[0] is None:
+                raise KeyError('Couldn''t find ' + path + '.')
+
+        for (path, value), node, stored in zip(items, nodes, prepared):
+            if stored is None:
+                self._getsetdel_item(path, 'set', value=value)
+            else:
+                _changing(node)
+                node._value, node._frozen = stored
+
+    def _getsetdel_item(self, path, operation, value=None):
+        """ Gets, sets, or deletes by path.
+
+        Gets, sets, or deletes by a POSIX style path. Each subdirectory
+        in the path is a ``Tree`` that holds one or more ``Tree`` and/or
+        ``Leaf``. The file part accesses the particular ``Leaf`` or
+        ``Tree``. In all cases, if a ``Leaf`` is reached in the path and
+        there is more path after that, then the rest references an extra
+        parameter in that ``Leaf``.
+
+        If doing a get `operation`, the value of the ``Leaf`` or
+        ``list`` of the children of the ``Tree`` is obtained if the path
+        does not end in a trailing ``'/'``. If a trailing ``'/'`` is
+        present, then the ``Leaf`` or ``Tree`` pointed to by `path` is
+        returned.
+
+        If doing a set `operation` and `value` is a ``Tree`` or
+        ``Leaf``, then the location pointed to by `path` is set to
+        `value` even if parent ``Tree`` need to be made. Otherwise,
+        `path` must point to a ``Leaf``, in which case its value is set
+        to `leaf`.
+
+        If doing a del `operation`, the ``Leaf``, ``Tree``, or ``Leaf``
+        extra parameter  pointed to by `path` is deleted.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the desired setting. ``'/'`` is the root
+            of this ``Tree``. A trailing ``'/'`` has no effect unless
+            we are doing a get 'operation' in which case its presence
+            means return the Leaf or Tree pointed to by `path` instead
+            of its value (``Leaf``) or a ``list`` of its children
+            (``Tree``).
+        operation : {'get', 'set', 'del'}
+            Whether to get, set, or delete.
+        value : Tree or Leaf or value, optional
+            When doing a set `operation`, the value to set. If it is a
+            ``Tree`` or ``Leaf``, then `path` points to the desired name
+            for it. Otherwise, it is a value and `path` must point to a
+            ``Leaf`` which will have its value set to `value`.
+
+        Returns
+        -------
+        value: Tree or Leaf or value or list of str, optional
+            If doing a get `operation`, the ``Leaf`` or ``Tree``
+            pointed to, the value of the ``Leaf``, or a ``list`` of
+            the children of the ``Tree``.
+
+        Raises
+        ------
+        KeyError
+            If the setting pointed to by `path` cannot be found or
+            `path` is not an ``str``.
+        ValueError
+            `operation` is not one of the allowed operations.
+        TypeError
+            If trying to set a ``Tree`` to not a ``Tree`` or ``Leaf``.
+
+        See Also
+        --------
+        posixpath
+        Leaf.value
+
+        """
+        # Check that operation is one of the allowed values.
+        if operation not in ('get', 'set', 'del'):
+            raise ValueError('operation must be ''get'', ''set'', '
+                             + 'or ''del''.')
+
+        # Check that path is an str.
+        if not isinstance(path, str):
+            raise KeyError('path must be a str.')
+
+        # If operation is get and path is just '/', then return this
+        # Tree. If it is two in a row, return the list of all
+        # children.
+        if operation == 'get':
+            if path == 2 * posixpath.sep:
+                return self
+            elif path == posixpath.sep:
+                return list(self._children.keys())
+
+        # Parse the path (normalizing out '../' and stuff) into the
+        # names of each part of it.
+        key, names, trailing, is_root = _parse_path(path)
+
+        # Whatever is shared by dedupe along the path that is about to
+        # be changed (or handed out) is copied first.
+        if self._interned == 1:
+            if operation == 'del' or (operation == 'set' and isinstance(
+                    value, (Tree, Leaf))):
+                self._unshare(names[:-1])
+            elif operation == 'set' or trailing:
+                self._unshare(names)
+
+        if operation == 'get':
+            # If this is a root Tree, the Tree or Leaf being pointed to
+            # can be looked up directly in the index. If it isn't there,
+            # then the path has to be walked since it could be pointing
+            # to an extra parameter of a Leaf (or not exist at all).
+            if self._parent is None:
+                node = self._get_index().get(key)
+                if node is not None:
+                    if trailing:
+                        return node
+                    elif isinstance(node, Leaf):
+                        return node.value
+                    else:
+                        return list(node._children.keys())
+
+            # A path that normalizes to the root gets this Tree or its
+            # children like '//' and '/' do.
+            if is_root:
+                if trailing:
+                    return self
+                else:
+                    return list(self._children.keys())
+
+        # '/' isn't allowed for set and del
+        if is_root:
+            raise KeyError('Can''t set or del root Tree.')
+
+        # Walk down the Trees to the one holding the last part of the
+        # path. If a part is not in the children, the Trees for the
+        # rest of the path must be made (from the bottom up so that
+        # they are only put into this Tree once) if value is a Tree or
+        # Leaf and we are doing a set operation and an error must be
+        # raised otherwise. If a Leaf is reached, the remainder of the
+        # path is an extra parameter of it.
+        tree = self
+        for i in range(len(names) - 1):
+            name = names[i]
+            if name not in tree._children:
+                if operation == 'set' \
+                        and isinstance(value, (Tree, Leaf)):
+                    if isinstance(value, Tree) and _nested_in(tree, value):
+                        raise ValueError('Can''t put a Tree in itself or '
+                                         + 'a Tree nested in it.')
+                    node = value
+                    for k in reversed(names[(i + 1):]):
+                        child = Tree()
+                        child._set_child(k, node)
+                        node = child
+                    tree._set_child(name, node)
+                    return
+                else:
+                    raise KeyError('Couldn''t find ' + name + '.')
+            child = tree._children[name]
+            if isinstance(child, Leaf):
+                subpath = posixpath.sep.join(names[(i + 1):])
+                if operation == 'get':
+                    if trailing:
+                        subpath = subpath + posixpath.sep
+                    return child[subpath]
+                elif operation == 'set':
+                    child[subpath] = value
+                else:
+                    del child[subpath]
+                return
+            elif not isinstance(child, Tree):
+                raise KeyError(name + ' is not a Tree or Leaf. '
+                               'Only Trees and Leaves can hold '
+                               + 'things.')
+            tree = child
+
+        # The last part of the path specifies the particular setting
+        # that is wanted. For a get, it must be in the Tree's children
+        # or it is an error. For a get, the Leaf or Tree itself is
+        # returned if there was a trailing '/' and otherwise the value
+        # is returned for a Leaf and the list of children returned for
+        # a Tree. For a set, if value is a Tree or Leaf, then it is
+        # set. If value is just a value, the Leaf's value will be set
+        # if there is a Leaf there (otherwise an error is thrown). If it
+        # is a del, it is deleted if present and an error thrown if not.
+        name = names[-1]
+        if operation == 'get':
+            if name not in tree._children:
+                raise KeyError('Couldn''t find ' + name + '.')
+            node = tree._children[name]
+            if trailing:
+                return node
+            elif isinstance(node, Leaf):
+                return node.value
+            elif isinstance(node, Tree):
+                return list(node.keys())
+            else:
+                raise KeyError(name + ' is an invalid object.')
+        elif operation == 'set' and isinstance(value, (Leaf, Tree)):
+            tree._set_child(name, value)
+        elif name not in tree._children:
+            raise KeyError('Couldn''t find ' + name + '.')
+        elif operation == 'del':
+            tree._del_child(name)
+        elif isinstance(tree._children[name], Tree):
+            raise TypeError('Can''t set a Tree to a value.')
+        elif isinstance(tree._children[name], Leaf):
+            tree._children[name].value = value
+        else:
+            raise KeyError(name + ' is an invalid object.')
+
+    def _set_child(self, name, node):
+        """ Puts a Tree or Leaf in the children, updating the index.
+
+        The ``Tree`` or ``Leaf`` `node` is put into the children with
+        the name `name` (replacing anything already there) and made a
+        child of this one (a ``Tree`` no longer keeps its own index or
+        what it kept to validate incrementally).
+        If the root ``Tree`` this one is in has built its index, the
+        paths to `node` and everything nested in it are added to the
+        index (and those of what it replaced removed).
+
+        If `node` is still in another place (in this ``Tree`` or
+        another one), it is then in both (see ``_add_place``).
+
+        Raises
+        ------
+        ValueError
+            If `node` is this ``Tree`` or one it is nested in.
+
+        """
+        if isinstance(node, Tree) and _nested_in(self, node):
+            raise ValueError('Can''t put a Tree in itself or a Tree '
+                             + 'nested in it.')
+        _changing(self)
+        old = self._children.get(name)
+        if old is not node:
+            _leaving(old, self)
+        _moved(node, _locate(node)[0])
+        self._children[name] = node
+        if old is not node:
+            self._orphan(old, name)
+        _add_place(node, self, name)
+        if self._interned == 0 and (isinstance(node, Tree)
+                                    and node._interned != 0
+                                    or isinstance(node, Leaf)
+                                    and _is_interned(node)):
+            _mark_interned_above(self)
+        clock = None
+        if isinstance(node, Tree):
+            node._index = None
+            node._sorted_paths = None
+            node._validation = None
+            clock, node._snapshots = node._snapshots, None
+        root, prefix = self._root_and_prefix(changed=True)
+        if clock is not None and len(clock.gens) != 0:
+            # The snapshots of node (or what is in it) are now those of
+            # the root Tree it is in.
+            if root._snapshots is None:
+                root._snapshots = _SnapshotClock()
+            clock.merge_into(root._snapshots)
+        if root._index is not None:
+            path = prefix + posixpath.sep + name
+            if old is not None:
+                root._index_remove(path, old)
+            root._index_add(path, node)
+
+    def _del_child(self, name):
+        """ Deletes a child, updating the index.
+
+        Removes the child with the name `name` from the children. If
+        the root ``Tree`` this one is in has built its index, the paths
+        to the child and everything nested in it are removed from it.
+
+        """
+        _changing(self)
+        _leaving(self._children[name], self)
+        old = self._children.pop(name)
+        self._orphan(old, name)
+        root, prefix = self._root_and_prefix(changed=True)
+        if root._index is not None:
+            root._index_remove(prefix + posixpath.sep + name, old)
+
+    def _unshare(self, names):
+        """ Copies what is shared by dedupe along a path in this Tree.
+
+        Goes down the path, replacing each ``Tree`` and ``Leaf`` that
+        is interned (see ``_is_interned``) by a copy of it that isn't,
+        so that it can be changed without changing the other places it
+        is in. Only the one ``Tree`` or ``Leaf`` is copied, not what is
+        nested in it. Stops once there is nothing interned further
+        down, or at the first ``Leaf`` (the rest of the path is an
+        extra parameter in it).
+
+        Parameters
+        ----------
+        names : tuple of str
+            The names of each part of the path.
+
+        """
+        tree = self
+        for name in names:
+            if tree._interned != 1:
+                return
+            child = tree._children.get(name)
+            if isinstance(child, Tree):
+                if child._interned == 2:
+                    child = tree._unshare_child(name)
+            elif isinstance(child, Leaf):
+                if _is_interned(child):
+                    tree._unshare_child(name)
+                return
+            else:
+                return
+            tree = child
+
+    def _unshare_child(self, name):
+        """ Replaces an interned child by a copy of it that isn't.
+
+        A ``Tree`` is copied along with the ``Leaf`` in it, but the
+        copy has the same ``Tree`` in it (still interned). The paths of
+        everything are the same as before, so only the index entries of
+        what was copied are changed (rather than doing ``_set_child``).
+
+        Returns
+        -------
+        node : Tree or Leaf
+            The copy, which is now the child with the name `name`.
+
+        """
+        node = self._children[name]
+        memo = dict()
+        if isinstance(node, Tree):
+            memo = dict([(id(v), v) for v in node._children.values()
+                         if isinstance(v, Tree)])
+        new = node._clone(memo, False)
+        _changing(self)
+        self._children[name] = new
+        self._orphan(node, name)
+        _add_place(new, self, name)
+        root, prefix = self._root_and_prefix(changed=True)
+        if root._index is not None:
+            path = prefix + posixpath.sep + name
+            copied = [(path, new)]
+            if isinstance(new, Tree):
+                copied.extend([(path + posixpath.sep + k, v)
+                               for k, v in new._children.items()
+                               if isinstance(v, Leaf)])
+            root._index.update(copied)
+            if root._validation is not None:
+                root._validation.dirty.update([k for k, v in copied
+                                               if isinstance(v, Leaf)])
+        return new
+
+    def _orphan(self, node, name):
+        """ Makes a Tree or Leaf no longer a child of this one.
+
+        It was the child with the name `name`, and has already been
+        removed from the children. If it is still in another place (see
+        ``_add_place``), that becomes its parent.
+
+        """
+        if not isinstance(node, (Tree, Leaf)):
+            return
+        if node._parent is not None and node._parent() is self \
+                and node._name == name:
+            _moved(node, _locate(self)[0])
+            _fix_parent(node)
+        elif node._others is not None:
+            node._others = [(ref, k) for ref, k in node._others
+                            if ref() is not self or k != name] or None
+            # Whether it is in more than one place is cached with the
+            # paths of it and everything nested in it.
+            node._path_cache = None
+            root = _locate(node)[0]
+            if root is not None:
+                root._moves += 1
+
+    def _root_and_prefix(self, changed=False):
+        """ Gets the root Tree and the absolute path to this Tree.
+
+        Follows the parents up to the root ``Tree`` that this ``Tree``
+        is in.
+
+        Parameters
+        ----------
+        changed : bool, optional
+            Whether a ``Tree`` or ``Leaf`` was just put in or removed
+            from this ``Tree``, in which case the version of this
+            ``Tree`` and every one it is nested in is incremented.
+
+        Returns
+        -------
+        root : Tree
+            The root ``Tree``.
+        prefix : str
+            The absolute POSIX path to this ``Tree`` in `root` without a
+            trailing ``'/'`` (``''`` if this ``Tree`` is the root).
+
+        """
+        names = []
+        node = self
+        shared = False
+        if changed:
+            node._version += 1
+        while node._parent is not None:
+            parent = node._parent()
+            if parent is None \
+                    or parent._children.get(node._name) is not node:
+                # The parent no longer exists or this Tree is no longer
+                # in it (the parent was copied with this Tree), so this
+                # is now a root unless it is in another place.
+                if _fix_parent(node):
+                    continue
+                break
+            shared = shared or node._others is not None
+            names.append(node._name)
+            node = parent
+            if changed:
+                node._version += 1
+        names.append('')
+        if shared and changed:
+            self._shared_changed(node)
+        return node, posixpath.sep.join(reversed(names))
+
+    def _shared_changed(self, root):
+        """ Marks that this Tree changed in every place it is in.
+
+        Used when this ``Tree`` (or one it is nested in) is in more than
+        one place (see ``_add_place``). The version of every ``Tree`` it
+        is nested in through the other places is incremented, and the
+        root ``Tree`` they are in throw away their index and what they
+        kept to validate incrementally (they are rebuilt when next
+        needed). `root`, the root ``Tree`` found by following the
+        parents up, keeps them if this ``Tree`` is only in it once,
+        since the caller updates them.
+
+        """
+        seen = set()
+        stack = [(self, False)]
+        while len(stack) != 0:
+            node, other = stack.pop()
+            parents = _parents(node)
+            if len(parents) == 0:
+                if other or id(node) in seen:
+                    node._index = None
+                    node._sorted_paths = None
+                    node._validation = None
+                seen.add(id(node))
+                continue
+            for i, (parent, name) in enumerate(parents):
+                if other or i != 0:
+                    parent._version += 1
+                stack.append((parent, other or i != 0))
+
+    def _walk(self, prefix=''):
+        """ Iterates over every Tree and Leaf nested in this Tree.
+
+        Goes depth first through the children in order using an explicit
+        stack (no recursion). Anything in the children that is not a
+        ``Tree`` or ``Leaf`` is skipped.
+
+        Parameters
+        ----------
+        prefix : str, optional
+            What to put before the path to each child, which must not
+            end in a ``'/'``.
+
+        Yields
+        ------
+        path : str
+            The POSIX path to the ``Tree`` or ``Leaf`` (`prefix` plus
+            the absolute path to it in this ``Tree``).
+        node : Tree or Leaf
+            The ``Tree`` or ``Leaf``.
+
+        """
+        stack = [(prefix + posixpath.sep + k, v)
+                 for k, v in reversed(list(self._children.items()))]
+        while len(stack) != 0:
+            path, node = stack.pop()
+            if isinstance(node, Tree):
+                yield path, node
+                stack.extend([(path + posixpath.sep + k, v)
+                              for k, v in
+                              reversed(list(node._children.items()))])
+            elif isinstance(node, Leaf):
+                yield path, node
+
+    def _get_index(self):
+        """ Gets the index of this Tree, building it if needed.
+
+        The sorted ``list`` of the paths in the index is built along
+        with it.
+
+        Returns
+        -------
+        index : dict
+            ``dict`` of the absolute POSIX path to every ``Tree`` and
+            ``Leaf`` nested in this ``Tree`` (as the keys) and the
+            ``Tree`` and ``Leaf`` themselves (as the values).
+
+        """
+        if self._index is None:
+            self._index = dict(self._walk())
+            self._sorted_paths = sorted(self._index)
+        return self._index
+
+    def _index_add(self, path, node):
+        """ Adds a node and everything nested in it to the index.
+
+        Every ``Leaf`` added is marked as changed if this ``Tree``
+        validates incrementally.
+
+        """
+        added = [(path, node)]
+        if isinstance(node, Tree):
+            added.extend(node._walk(prefix=path))
+        added = [(k, v) for k, v in added if k not in self._index]
+        self._index.update(added)
+        if self._validation is not None:
+            self._validation.dirty.update([k for k, v in added
+                                           if isinstance(v, Leaf)])
+
+        # A few paths are inserted into their places in the sorted
+        # paths, but it is faster to sort everything again when there
+        # are a lot of them (it is mostly already sorted).
+        if len(added) <= 8:
+            for k, v in added:
+                bisect.insort(self._sorted_paths, k)
+        else:
+            self._sorted_paths.extend([k for k, v in added])
+            self._sorted_paths.sort()
+
+    def _index_remove(self, path, node):
+        """ Removes a node and everything nested in it from the index.
+
+        They are also forgotten by what is kept to validate
+        incrementally.
+
+        """
+        paths = self._sorted_paths
+        removed = []
+        i = bisect.bisect_left(paths, path)
+        if i < len(paths) and paths[i] == path:
+            removed.append(path)
+            del paths[i]
+            del self._index[path]
+        lo, hi = self._sorted_range(path + posixpath.sep,
+                                    path + _after_sep)
+        for k in paths[lo:hi]:
+            del self._index[k]
+        if self._validation is not None:
+            removed.extend(paths[lo:hi])
+            self._validation.forget(removed)
+        del paths[lo:hi]
+
+    def _sorted_range(self, lo, hi):
+        """ Gets the range of the sorted paths between two bounds.
+
+        Parameters
+        ----------
+        lo : str
+            The lower bound (inclusive).
+        hi : str
+            The upper bound (exclusive).
+
+        Returns
+        -------
+        start : int
+            The index in the sorted paths of the first one that is at
+            least `lo`.
+        stop : int
+            The index in the sorted paths after the last one that is
+            less than `hi`.
+
+        """
+        return (bisect.bisect_left(self._sorted_paths, lo),
+                bisect.bisect_left(self._sorted_paths, hi))
+
+    def _find_node(self, key, names):
+        """ Finds the Tree or Leaf at a parsed path.
+
+        Parameters
+        ----------
+        key : str
+            The normalized absolute path (see ``_PathCache.parse``).
+        names : tuple of str
+            The names of each part of the path.
+
+        Returns
+        -------
+        node : Tree or Leaf or None
+            The ``Tree`` or ``Leaf`` pointed to, or ``None`` if there
+            isn't one (extra parameters are not looked in).
+
+        """
+        if len(names) == 0:
+            return self
+        if self._parent is None:
+            return self._get_index().get(key)
+
+        # If the root Tree this one is in has built its index, it can
+        # be used with the path to this Tree put in front of key.
+        root, prefix = _locate(self)
+        if root._index is not None:
+            if root is self:
+                return root._index.get(key)
+            return root._index.get(prefix + key)
+        node = self
+        for name in names:
+            if not isinstance(node, Tree):
+                return None
+            node = node._children.get(name)
+        if isinstance(node, (Tree, Leaf)):
+            return node
+        return None
+
+    def _find_extra_parameter(self, names, trailing):
+        """ Finds the Leaf a parsed path to an extra parameter is in.
+
+        Parameters
+        ----------
+        names : tuple of str
+            The names of each part of the path.
+        trailing : bool
+            Whether the path had a trailing ``'/'``.
+
+        Returns
+        -------
+        leaf : Leaf or None
+            The ``Leaf`` reached before the last part of the path, or
+            ``None`` if there isn't one.
+        subpath : str or None
+            The rest of the path after `leaf`, which is the key of the
+            extra parameter in it, or ``None`` if there isn't a `leaf`.
+
+        """
+        node = self
+        for i in range(len(names) - 1):
+            node = node._children.get(names[i])
+            if isinstance(node, Leaf):
+                subpath = posixpath.sep.join(names[(i + 1):])
+                if trailing:
+                    subpath = subpath + posixpath.sep
+                return node, subpath
+            elif not isinstance(node, Tree):
+                break
+        return None, None
+
+    def _find_nodes(self, parsed):
+        """ Finds the Trees and Leaves at several parsed paths.
+
+        Like ``_find_node`` but for several paths at once. Unless the
+        index of the root ``Tree`` has already been built (in which case
+        it is used), the paths are sorted so that those with parts in
+        common are next to each other and the ``Tree`` reached for the
+        parts in common with the previous path are reused instead of
+        going through them again.
+
+        Parameters
+        ----------
+        parsed : list of tuples
+            The normalized absolute path and the tuple of the names of
+            each part of it for each path (see ``_PathCache.parse``).
+
+        Returns
+        -------
+        nodes : list of Tree or Leaf or None
+            The ``Tree`` or ``Leaf`` pointed to by each path (or
+            ``None`` if there isn't one) in the same order as `parsed`.
+
+        """
+        nodes = [None] * len(parsed)
+        if self._parent is None and self._index is not None:
+            for i, (key, names) in enumerate(parsed):
+                if len(names) == 0:
+                    nodes[i] = self
+                else:
+                    nodes[i] = self._index.get(key)
+            return nodes
+
+        # trail holds the nodes reached for each part of the previous
+        # path (starting with this Tree for no parts).
+        trail = [self]
+        previous = ()
+        for i in sorted(range(len(parsed)), key=lambda i: parsed[i][1]):
+            names = parsed[i][1]
+            n = 0
+            while n < min(len(names), len(trail) - 1) \
+                    and names[n] == previous[n]:
+                n += 1
+            del trail[(n + 1):]
+            node = trail[n]
+            for name in names[n:]:
+                if not isinstance(node, Tree):
+                    node = None
+                    break
+                node = node._children.get(name)
+                trail.append(node)
+            if isinstance(node, (Tree, Leaf)):
+                nodes[i] = node
+            previous = names
+        return nodes
+
+    def handle(self, path):
+        """ Gets a handle bound to a ``Leaf`` to get and set its value.
+
+        The path is resolved only once, when the handle is made, and
+        the handle then gets and sets the value of the ``Leaf``
+        directly. If the ``Leaf`` is deleted from or replaced in this
+        ``Tree`` (through this ``Tree`` or any nested in it), the handle
+        raises an error instead of using the old ``Leaf``.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path to the ``Leaf``.
+
+        Returns
+        -------
+        handle : SettingHandle
+            The handle to the ``Leaf``.
+
+        Raises
+        ------
+        KeyError
+            If `path` is not an ``str`` or doesn't point to a ``Leaf``.
+
+        See Also
+        --------
+        SettingHandle
+
+        """
+        return SettingHandle(self, path)
+
+    def snapshot(self):
+        """ Takes a snapshot of this Tree as it is now.
+
+        The snapshot is a read-only version of this ``Tree`` that never
+        changes, taken in O(1) without copying anything. Everything is
+        shared with this ``Tree`` until it is changed. The first time a
+        ``Tree`` or ``Leaf`` is changed after the snapshot is taken,
+        only what it was is saved for the snapshot (a copy of the
+        children of a ``Tree`` or a shallow copy of a ``Leaf``), so the
+        memory used grows with the number of changes and not the number
+        of snapshots times the size of this ``Tree``. What was saved is
+        freed once no snapshot needs it.
+
+        Returns
+        -------
+        snapshot : TreeSnapshot
+            The snapshot.
+
+        Warning
+        -------
+        Values are not saved when changed in place (not through
+        ``Leaf.value``), which only is possible when the copy policy
+        is ``'shallow'`` or ``'none'`` (see ``Leaf.copy_policy``).
+
+        See Also
+        --------
+        TreeSnapshot
+        restore
+
+        """
+        return TreeSnapshot(self)
+
+    def compact(self):
+        """ Makes a compact read-only copy of this Tree.
+
+        Meant for very large trees, whose structure and ``int``,
+        ``float``, and ``bool`` values are kept in arrays rather than a
+        python object for each ``Tree`` and ``Leaf``.
+
+        Returns
+        -------
+        compact_tree : CompactTree
+            The copy.
+
+        See Also
+        --------
+        CompactTree
+
+        """
+        return CompactTree(self)
+
+    def dedupe(self):
+        """ Shares identical contents between the things in this Tree.
+
+        Goes through this ``Tree`` and everything nested in it, keyed
+        by their contents including types (so ``1`` and ``1.0`` are not
+        the same), and makes all those that are the same use a single
+        shared instance. It is meant for trees that repeat the same
+        subtrees many times. What is shared is
+
+        * ``Leaf`` values that can't be changed (frozen ones and those
+          of immutable types like ``int``, ``str``, and ``tuple`` of
+          them).
+        * ``LeafSpec`` (see ``Leaf.spec``) with the same constraints.
+        * Extra parameters of a ``Leaf`` or ``Tree`` whose keys and
+          values can't be changed. Changing them on a ``Leaf`` or
+          ``Tree`` first gives it its own copy (copy-on-write).
+        * The names of children.
+        * Nested ``Tree`` that are the same (the same type, copy policy,
+          and extra parameters, and the same children, each ``Leaf``
+          having a value, constraints, and extra parameters that are
+          shared). All but one of them are replaced by that one, which
+          is then in every place they were in. One that was already
+          put in more than one place is not replaced.
+
+        A shared ``Tree`` and what is in it can't be changed directly,
+        which raises ``TypeError``. Changing them by path from a
+        ``Tree`` they are in (``__setitem__``, ``__delitem__``,
+        ``set_many``, ``set_values``, etc.) first gives that place its
+        own copy of each shared ``Tree`` and ``Leaf`` along the path
+        (copy-on-write), as does getting one by a path with a trailing
+        ``'/'`` or making a ``SettingHandle`` or ``TreeView`` for one.
+        Those gotten any other way (``items``, ``glob``, etc.) are the
+        shared ones. A ``SettingHandle`` bound to a ``Leaf`` in a
+        ``Tree`` that was replaced raises ``KeyError`` like when it is
+        replaced any other way.
+
+        Returns
+        -------
+        saved : int
+            Estimate of the number of bytes freed, which are those of
+            everything that was replaced by a shared one (assuming
+            nothing else refers to them).
+
+        Raises
+        ------
+        TypeError
+            If this ``Tree`` is itself shared by ``dedupe``.
+
+        See Also
+        --------
+        Leaf.spec
+
+        """
+        if self._interned == 2:
+            raise TypeError('Can''t dedupe a Tree shared by dedupe.')
+        saved = 0
+        names = dict()
+        values = dict()
+        specs = dict()
+        extras = dict()
+
+        # The same LeafSpec is usually in many Leaf, so its key is only
+        # gotten once (it is kept along with it so that its id can't be
+        # reused).
+        spec_keys = dict()
+
+        # Each Tree and Leaf is gone through once, even if it is in more
+        # than one place. The nested Trees are kept along with the Tree
+        # they are in and their names there, each before those nested
+        # in it.
+        nodes = [self]
+        trees = []
+        seen = set([id(self)])
+        stack = [self]
+        while len(stack) != 0:
+            tree = stack.pop()
+            for k, v in tree._children.items():
+                if isinstance(v, (Tree, Leaf)) and id(v) not in seen:
+                    seen.add(id(v))
+                    nodes.append(v)
+                    if isinstance(v, Tree):
+                        trees.append((tree, k, v))
+                        stack.append(v)
+
+        # The ids of the Tree and Leaf whose value, constraints, and
+        # extra parameters are all shared now (the same ones are then
+        # the same objects).
+        shared = set()
+        for node in nodes:
+            # Extra parameters are only made shared (and so copied
+            # before being changed) once a second one that is the same
+            # is found.
+            key = None
+            if node._extra_parameters:
+                key = _items_key(node._extra_parameters)
+            if key is not None:
+                owner = extras.setdefault(key, node)
+                if owner is not node:
+                    if type(owner._extra_parameters) is not _SharedDict:
+                        owner._extra_parameters = \
+                            _SharedDict(owner._extra_parameters)
+                    if owner._extra_parameters \
+                            is not node._extra_parameters:
+                        saved += _sizeof(node._extra_parameters)
+                        node._extra_parameters = owner._extra_parameters
+            ok = (key is not None or not node._extra_parameters) \
+                and not hasattr(node, '__dict__')
+
+            if isinstance(node, Tree):
+                # The children have to be put in a new dict to change
+                # the names they are stored under.
+                renamed = [k for k in node._children
+                           if names.setdefault(k, k) is not k]
+                if len(renamed) != 0:
+                    saved += sum([sys.getsizeof(k) for k in renamed])
+                    node._children = _ordered_dict(
+                        [(names[k], v) for k, v in node._children.items()])
+                    # Only for those whose parent this Tree is (a
+                    # shared one can have the same name elsewhere).
+                    for k, v in node._children.items():
+                        if isinstance(v, (Tree, Leaf)) and v._name == k \
+                                and v._parent() is node:
+                            v._name = k
+                if ok:
+                    shared.add(id(node))
+                continue
+
+            key = _content_key(node._value, node._frozen)
+            if key is not None:
+                value = values.setdefault(key, node._value)
+                if value is not node._value:
+                    saved += _sizeof(node._value)
+                    node._value = value
+            else:
+                ok = False
+            if id(node._spec) not in spec_keys:
+                spec_keys[id(node._spec)] = (node._spec,
+                                             _spec_key(node._spec))
+            key = spec_keys[id(node._spec)][1]
+            if key is not None:
+                spec = specs.setdefault(key, node._spec)
+                if spec is not node._spec:
+                    saved += _sizeof(node._spec)
+                    node._spec = spec
+            else:
+                ok = False
+            if ok:
+                shared.add(id(node))
+
+        # The nested Trees that are the same are then replaced by one of
+        # them (which is interned), from the bottom up so that those
+        # nested in them have been already. A Tree is keyed by what it
+        # and its children have, which is compared by id since the same
+        # ones are the same objects by now.
+        canons = dict()
+        keyed = set()
+        replaced = False
+        for parent, name, tree in reversed(trees):
+            if id(tree) not in shared \
+                    or (tree._others is not None and tree._interned != 2):
+                continue
+            parts = []
+            for k, v in tree._children.items():
+                if isinstance(v, Tree) and id(v) in keyed:
+                    parts.append((k, id(v)))
+                elif isinstance(v, Leaf) and id(v) in shared \
+                        and v._others is None:
+                    extra = v._extra_parameters
+                    parts.append((k, type(v), id(v._value), id(v._spec),
+                                  v._copy_policy, v._frozen,
+                                  _extra_id(extra)))
+                else:
+                    parts = None
+                    break
+            if parts is None:
+                continue
+            extra = tree._extra_parameters
+            key = (type(tree), tree._copy_policy, _extra_id(extra),
+                   tuple(parts))
+            keyed.add(id(tree))
+            canon = canons.setdefault(key, tree)
+            if canon is tree or tree._others is not None \
+                    or parent._interned == 2:
+                continue
+
+            # The Tree is replaced directly (rather than with
+            # _set_child) since the index and the paths cached in the
+            # root Tree are thrown away once at the end anyway.
+            _intern(canon)
+            _changing(parent)
+            _leaving(tree, parent)
+            parent._children[name] = canon
+            tree._parent = None
+            tree._name = None
+            tree._path_cache = None
+            saved += sys.getsizeof(tree) + sys.getsizeof(tree._children) \
+                + sum([sys.getsizeof(v) for v in tree._children.values()
+                       if isinstance(v, Leaf)])
+            replaced = True
+        if not replaced:
+            return saved
+
+        # Every Tree that now has a shared one nested in it is marked as
+        # such, and has changed.
+        for parent, name, tree in reversed(trees):
+            if tree._interned == 0 \
+                    and any([isinstance(v, Tree) and v._interned != 0
+                             for v in tree._children.values()]):
+                tree._interned = 1
+            tree._version += 1
+        if any([isinstance(v, Tree) and v._interned != 0
+                for v in self._children.values()]):
+            _mark_interned_above(self)
+        for root, path in _places(self):
+            root._index = None
+            root._sorted_paths = None
+            root._validation = None
+            root._moves += 1
+        self._root_and_prefix(changed=True)
+        return saved
+
+    def memory_usage(self, deep=True):
+        """ Reports how much memory this Tree uses and what uses it.
+
+        Goes through this ``Tree`` and everything nested in it once,
+        adding up the bytes (``sys.getsizeof``) used by everything in
+        four categories:
+
+        nodes
+            The ``Tree`` and ``Leaf`` objects themselves, the ``dict``
+            of the children of each ``Tree`` and their names, and the
+            index of paths (if this is a root ``Tree`` that has one).
+        values
+            The ``Leaf`` values (numpy arrays count the bytes of their
+            data, see ``numpy.ndarray.nbytes``).
+        constraints
+            The ``LeafSpec`` (see ``Leaf.spec``).
+        extra_parameters
+            The extra parameters of every ``Tree`` and ``Leaf``.
+
+        Anything that is shared (a ``LeafSpec`` shared by many
+        ``Leaf``, values and extra parameters shared by ``dedupe``,
+        etc.) is only counted once, the first time it is gotten to.
+        Caches (parsed paths) and what is saved for snapshots are not
+        counted.
+
+        Parameters
+        ----------
+        deep : bool, optional
+            Whether to count what is held by values, constraints, and
+            extra parameters (the elements of a ``list``, etc.) or only
+            the objects themselves.
+
+        Returns
+        -------
+        usage : MemoryUsage
+            The ``namedtuple`` of the report. ``total``, ``nodes``,
+            ``values``, ``constraints``, and ``extra_parameters`` are
+            the bytes in total and for each category. ``leaves`` and
+            ``trees`` are the number of each (including this
+            ``Tree``). ``value_types`` is a ``dict`` of the number of
+            values of each type (the keys). ``subtrees`` is a ``dict``
+            of the bytes used by each ``Tree`` and everything in it,
+            with their POSIX paths as the keys (``'/'`` for this
+            ``Tree``).
+
+        See Also
+        --------
+        dedupe
+
+        """
+        seen = set()
+        totals = dict(nodes=0, values=0, constraints=0,
+                      extra_parameters=0)
+        value_types = dict()
+        subtrees = dict()
+        leaves = 0
+        for path, node in [(posixpath.sep, self)] + list(self._walk()):
+            if isinstance(node, Tree):
+                # A Tree's names are counted with it, not its children.
+                nodes = _memory_of(node, seen, False) \
+                    + _memory_of(node._children, seen, False) \
+                    + sum([_memory_of(k, seen) for k in node._children])
+                if node._index is not None:
+                    nodes += _memory_of(node._index, seen, False) \
+                        + _memory_of(node._sorted_paths, seen)
+                parent = path
+                size = nodes
+            else:
+                leaves += 1
+                nodes = _memory_of(node, seen, False)
+                tp = type(node._value)
+                value_types[tp] = value_types.get(tp, 0) + 1
+                values = _memory_of(node._value, seen, deep)
+                constraints = _memory_of(node._spec, seen, deep)
+                totals['values'] += values
+                totals['constraints'] += constraints
+                parent = posixpath.dirname(path)
+                size = nodes + values + constraints
+            extra_parameters = 0
+            if node._extra_parameters is not None:
+                extra_parameters = _memory_of(node._extra_parameters,
+                                              seen, deep)
+            totals['nodes'] += nodes
+            totals['extra_parameters'] += extra_parameters
+            subtrees[parent] = subtrees.get(parent, 0) \
+                + size + extra_parameters
+
+        # Add the bytes of each Tree to those it is in, going from the
+        # most deeply nested up.
+        for path in sorted(subtrees, key=lambda k: k.count(posixpath.sep),
+                           reverse=True):
+            if path != posixpath.sep:
+                subtrees[posixpath.dirname(path)] += subtrees[path]
+
+        return MemoryUsage(total=sum(totals.values()),
+                           leaves=leaves,
+                           trees=len(subtrees),
+                           value_types=value_types,
+                           subtrees=subtrees, **totals)
+
+    def restore(self, snapshot):
+        """ Rolls this Tree back to a snapshot.
+
+        The children of this ``Tree`` are replaced by a copy of those in
+        the snapshot (see ``TreeSnapshot.to_tree``), and its extra
+        parameters by those it had then.
+
+        Parameters
+        ----------
+        snapshot : TreeSnapshot
+            The snapshot to roll back to.
+
+        Raises
+        ------
+        TypeError
+            If `snapshot` is not a ``TreeSnapshot``.
+
+        See Also
+        --------
+        snapshot
+
+        """
+        if not isinstance(snapshot, TreeSnapshot):
+            raise TypeError('snapshot must be a TreeSnapshot.')
+        tree = snapshot.to_tree()
+        for k in list(self._children):
+            self._del_child(k)
+        for k, v in list(tree._children.items()):
+            tree._orphan(v, k)
+            self._set_child(k, v)
+        _changing(self)
+        self._extra_parameters = tree._extra_parameters
+
+    def view(self, prefix):
+        """ Gets a view of the ``Tree`` at a path in this one.
+
+        The view works like the ``Tree`` at `prefix` (paths given to it
+        are relative to `prefix`) except that the paths it reports are
+        absolute paths in the root ``Tree`` this one is in and
+        validation is done against all the settings in that root
+        ``Tree``. Nothing is copied.
+
+        Parameters
+        ----------
+        prefix : str
+            POSIX style path to the ``Tree`` to view.
+
+        Returns
+        -------
+        view : TreeView
+            The view.
+
+        Raises
+        ------
+        KeyError
+            If `prefix` is not an ``str`` or doesn't point to a
+            ``Tree``.
+
+        See Also
+        --------
+        TreeView
+
+        """
+        return TreeView(self, prefix)
+
+    def glob(self, pattern, tp='all', output='paths'):
+        """ Finds everything whose path matches a glob pattern.
+
+        Like ``iglob`` except that everything found is returned in a
+        ``list`` sorted by path.
+
+        Parameters
+        ----------
+        pattern : str or GlobPattern
+            The glob pattern (see ``GlobPattern``) to match the POSIX
+            paths against.
+        tp : {'all', 'tree', 'leaf'}, optional
+            What kind of things to find: ``Tree``, ``Leaf``, or both
+            ('all').
+        output : {'paths', 'nodes', 'values'}, optional
+            Whether to return the path to each thing found, the
+            ``Tree`` or ``Leaf`` itself, or its value (the value of the
+            ``Leaf`` or ``list`` of the children of the ``Tree``).
+
+        Returns
+        -------
+        found : list
+            The paths, nodes, or values of everything found, sorted by
+            path.
+
+        Raises
+        ------
+        TypeError
+            If `pattern` is not an ``str`` or ``GlobPattern``.
+        ValueError
+            `tp` or `output` is not one of the valid values.
+
+        See Also
+        --------
+        iglob
+        GlobPattern
+
+        """
+        self._check_glob_output(output)
+        found = sorted(self._iglob(pattern, tp), key=lambda x: x[0])
+        if output == 'paths':
+            return [path for path, node in found]
+        elif output == 'nodes':
+            return [node for path, node in found]
+        else:
+            return [self._node_value(node) for path, node in found]
+
+    def iglob(self, pattern, tp='all', output='paths'):
+        """ Iterates over everything whose path matches a glob pattern.
+
+        Goes through this ``Tree`` and everything nested in it, only
+        going into the ``Tree`` that could have something matching
+        `pattern` in them (a ``Tree`` whose path already fails to match
+        is not looked in at all). Parts of the pattern without any
+        wildcards are looked up directly instead of being compared to
+        every child. Things are found depth first in the order of the
+        children.
+
+        Parameters
+        ----------
+        pattern : str or GlobPattern
+            The glob pattern (see ``GlobPattern``) to match the POSIX
+            paths against. Compiling it ahead of time with
+            ``GlobPattern`` lets it be reused without compiling it
+            again.
+        tp : {'all', 'tree', 'leaf'}, optional
+            What kind of things to find: ``Tree``, ``Leaf``, or both
+            ('all').
+        output : {'paths', 'nodes', 'values'}, optional
+            Whether to yield the path to each thing found, the ``Tree``
+            or ``Leaf`` itself, or its value (the value of the ``Leaf``
+            or ``list`` of the children of the ``Tree``).
+
+        Returns
+        -------
+        found : iterator
+            Iterator over the paths, nodes, or values of everything
+            found.
+
+        Raises
+        ------
+        TypeError
+            If `pattern` is not an ``str`` or ``GlobPattern``.
+        ValueError
+            `tp` or `output` is not one of the valid values.
+
+        See Also
+        --------
+        glob
+        GlobPattern
+
+        """
+        self._check_glob_output(output)
+        found = self._iglob(pattern, tp)
+        if output == 'paths':
+            return (path for path, node in found)
+        elif output == 'nodes':
+            return (node for path, node in found)
+        else:
+            return (self._node_value(node) for path, node in found)
+
+    def _iglob(self, pattern, tp):
+        """ Iterates over the paths and nodes matching a glob pattern.
+
+        Parameters
+        ----------
+        pattern : str or GlobPattern
+            The glob pattern.
+        tp : {'all', 'tree', 'leaf'}
+            What kind of things to find.
+
+        Returns
+        -------
+        found : iterator of tuples
+            Iterator over the path and ``Tree`` or ``Leaf`` of
+            everything found.
+
+        Raises
+        ------
+        TypeError
+            If `pattern` is not an ``str`` or ``GlobPattern``.
+        ValueError
+            `tp` is not one of the valid values.
+
+        """
+        if tp not in ('all', 'tree', 'leaf'):
+            raise ValueError('tp is not ''all'', ''tree'', or'
+                             + ' ''leaf''.')
+        if not isinstance(pattern, GlobPattern):
+            pattern = GlobPattern(pattern)
+        found = pattern._walk(self)
+        if tp == 'all':
+            return found
+        cls = Leaf if tp == 'leaf' else Tree
+        return ((path, node) for path, node in found
+                if isinstance(node, cls))
+
+    @staticmethod
+    def _check_glob_output(output):
+        """ Checks that output is one of the valid values for glob."""
+        if output not in ('paths', 'nodes', 'values'):
+            raise ValueError('output is not ''paths'', ''nodes'', or'
+                             + ' ''values''.')
+
+    @staticmethod
+    def _node_value(node):
+        """ Gets the value of a Leaf or the children of a Tree."""
+        if isinstance(node, Leaf):
+            return node.value
+        return list(node._children.keys())
+
+    def list_all(self, tp='all'):
+        """ List the children of the Tree recursively.
+
+        Returns the list of the POSIX paths to all the children of
+        this ``Tree`` (including those nested within its children and
+        their children and so on) of particular types (``Tree``,
+        ``Leaf``, or all).
+
+        Parameters
+        ----------
+        tp : {'all', 'tree', 'leaf'}, optional
+            What kind of things to return the paths to: ``Tree``,
+            ``Leaf``, or both ('all').
+
+        Returns
+        -------
+        paths : list of str
+            The paths to all the children at all depths of this ``Tree``
+            of the desired types.
+
+        Raises
+        ------
+        ValueError
+            `tp` is not one of the valid values.
+
+        """
+        # Check the validity of tp.
+        if tp not in ('all', 'tree', 'leaf'):
+            raise ValueError('tp is not ''all'', ''tree'', or'
+                             + ' ''leaf''.')
+
+        # If this is a root Tree or the root Tree it is in has built its
+        # index, the paths are all in the sorted paths of the index.
+        if self._parent is None:
+            self._get_index()
+        root, prefix = _locate(self)
+        if root._index is not None:
+            if root is self:
+                prefix = ''
+                paths = self._sorted_paths
+            else:
+                lo, hi = root._sorted_range(prefix + posixpath.sep,
+                                            prefix + _after_sep)
+                paths = [k[len(prefix):]
+                         for k in root._sorted_paths[lo:hi]]
+            if tp == 'all':
+                return list(paths)
+            cls = Leaf if tp == 'leaf' else Tree
+            return [k for k in paths
+                    if isinstance(root._index[prefix + k], cls)]
+
+        # Walk through every child at all depths and grab the paths to
+        # all desired children that fit the type, and then sort them.
+        if tp == 'all':
+            return sorted([k for k, v in self._walk()])
+        cls = Leaf if tp == 'leaf' else Tree
+        return sorted([k for k, v in self._walk() if isinstance(v, cls)])
+
+    def iter_prefix(self, prefix=posixpath.sep, start=None, stop=None,
+                    limit=None, tp='all'):
+        """ Iterates over the paths under a path in sorted order.
+
+        Lazily goes through the POSIX paths to everything nested in the
+        ``Tree`` at `prefix` (not including `prefix` itself) in sorted
+        order, the same order as ``list_all``. The sorted paths in the
+        index of the root ``Tree`` are used, so getting the first few
+        paths is O(log(n)) and each one after that is O(1) instead of
+        having to list and sort all of them. Changes to this ``Tree``
+        while iterating are fine, including putting it in another
+        ``Tree`` or removing it from one (the paths are gotten in
+        batches).
+
+        Parameters
+        ----------
+        prefix : str, optional
+            POSIX style path to the ``Tree`` to go through. It doesn't
+            have to exist (in which case there are no paths).
+        start : str, optional
+            Only paths at least this are given (compared as ``str``).
+        stop : str, optional
+            Only paths less than this are given (compared as ``str``).
+        limit : int, optional
+            The maximum number of paths to give.
+        tp : {'all', 'tree', 'leaf'}, optional
+            What kind of things to give the paths to: ``Tree``,
+            ``Leaf``, or both ('all').
+
+        Returns
+        -------
+        paths : iterator of str
+            Iterator over the absolute POSIX paths in sorted order.
+
+        Raises
+        ------
+        KeyError
+            If `prefix` is not an ``str``.
+        ValueError
+            `tp` is not one of the valid values.
+
+        See Also
+        --------
+        list_all
+
+        """
+        if not isinstance(prefix, str):
+            raise KeyError('prefix must be a str.')
+        if tp not in ('all', 'tree', 'leaf'):
+            raise ValueError('tp is not ''all'', ''tree'', or'
+                             + ' ''leaf''.')
+        key, names = _parse_path(prefix)[:2]
+        if len(names) == 0:
+            key = ''
+        return self._iter_prefix(key, start, stop, limit, tp)
+
+    def _iter_prefix(self, key, start, stop, limit, tp):
+        """ Does the work of iter_prefix (see it).
+
+        `key` is the normalized absolute prefix without a trailing
+        ``'/'`` (``''`` for the root).
+
+        """
+        lo = key + posixpath.sep
+        hi = key + _after_sep
+        if start is not None:
+            lo = max(lo, start)
+        if stop is not None:
+            hi = min(hi, stop)
+        cls = {'all': (Tree, Leaf), 'tree': Tree, 'leaf': Leaf}[tp]
+
+        # Get the paths in batches, starting each one with the first
+        # path after the last one of the previous batch. They come from
+        # the sorted paths of the root Tree, which need the path to this
+        # Tree put before the bounds and stripped off the paths. Which
+        # Tree is the root (and the path to this Tree in it) is gotten
+        # again for each batch, since this Tree could be put in another
+        # one between them, and the index and sorted paths used for a
+        # batch are held on to since they could be dropped during it.
+        count = 0
+        after = False
+        while limit is None or count < limit:
+            root, base = _locate(self)
+            if root is self:
+                base = ''
+            index = root._get_index()
+            paths = root._sorted_paths
+            if after:
+                i = bisect.bisect_right(paths, base + lo)
+            else:
+                i = bisect.bisect_left(paths, base + lo)
+            batch = paths[i:(i + 256)]
+            for k in batch:
+                if k >= base + hi \
+                        or (limit is not None and count >= limit):
+                    return
+                node = index.get(k)
+                if isinstance(node, cls):
+                    count += 1
+                    yield k[len(base):]
+            if len(batch) < 256:
+                return
+            lo = batch[-1][len(base):]
+            after = True
+
+    def diff(self, tree):
+        """ Find locations of differences between two ``Tree``.
+
+        Compares the individual elements this ``Tree`` and the one
+        provided (`tree`). The POSIX style paths to each ``Leaf``
+        that is different between the two are returned in
+        three lists. One list for those found in both, but had different
+        values. The second for ones found in this ``Tree``, but not
+        `tree`. And the third for ones found in `tree`, but not this
+        ``Tree``.
+
+        Parameters
+        ----------
+        tree : Tree
+            The ``Tree`` to compare to.
+
+        Returns
+        -------
+        different_values : list
+            ``list`` of POSIX paths to each ``Leaf`` that is present in
+            both trees, but have different values.
+        only_in_self : list
+            ``list`` of POSIX paths to each ``Leaf`` that is only
+            present in this ``Tree`` (not in `tree`).
+        only_in_other : list
+            ``list`` of POSIX paths to each ``Leaf`` that is only
+            present in `tree` (not in this ``Tree``).
+
+        Raises
+        ------
+        TypeError
+            If `tree` is not a ``Tree``.
+
+        Examples
+        --------
+
+        A very simple ``Tree`` with three individual settings 'a',
+        'b', and 'c' is made. Another tree is made by copying it,
+        deleting 'b', changing the value of 'c', and adding another
+        setting 'd'. Then they are compared.
+
+        >>> import copy
+        >>> tree1 = Tree(children={
+                         'a': Leaf(value=2),
+                         'b': Leaf(value=10.2),
+                         'c': Leaf(value='foo')})
+        >>> tree2 = copy.deepcopy(tree1)
+        >>> del tree2['b']
+        >>> tree2['c'] = 'bar'
+        >>> tree2['d'] = Leaf(value=42)
+        >>> tree1.diff(tree2)
+        (['/c'], ['/b'], ['/d'])
+
+        """
+        # We must be given a Tree.
+        if not isinstance(tree, Tree):
+            raise TypeError('tree must be a Tree.')
+
+        # Get the lists of all the leaves of both, which we
+        # will need to compare them with, and pack them into sets (makes
+        # it easier to figure out which are in both, and which are not).
+        children = set(self.list_all(tp='leaf'))
+        tree_children = set(tree.list_all(tp='leaf'))
+
+        # Make lists for the leaves that are in one, or the other, or
+        # both.
+        only_in_self = list(children - tree_children)
+        only_in_tree = list(tree_children - children)
+        in_both = list(children & tree_children)
+
+        # Sort the lists for convenience.
+        only_in_self.sort()
+        only_in_tree.sort()
+        in_both.sort()
+
+        # Take only those in both that have different values, which
+        # are compared directly without copying them (numpy arrays are
+        # compared with numpy.array_equal).
+        different_values = []
+        for k in in_both:
+            if _values_differ(self[k + posixpath.sep]._value,
+                              tree[k + posixpath.sep]._value):
+                different_values.append(k)
+
+        return (different_values, only_in_self, only_in_tree)
+
+    def find_invalids(self, incremental=False):
+        """ Returns the paths to each invalid ``Leaf``.
+
+        Goes through each ``Leaf`` in this ``Tree`` and any nested under
+        it, checks their validity, and returns the POSIX paths to those
+        that are invalid.
+
+        With `incremental`, a root ``Tree`` keeps whether each ``Leaf``
+        was valid when last checked and which ones have been changed
+        (anything about them set) or put in since. Only those, every
+        ``Leaf`` with a validator function that depends on one of the
+        settings changed, put in, or removed (see ``Leaf.depends_on``),
+        and every ``Leaf`` with a validator function that doesn't
+        declare what it depends on (it could be any of the other
+        settings) are checked again. The first time, every ``Leaf`` is
+        checked. Changes made to a value in place (possible
+        with the copy policy ``'none'``) are not seen. A ``Tree`` that
+        is not a root always checks every ``Leaf``.
+
+        Parameters
+        ----------
+        incremental : bool, optional
+            Whether to only check again what could have changed since
+            the last time this was done with it.
+
+        Returns
+        -------
+        paths : list of str paths
+            The POSIX paths to each invalid ``Leaf`` (sorted).
+
+        See Also
+        --------
+        is_valid
+        Leaf.is_valid
+
+        """
+        if not incremental or _locate(self)[0] is not self:
+            return self._find_invalids(self.list_all(tp='leaf'))
+
+        index = self._get_index()
+        state = self._validation
+        if state is None:
+            state = _Validation()
+            state.dirty.update([k for k, v in index.items()
+                                if isinstance(v, Leaf)])
+            self._validation = state
+            paths = set(state.dirty)
+        else:
+            paths = state.dirty | state.functions
+            paths.update(state.dependents_of(state.dirty
+                                             | state.removed))
+        state.dirty = set()
+        state.removed = set()
+
+        all_settings = _AllSettings(self)
+        for k in paths:
+            v = index.get(k)
+            if not isinstance(v, Leaf):
+                continue
+            state.track(k, v._spec)
+            if v.is_valid(all_settings):
+                state.invalids.discard(k)
+            else:
+                state.invalids.add(k)
+        return sorted(state.invalids)
+
+    def _find_invalids(self, paths):
+        """ Returns the paths to each invalid ``Leaf`` of those given.
+
+        Like ``find_invalids`` except that only the ``Leaf`` at `paths`
+        are checked (still against all the settings in this ``Tree``).
+
+        Parameters
+        ----------
+        paths : iterable of str
+            The absolute POSIX paths to each ``Leaf`` to check.
+
+        Returns
+        -------
+        paths : list of str paths
+            The POSIX paths to each invalid ``Leaf``.
+
+        """
+        # The values of the settings are only gotten when a validator
+        # function looks them up, and each Leaf is found in the index.
+        all_settings = _AllSettings(self)
+
+        # Check each leaf one by one for validity and gather those that
+        # are invalid and return them.
+        invalids = []
+        for k in paths:
+            leaf = all_settings._find(k)
+            if leaf is None:
+                leaf = self[k + posixpath.sep]
+            if not leaf.is_valid(all_settings):
+                invalids.append(k)
+        return invalids
+
+    def is_valid(self, incremental=False):
+        """ Returns the paths to each invalid ``Leaf``.
+
+        Goes through each ``Leaf`` in this ``Tree`` and any nested under
+        it, checks their validity, and returns the POSIX paths to those
+        that are invalid.
+
+        Parameters
+        ----------
+        incremental : bool, optional
+            Whether to only check again what could have changed since
+            the last time this was done with it (see
+            ``find_invalids``).
+
+        Returns
+        -------
+        validity : bool
+            ``True`` if every node is valid, and ``False`` otherwise.
+        paths : list of str paths
+            The POSIX paths to each invalid ``Leaf``.
+
+        See Also
+        --------
+        find_invalids
+        Leaf.is_valid
+
+        """
+        return (0 == len(self.find_invalids(incremental)))
+
+    def get_values(self, form='paths'):
+        """ Returns this ``Tree`` stripped just ``Leaf`` values.
+
+        Parameters
+        ----------
+        form : {'paths', 'nested'}, optional
+            Whether to return a ``dict`` of POSIX paths to ``Leaf``
+            values (``'paths'``) or a group of nested ``dict``
+            representing the structure of this ``Tree`` with a
+            ``dict`` for each ``Tree`` and the values for each
+            ``Leaf``.
+
+        Returns
+        -------
+        output : dict
+            A ``dict`` with elements determined by `form`. If `form`
+            is ``'paths'``, then the POSIX paths to each ``Leaf`` will
+            be the keys and the ``Leaf`` values as the values. If
+            `form` is ``'nested'``, a group of nested ``dict`` is
+            returned representing the structure of this ``Tree``.
+            Each ``Tree`` is turned into a ``dict`` of its children
+            which will be the respective values of each ``Leaf`` and
+            another ``dict`` for each ``Tree``.
+
+        Raises
+        ------
+        ValueError
+            If `form` is not a valid value.
+
+        See Also
+        --------
+        list_all
+        set_values
+
+        """
+        if form == 'paths':
+            # Get the paths to every Leaf and construct a dict of them
+            # with the values of that particular leaf and return it.
+            return dict([(k, self[k])
+                        for k in self.list_all(tp='leaf')])
+        elif form == 'nested':
+            # Go through each Tree, putting the values of its Leaves in
+            # its dict and making a dict for each of its Trees which are
+            # then put on the stack to be gone through.
+            # The copy policy of each Tree is kept track of rather than
+            # looked up for every Leaf.
+            out = dict()
+            stack = [(self, out, _resolve_copy_policy(self))]
+            while len(stack) != 0:
+                tree, tree_out, policy = stack.pop()
+                for k, v in tree.items():
+                    if isinstance(v, Leaf) and v._frozen:
+                        tree_out[k] = _view(v._value)
+                    elif isinstance(v, Leaf):
+                        tree_out[k] = _copy_value(
+                            v._value, v._copy_policy or policy)
+                    elif isinstance(v, Tree):
+                        tree_out[k] = dict()
+                        stack.append((v, tree_out[k],
+                                      v._copy_policy or policy))
+            return out
+        else:
+            raise ValueError('form must be either ''paths'' or'
+                             + ' ''nested''.')
+
+    def set_values(self, values):
+        """ Apply a group of values to several ``Leaf``.
+
+        Sets several ``Leaf`` all at once. Skips any attempt to set the
+        value of a ``Leaf`` that isn't present or set a ``Tree`` to a
+        value that is not a ``dict`` of each ``Leaf`` to set within it
+        (nesting).
+
+        Parameters
+        ----------
+        values : dict or anything inheriting collections.Mapping
+            Each key is a POSIX path to set and the value can either
+            be a value to set a ``Leaf`` to if pointed at a ``Leaf``
+            or a ``dict`` (or something that inherits
+            ``collections.Mapping``) if pointing to a ``Tree`` in which
+            case it takes the same form as `values` should. Basically,
+            either output of ``get_values`` or mixed output form is
+            what works.
+
+        Raises
+        ------
+        TypeError
+            If `values` doesn't inherit from ``collections.Mapping``.
+
+        See Also
+        --------
+        get_values
+        collections.Mapping
+
+        """
+        if not isinstance(values, Mapping):
+            raise TypeError('values must be dict-like (inherit from '
+                            + 'collections.Mapping).')
+        # The values are applied in order, going depth first into the
+        # nested Mappings, by keeping a stack of the Trees and the
+        # iterators over the values to set in them.
+        stack = [(self, iter(values.items()))]
+        while len(stack) != 0:
+            tree, it = stack[-1]
+            for k, v in it:
+                if not isinstance(k, str):
+                    continue
+                key, names = _parse_path(k)[:2]
+                if tree._interned == 1:
+                    tree._unshare(names)
+                node = tree._find_node(key, names)
+                if isinstance(node, Leaf):
+                    node.value = v
+                elif isinstance(node, Tree) \
+                        and isinstance(v, Mapping):
+                    stack.append((node, iter(v.items())))
+                    break
+            else:
+                stack.pop()
+
+    # Implement an interface to extra_parameters mapping the dictionary
+    # interface for all the extra parameters by mapping the relevant
+    # dict functions to the functions to take their place (since dict
+    # access to Tree is already given for accessing children).
+    def extra_parameters_len(self):
+        """ Returns the number of extra parameters.
+
+        Maps to ``__len__`` in the extra parameters.
+
+        """
+        return len(self._extra_parameters
+                   or _no_extra_parameters)
+
+    def extra_parameters_getitem(self, key):
+        """ Gets a particular extra parameter.
+
+        Maps to ``__getitem__`` in the extra parameters.
+
+        """
+        return (self._extra_parameters
+                or _no_extra_parameters)[key]
+
+    def extra_parameters_setitem(self, key, value):
+        """ Sets a particular extra parameter.
+
+        Maps to ``__setitem__`` in the extra parameters.
+
+        """
+        _changing(self)
+        _writable_extra_parameters(self)[key] = value
+
+    def extra_parameters_delitem(self, key):
+        """ Removes a particular extra parameter.
+
+        Maps to ``__delitem__`` in the extra parameters.
+
+        """
+        if self._extra_parameters is None:
+            raise KeyError(key)
+        _changing(self)
+        del _writable_extra_parameters(self)[key]
+
+    def extra_parameters_contains(self, item):
+        """ Checks if a key is in the extra parameters.
+
+        Maps to ``__contains__`` in the extra parameters.
+
+        """
+        return item in (self._extra_parameters
+                        or _no_extra_parameters)
+
+    def extra_parameters_iter(self):
+        """ Returns an iterator over the extra parameters.
+
+        Maps to ``__iter__`` in the extra parameters.
+
+        """
+        return iter(self._extra_parameters
+                    or _no_extra_parameters)
+
+    def extra_parameters_keys(self):
+        """ Returns all the keys for the extra parameters.
+
+        Maps to ``keys`` in the extra parameters.
+
+        """
+        return (self._extra_parameters
+                or _no_extra_parameters).keys()
+
+    def extra_parameters_items(self):
+        """ Returns the items of the extra parameters.
+
+        Maps to ``items`` in the extra parameters.
+
+        """
+        return (self._extra_parameters
+                or _no_extra_parameters).items()
+
+
+class _AllSettings(Mapping):
+    """ Read-only view of the values of all the settings in a Tree.
+
+    What validator functions are given (see ``Leaf.validator_function``)
+    by ``Tree.find_invalids``. The keys are the POSIX paths to every
+    ``Leaf`` in the ``Tree`` and the values are their values. Nothing is
+    gathered when it is made. Looking up a key finds the ``Leaf`` in the
+    index of the root ``Tree`` and gets its value (copied according to
+    its copy policy) every time. ``in`` only looks in the index, and the
+    paths are only listed (once) when it is iterated over or its length
+    is needed.
+
+    Parameters
+    ----------
+    tree : Tree
+        The ``Tree`` (the paths are relative to it).
+
+    """
+    __slots__ = ('_tree', '_index', '_prefix', '_paths')
+
+    def __init__(self, tree):
+        root, prefix = _locate(tree)
+        if root is tree:
+            prefix = ''
+        self._tree = tree
+        self._index = root._get_index()
+        self._prefix = prefix
+        self._paths = None
+
+    def _find(self, key):
+        """ Gets the Leaf at a path, or None if there isn't one."""
+        # The paths in the index are normalized, so only a normalized
+        # key can be found in it.
+        if not isinstance(key, str) or not key.startswith(posixpath.sep):
+            return None
+        node = self._index.get(self._prefix + key)
+        if isinstance(node, Leaf):
+            return node
+        return None
+
+    def _get_paths(self):
+        """ Gets the sorted paths to every Leaf, listing them if needed.
+        """
+        if self._paths is None:
+            self._paths = self._tree.list_all(tp='leaf')
+        return self._paths
+
+    def __getitem__(self, key):
+        leaf = self._find(key)
+        if leaf is None:
+            raise KeyError(key)
+        return leaf.value
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        return iter(self._get_paths())
+
+    def __len__(self):
+        return len(self._get_paths())
 
-class Leaf(object):
-    """ An individual setting.
 
-    A setting that is part of a nested tree of settings (see ``Tree``),
-    has a value (``value``), and possibly requires validation checks.
+class SettingHandle(object):
+    """ Handle bound to a ``Leaf`` in a ``Tree`` to get and set its value.
 
-    A setting is valid if it meets several criteria. Note, it is
-    possible to set the criteria such that it can never be valid with
-    any value. It is valid (call ``is_valid``) if it meets all the
-    following criteria.
+    Resolves the path to a ``Leaf`` in a ``Tree`` once and then gets and
+    sets its value directly, which is much faster than accessing it by
+    path each time. Made by ``Tree.handle``.
 
-    1. It's type is one of the types contained in ``valid_value_types``,
-       if given.
-    2. It is one of the values in ``allowed_values``, if given.
-    3. It is not one of the values in ``forbidden_values``, if given.
-    4. It passes all the simple validators in ``validators``, if given.
-       See ``available_validators`` for the available ones and how to
-       set their parameters. More than one can be used in combination.
-       They are meant for numerical settings to make sure they are
-       less than a value, greater than, in a range, outside a range,
-       etc.
-    5. It passes the custom validation function provided
-       (``validator_function``), if given. It must be a function
-       (includes those made by ``lambda``). It must return a ``bool``
-       indicating whether the setting is valid (``True``) or not
-       (``False``) and take two arguments. The first is the value of
-       this setting and the second is a ``dict`` containing all the
-       other settings in the root settings ``Tree`` that this is a part
-       of with the POSIX paths to the individual setting leaves as the
-       keys and their values as the values. Thowing an exception, which
-       will be caught, is considered as the setting being invalid.
+    Before each access, the handle checks whether anything has been put
+    in or removed from the ``Tree`` since it last checked (a single
+    comparison). If so, it looks up its path again and if the ``Leaf``
+    is no longer there (deleted or replaced), a ``KeyError`` is raised
+    instead of using the old ``Leaf``.
 
-    Additional parameters can be stored in this ``Leaf`` and accessed
-    like a ``dict``. The initial ones are set by `**keywords`, but then
-    can be set and gotten by the usual ways of working with a ``dict``
-    such as ``leaf['a']``.
+    Parameters
+    ----------
+    tree : Tree
+        The ``Tree`` the ``Leaf`` is in.
+    path : str
+        POSIX style path to the ``Leaf`` in `tree`.
+
+    Raises
+    ------
+    KeyError
+        If `path` is not an ``str`` or doesn't point to a ``Leaf``.
+
+    Attributes
+    ----------
+    tree : Tree
+    path : str
+    leaf : Leaf
+
+    See Also
+    --------
+    Tree.handle
+
+    """
+    __slots__ = ('_tree', '_path', '_key', '_names', '_leaf',
+                 '_version')
+
+    def __init__(self, tree, path):
+        if not isinstance(path, str):
+            raise KeyError('path must be a str.')
+        self._tree = tree
+        self._path = path
+        self._key, self._names = _parse_path(path)[:2]
+        if tree._interned == 1:
+            tree._unshare(self._names)
+        self._version = tree._version
+        self._leaf = tree._find_node(self._key, self._names)
+        if not isinstance(self._leaf, Leaf):
+            raise KeyError(path + ' is not a Leaf.')
+
+    @property
+    def tree(self):
+        """ The ``Tree`` the ``Leaf`` is in.
+
+        Tree
+
+        """
+        return self._tree
+
+    @property
+    def path(self):
+        """ The POSIX path to the ``Leaf`` in ``tree``.
+
+        str
+
+        """
+        return self._path
+
+    @property
+    def leaf(self):
+        """ The ``Leaf`` this handle is bound to.
+
+        Leaf
+
+        Raises
+        ------
+        KeyError
+            If the ``Leaf`` has been deleted from or replaced in
+            ``tree``.
+
+        """
+        if self._version != self._tree._version:
+            self._check()
+        return self._leaf
+
+    def get(self):
+        """ Gets the value of the ``Leaf``.
+
+        Returns
+        -------
+        value : any
+            The value of the ``Leaf``.
+
+        Raises
+        ------
+        KeyError
+            If the ``Leaf`` has been deleted from or replaced in
+            ``tree``.
+
+        See Also
+        --------
+        Leaf.value
+
+        """
+        if self._version != self._tree._version:
+            self._check()
+        return self._leaf.value
+
+    def set(self, value):
+        """ Sets the value of the ``Leaf``.
+
+        Parameters
+        ----------
+        value : any
+            The value to set.
+
+        Raises
+        ------
+        KeyError
+            If the ``Leaf`` has been deleted from or replaced in
+            ``tree``.
+
+        See Also
+        --------
+        Leaf.value
+
+        """
+        if self._version != self._tree._version:
+            self._check()
+        self._leaf.value = value
+
+    def _check(self):
+        """ Checks that the Leaf is still at the path in the Tree.
+
+        Raises
+        ------
+        KeyError
+            If the ``Leaf`` has been deleted from or replaced in
+            ``tree``.
+
+        """
+        version = self._tree._version
+        if self._tree._find_node(self._key, self._names) \
+                is not self._leaf:
+            raise KeyError('The Leaf at ' + self._path + ' was deleted '
+                           'or replaced.')
+        self._version = version
+
+
+class TreeView(object):
+    """ View of a ``Tree`` nested in another one.
+
+    Works like the ``Tree`` at a path (`prefix`) in another ``Tree``
+    (`tree`), so paths given to it are relative to `prefix`, except that
+    all paths it reports are absolute paths in the root ``Tree`` that
+    `tree` is in (found when the view is made) and validation is done
+    against all the settings in that root ``Tree``. Made by
+    ``Tree.view``. Nothing is copied.
+
+    The ``Tree`` at `prefix` is found once and then used directly. It
+    is only looked up again if a ``Tree`` or ``Leaf`` has been put in or
+    removed from `tree` since then (a single comparison is done to
+    check), so a view follows its `prefix` even when the ``Tree`` there
+    is replaced.
 
     Parameters
     ----------
-    value : any, optional
-        The value of this setting. See Attributes.
-    valid_value_types : type, iterable of types, optional
-        See Attributes.
-    allowed_values : iterable, optional
-        See Attributes.
-    forbidden_values : iterable, optional
-        See Attributes.
-    validators : iterable of iterables, optional
-        See Attributes.
-    validator_function : function, optional
-        See Attributes.
-    **keywords : optional
-        Aditional keyword arguments which are put in this ``Leaf`` to
-        be accessed by accessing this ``Leaf`` like a ``dict``.
+    tree : Tree
+        The ``Tree`` to view part of.
+    prefix : str
+        POSIX style path to the ``Tree`` in `tree` to view.
 
     Raises
     ------
-    TypeError
-        If set to something invalid.
+    KeyError
+        If `prefix` is not an ``str`` or doesn't point to a ``Tree``
+        (raised whenever the view is used while that is the case).
 
     Attributes
     ----------
-    value : any type
-    valid_value_types : iterable of classes or None
-    allowed_values : iterable or None
-    forbidden_values : iterable or None
-    validators : iterable of iterables or None
-    validator_function : function or None
+    tree : Tree
+    prefix : str
+    node : Tree
 
     See Also
     --------
-    Tree
-    available_validators
+    Tree.view
 
     """
-    def __init__(self, value=None, valid_value_types=None,
-                 allowed_values=None, forbidden_values=None,
-                 validators=None, validator_function=None,
-                 **keywords):
-        # The value is set without question.
-        self.value = value
-        
-        # For the others, the values to set need to be validated. So,
-        # they are all set to None, which is a valid value, and then one
-        # by one set to the given values.
-        self._validator_function = None
-        self._valid_value_types = None
-        self._allowed_values = None
-        self._forbidden_values = None
-        self._validators = None
-        
-        self.validator_function = validator_function
-        self.valid_value_types = valid_value_types
-        self.allowed_values = allowed_values
-        self.forbidden_values = forbidden_values
-        self.validators = validators
+    __slots__ = ('_tree', '_root', '_key', '_names', '_prefix',
+                 '_version', '_node')
+
+    def __init__(self, tree, prefix):
+        if not isinstance(prefix, str):
+            raise KeyError('prefix must be a str.')
+        self._tree = tree
+        self._key, self._names = _parse_path(prefix)[:2]
+
+        # The absolute path to the viewed Tree in the root Tree, without
+        # a trailing '/' ('' for the root Tree itself).
+        self._root, self._prefix = _locate(tree)
+        if self._root is tree:
+            self._prefix = ''
+        if len(self._names) != 0:
+            self._prefix = self._prefix + self._key
+        self._version = None
+        self._node = None
+        self._get_node()
+
+    def _get_node(self):
+        """ Gets the Tree being viewed, looking it up if need be."""
+        version = self._tree._version
+        if version != self._version:
+            if self._tree._interned == 1:
+                self._tree._unshare(self._names)
+                version = self._tree._version
+            node = self._tree._find_node(self._key, self._names)
+            if not isinstance(node, Tree):
+                raise KeyError(self._key + ' is not a Tree.')
+            self._node = node
+            self._version = version
+        return self._node
+
+    @property
+    def tree(self):
+        """ The ``Tree`` being viewed part of.
+
+        Tree
+
+        """
+        return self._tree
+
+    @property
+    def prefix(self):
+        """ The absolute POSIX path to the ``Tree`` being viewed.
+
+        str
+
+        It is the path in the root ``Tree`` that ``tree`` is in.
+
+        """
+        return self._prefix or posixpath.sep
+
+    @property
+    def node(self):
+        """ The ``Tree`` being viewed.
+
+        Tree
+
+        Raises
+        ------
+        KeyError
+            If `prefix` no longer points to a ``Tree``.
+
+        """
+        return self._get_node()
+
+    def abspath(self, path):
+        """ Gets the absolute path of a path in this view.
+
+        Parameters
+        ----------
+        path : str
+            POSIX style path relative to ``prefix``.
+
+        Returns
+        -------
+        abspath : str
+            The normalized absolute POSIX path in the root ``Tree``
+            that ``tree`` is in.
+
+        """
+        key, names = _parse_path(path)[:2]
+        if len(names) == 0:
+            return self.prefix
+        return self._prefix + key
+
+    def __len__(self):
+        """ Returns the number of children of the viewed Tree."""
+        return len(self._get_node())
+
+    def __contains__(self, item):
+        """ Checks if a key is in the viewed Tree."""
+        return item in self._get_node()
+
+    def __iter__(self):
+        """ Returns an iterator over the children of the viewed Tree.
+        """
+        return iter(self._get_node())
+
+    def keys(self):
+        """ Returns all the keys for the children of the viewed Tree.
+        """
+        return self._get_node().keys()
+
+    def items(self):
+        """ Returns all the children and their names in the viewed Tree.
+        """
+        return self._get_node().items()
+
+    def __getitem__(self, path):
+        """ Gets by path relative to ``prefix``.
+
+        See Also
+        --------
+        Tree.__getitem__
+
+        """
+        return self._get_node()[path]
+
+    def __setitem__(self, path, value):
+        """ Sets by path relative to ``prefix``.
+
+        See Also
+        --------
+        Tree.__setitem__
+
+        """
+        self._get_node()[path] = value
+
+    def __delitem__(self, path):
+        """ Deletes by path relative to ``prefix``.
+
+        See Also
+        --------
+        Tree.__delitem__
+
+        """
+        del self._get_node()[path]
+
+    def get(self, path, default=None):
+        """ Gets by path relative to ``prefix`` with a default.
+
+        See Also
+        --------
+        Tree.get
+
+        """
+        return self._get_node().get(path, default)
+
+    def get_many(self, paths):
+        """ Gets by several paths relative to ``prefix`` at once.
+
+        See Also
+        --------
+        Tree.get_many
+
+        """
+        return self._get_node().get_many(paths)
+
+    def set_many(self, values):
+        """ Sets by several paths relative to ``prefix`` at once.
+
+        See Also
+        --------
+        Tree.set_many
+
+        """
+        self._get_node().set_many(values)
+
+    def handle(self, path):
+        """ Gets a handle to a ``Leaf`` at a path relative to ``prefix``.
+
+        The handle is bound to the ``Leaf`` at the absolute path in the
+        root ``Tree`` that ``tree`` is in.
+
+        See Also
+        --------
+        Tree.handle
+
+        """
+        return self._root.handle(self.abspath(path))
+
+    def list_all(self, tp='all'):
+        """ List the absolute paths of the children recursively.
+
+        See Also
+        --------
+        Tree.list_all
+
+        """
+        return [self._prefix + k
+                for k in self._get_node().list_all(tp=tp)]
+
+    def glob(self, pattern, tp='all', output='paths'):
+        """ Finds everything matching a pattern relative to ``prefix``.
+
+        Paths are returned as absolute paths (see ``abspath``).
+
+        See Also
+        --------
+        Tree.glob
+
+        """
+        found = self._get_node().glob(pattern, tp=tp, output=output)
+        if output == 'paths':
+            return [self._prefix + k for k in found]
+        return found
+
+    def iglob(self, pattern, tp='all', output='paths'):
+        """ Iterates over everything matching a pattern relative to
+        ``prefix``.
+
+        Paths are given as absolute paths (see ``abspath``).
+
+        See Also
+        --------
+        Tree.iglob
+
+        """
+        found = self._get_node().iglob(pattern, tp=tp, output=output)
+        if output == 'paths':
+            return (self._prefix + k for k in found)
+        return found
+
+    def get_values(self, form='paths'):
+        """ Returns the viewed ``Tree`` stripped to ``Leaf`` values.
+
+        If `form` is ``'paths'``, the keys are absolute paths (see
+        ``abspath``).
+
+        See Also
+        --------
+        Tree.get_values
+
+        """
+        values = self._get_node().get_values(form=form)
+        if form == 'paths':
+            return dict([(self._prefix + k, v)
+                         for k, v in values.items()])
+        return values
+
+    def set_values(self, values):
+        """ Apply a group of values with paths relative to ``prefix``.
+
+        See Also
+        --------
+        Tree.set_values
+
+        """
+        self._get_node().set_values(values)
 
-        # Copy everything in keywords into the extra parameters
-        # dictionary.
-        self._extra_parameters = copy.deepcopy(keywords)
+    def find_invalids(self, incremental=False):
+        """ Returns the absolute paths to each invalid ``Leaf``.
 
-    @property
-    def value(self):
-        """ The value of this particular setting
+        Checks every ``Leaf`` in the viewed ``Tree`` against all the
+        settings in the root ``Tree`` that ``tree`` is in, not just
+        those in the viewed ``Tree``. With `incremental`, the root
+        ``Tree`` is validated incrementally and those in the viewed
+        ``Tree`` are picked out.
 
-        any type
+        See Also
+        --------
+        Tree.find_invalids
+
+        """
+        if incremental:
+            self._get_node()
+            prefix = self._prefix + posixpath.sep
+            return [k for k in self._root.find_invalids(True)
+                    if k.startswith(prefix)]
+        return self._root._find_invalids(self.list_all(tp='leaf'))
+
+    def is_valid(self, incremental=False):
+        """ Returns whether every ``Leaf`` in the view is valid.
+
+        Checks every ``Leaf`` in the viewed ``Tree`` against all the
+        settings in the root ``Tree`` that ``tree`` is in, not just
+        those in the viewed ``Tree``. `incremental` is passed on to
+        ``find_invalids``.
 
         See Also
         --------
-        is_valid
-        
+        Tree.is_valid
+
         """
-        return copy.deepcopy(self._value)
+        return (0 == len(self.find_invalids(incremental)))
 
-    @value.setter
-    def value(self, value2):
-        self._value = copy.deepcopy(value2)
 
+class TreeSnapshot(object):
+    """ Read-only version of a ``Tree`` as it was at one point in time.
 
-    @property
-    def valid_value_types(self):
-        """ The python types that the setting value must be a type of.
+    Made by ``Tree.snapshot`` in O(1). It works like the ``Tree`` did
+    when it was taken for getting things, listing them, and checking
+    if they are there, no matter how the ``Tree`` is changed after.
+    Nothing about it can be changed. Values are handed out as deep
+    copies (frozen ones are not copied, see ``Leaf.copy_policy``).
 
-        type, iterable of types, or None
+    Parameters
+    ----------
+    tree : Tree
+        The ``Tree`` to take the snapshot of.
 
-        The type/s that this setting's value must be a type of in
-        order to be valid. ``None`` is used to indicate that any type
-        is allowed. Is stored as ``None`` or a ``tuple`` of types.
+    Attributes
+    ----------
+    tree : Tree
 
-        Raises
-        ------
-        TypeError
-            If set to something invalid.
+    See Also
+    --------
+    Tree.snapshot
 
-        """
-        return copy.deepcopy(self._valid_value_types)
-    
-    @valid_value_types.setter
-    def valid_value_types(self, value2):
-        if value2 is None:
-            self._valid_value_types = None
-        elif isinstance(value2, type):
-            self._valid_value_types = (value2,)
-        elif isinstance(value2, collections.Iterable):
-            for v in value2:
-                if not isinstance(v, type):
-                    raise TypeError('An element of the iterable was not'
-                                    ' a type.')
-            self._valid_value_types = tuple(value2)
-        else:
-            raise TypeError('Set to something invalid.')
+    """
+    def __init__(self, tree):
+        if not isinstance(tree, Tree):
+            raise TypeError('tree must be a Tree.')
+        self._tree = tree
+        root = _locate(tree)[0]
+        if root._snapshots is None:
+            root._snapshots = _SnapshotClock()
+        self._generation = _SnapshotGeneration(root._snapshots)
+        self._gen = self._generation.gen
+
+    def _sub(self, tree):
+        """ Gets the snapshot of a Tree nested in this one."""
+        snapshot = TreeSnapshot.__new__(TreeSnapshot)
+        snapshot._tree = tree
+        snapshot._generation = self._generation
+        snapshot._gen = self._gen
+        return snapshot
 
-    
     @property
-    def allowed_values(self):
-        """ The allowed setting values.
-
-        iterable or None
+    def tree(self):
+        """ The ``Tree`` the snapshot was taken of.
 
-        The valid values allowed for this setting. ``None`` designates
-        that this feature is not used (all values otherwise valid
-        are allowed). Stored as ``None`` or a ``tuple``.
+        Tree
 
-        Raises
-        ------
-        TypeError
-            If set to something invalid.
+        It is the ``Tree`` as it is now, not as it was.
 
-        See Also
-        --------
-        forbidden_values
-        
         """
-        return copy.deepcopy(self._allowed_values)
-
-    @allowed_values.setter
-    def allowed_values(self, value2):
-        if value2 is None:
-            self._allowed_values = None
-        elif isinstance(value2, collections.Iterable):
-            self._allowed_values = tuple(copy.deepcopy(value2))
-        else:
-            raise TypeError('Set to something invalid.')
+        return self._tree
 
-    
-    @property
-    def forbidden_values(self):
-        """ The forbidden setting values.
+    def _children(self, tree):
+        """ Gets the children a Tree had when the snapshot was taken."""
+        return _state_at(tree, self._gen)
 
-        iterable or None
+    def _find(self, path):
+        """ Finds what is at a path when the snapshot was taken.
 
-        The values forbidden for this setting. ``None`` designates
-        that this feature is not used. Stored as ``None`` or a ``tuple``.
+        Returns
+        -------
+        node : Tree, Leaf, or other
+            The ``Tree`` or ``Leaf`` as it was (``Tree`` are the live
+            ones, whose children must be gotten with ``_children``).
+        trailing : bool
+            Whether the path has a trailing ``'/'``.
+        extra : tuple or None
+            ``(leaf, subpath)`` if the path is to an extra parameter of
+            `leaf`, and ``None`` otherwise.
 
         Raises
         ------
-        TypeError
-            If set to something invalid.
+        KeyError
+            If `path` is not an ``str`` or there is nothing there.
 
-        See Also
-        --------
-        allowed_values
-        
         """
-        return copy.deepcopy(self._forbidden_values)
+        if not isinstance(path, str):
+            raise KeyError('path must be a str.')
+        key, names, trailing, is_root = _parse_path(path)
+        node = self._tree
+        for i, name in enumerate(names):
+            if isinstance(node, Leaf):
+                subpath = posixpath.sep.join(names[i:])
+                if trailing:
+                    subpath = subpath + posixpath.sep
+                if subpath not in node:
+                    raise KeyError('Couldn''t find ' + name + '.')
+                return None, trailing, (node, subpath)
+            elif not isinstance(node, Tree):
+                raise KeyError(names[i - 1] + ' is not a Tree or Leaf.')
+            children = self._children(node)
+            if name not in children:
+                raise KeyError('Couldn''t find ' + name + '.')
+            node = children[name]
+            if isinstance(node, Leaf):
+                node = _state_at(node, self._gen)
+        return node, trailing or is_root, None
+
+    # Implement a read-only dictionary interface for all the children.
 
-    @forbidden_values.setter
-    def forbidden_values(self, value2):
-        if value2 is None:
-            self._forbidden_values = None
-        elif isinstance(value2, collections.Iterable):
-            self._forbidden_values = tuple(copy.deepcopy(value2))
-        else:
-            raise TypeError('Set to something invalid.')
+    def __len__(self):
+        """ Returns the number of children."""
+        return len(self._children(self._tree))
 
+    def __contains__(self, item):
+        """ Checks if a key is in one of the children."""
+        try:
+            self._find(item)
+            return True
+        except KeyError:
+            return False
 
-    @property
-    def validators(self):
-        """ The simple validators to use and their parameters.
-        
-        iterable of iterables, or None
+    def __iter__(self):
+        """ Returns an iterator over the children."""
+        return iter(list(self._children(self._tree)))
 
-        The simple validators for the setting value to use and their
-        parameters, or ``None`` to not use any. The available ones and
-        how many parameters they required can be found by calling
-        ``available_validators``. Each one must be given as a two
-        element iterable with the string name of the simple validator
-        in the first element and the parameters in the second. If it
-        takes one parameter, the second element should be that
-        parameter. If it takes two parameters, the second element
-        should be an iterable of the two parameters. The parameters
-        must inherit from ``numbers.Number``. The simple validators must
-        be given as an iterable of them, so an iterable of iterables.
+    def keys(self):
+        """ Returns all the keys for the children."""
+        return list(self._children(self._tree))
 
-        Warning
-        -------
-        It is possible to set the group of simple validators such that
-        no setting is valid.
+    def __getitem__(self, path):
+        """ Gets by path.
 
-        Raises
-        ------
-        TypeError
-            If set to something invalid.
+        Works like getting from a ``Tree``, except that a snapshot of a
+        nested ``Tree`` is gotten instead of the ``Tree`` itself and a
+        copy of a ``Leaf`` is gotten instead of the ``Leaf`` itself.
 
         See Also
         --------
-        available_validators
-        
+        Tree.__getitem__
+
         """
-        return copy.deepcopy(self._validators)
-    
-    @validators.setter
-    def validators(self, value2):
-        if value2 is None:
-            self._validators = None
-        elif not isinstance(value2, collections.Iterable):
-            raise TypeError('Must be set to an iterable of iterables.')
-        else:
-            # Check every simple validator to see if it is available
-            # and the parameters match up.
-            avail_vals, nparams = self.available_validators()
-            for v in value2:
-                if not isinstance(v, collections.Iterable) \
-                        or len(v) != 2 or v[0] not in avail_vals:
-                    raise TypeError('Each element must be a 2 element'
-                                    ' iterable with an available'
-                                    ' simple validator.')
-                # If one parameter, it must be a number. If two
-                # parameters it must be an iterable of two numbers.
-                if 1 == nparams[avail_vals.index(v[0])]:
-                    if not isinstance(v[1], numbers.Number):
-                        raise TypeError('Parameter must be a Number')
-                else:
-                    if not isinstance(v[1], collections.Iterable) \
-                            or len(v[1]) != 2 \
-                            or not isinstance(v[1][0], numbers.Number) \
-                            or not isinstance(v[1][1], numbers.Number):
-                        raise TypeError('Parameters must be an '
-                                        'iterable of two Numbers')
-            # It is valid. Now assign it.
-            self._validators = tuple([(v[0], copy.deepcopy(v[1]))
-                                     for v in value2])
+        node, trailing, extra = self._find(path)
+        if extra is not None:
+            return copy.deepcopy(extra[0][extra[1]])
+        elif isinstance(node, Tree):
+            if trailing:
+                return self._sub(node)
+            return list(self._children(node))
+        elif isinstance(node, Leaf):
+            if trailing:
+                return copy.deepcopy(node)
+            elif node._frozen:
+                return _view(node._value)
+            return copy.deepcopy(node._value)
+        raise KeyError(path + ' is an invalid object.')
+
+    def get(self, path, default=None):
+        """ Gets by path, returning a default if it is not there.
 
+        See Also
+        --------
+        Tree.get
 
-    @property
-    def validator_function(self):
-        """ Custom validation function to validate the setting.
-        
-        function or None
+        """
+        try:
+            return self[path]
+        except KeyError:
+            return default
 
-        User provided custom validator function to check the validity
-        of this setting after all other checks have been done. ``None``
-        means the feature is not used. It must be a function (includes
-        those made by ``lambda``). It must return a ``bool`` indicating
-        whether the setting is valid (``True``) or not (``False``) and
-        take two arguments. The first is the value of this setting
-        and the second is a ``dict`` containing all the other
-        settings in the root settings ``Tree`` that this is a part of
-        with the POSIX paths to the individual setting leaves as the
-        keys and their values as the values. Thowing an exception, which
-        will be caught, is considered as the setting being invalid.
+    def _walk(self):
+        """ Goes through everything nested in the Tree as it was.
 
-        Raises
-        ------
-        TypeError
-            If set to something invalid.
+        Like ``Tree._walk``.
+
+        """
+        stack = [('', self._tree)]
+        while len(stack) != 0:
+            path, tree = stack.pop()
+            children = list(self._children(tree).items())
+            for k, v in reversed(children):
+                child_path = path + posixpath.sep + k
+                if isinstance(v, Tree):
+                    yield child_path, v
+                    stack.append((child_path, v))
+                elif isinstance(v, Leaf):
+                    yield child_path, _state_at(v, self._gen)
+
+    def list_all(self, tp='all'):
+        """ List the children recursively.
 
         See Also
         --------
-        Tree.list
+        Tree.list_all
 
         """
-        return self._validator_function
-    
-    @validator_function.setter
-    def validator_function(self, value2):
-        if value2 is None:
-            self._validator_function = None
-        elif inspect.isfunction(value2) \
-                and ((sys.hexversion < 0x3040000 \
-                and 2 == len(inspect.getargspec(value2).args)) \
-                or (sys.hexversion >= 0x3040000 \
-                and 2 == len(inspect.signature(value2).parameters))):
-            self._validator_function = copy.deepcopy(value2)
-        else:
-            raise TypeError('Must be set to a function taking 2 '
-                            'arguments or None.')
+        if tp not in ('all', 'tree', 'leaf'):
+            raise ValueError('tp is not ''all'', ''tree'', or'
+                             + ' ''leaf''.')
+        if tp == 'all':
+            return sorted([k for k, v in self._walk()])
+        cls = Leaf if tp == 'leaf' else Tree
+        return sorted([k for k, v in self._walk() if isinstance(v, cls)])
 
-    def available_validators(self):
-        """ Returns the available validators and number of parameters.
+    def get_values(self, form='paths'):
+        """ Returns the ``Leaf`` values.
 
-        Returns the ``str`` identifiers for the simple validators that
-        are available as well as the number of parameters each take.
-        The available validators are in the table below for convenience.
-        N is the number of parameters it takes. V is the value of this
-        setting. X is the first (or only) parameter and Y is the
-        second.
+        See Also
+        --------
+        Tree.get_values
 
-        ==========================  =  ================================
-        validator                   N  Valid if
-        ==========================  =  ================================
-        ``'GreaterThan'``           1  V > X
-        ``'LessThan'``              1  V < X
-        ``'GreaterThanOrEqualTo'``  1  V >= X
-        ``'LessThanOrEqualTo'``     1  V <= X
-        ``'NotEqual'``              1  V != X
-        ``'Between'``               2  min(X, Y) <= V <= max(X, Y)
-        ``'NotBetween'``            2  V <= min(X, Y) OR V >= max(X, Y)
-        ==========================  =  ================================
+        """
+        if form not in ('paths', 'nested'):
+            raise ValueError('form must be either ''paths'' or'
+                             + ' ''nested''.')
+        out = dict()
+        stack = [(self._tree, out, '')]
+        while len(stack) != 0:
+            tree, tree_out, path = stack.pop()
+            for k, v in self._children(tree).items():
+                if isinstance(v, Leaf):
+                    v = _state_at(v, self._gen)
+                    if v._frozen:
+                        value = _view(v._value)
+                    else:
+                        value = copy.deepcopy(v._value)
+                    if form == 'paths':
+                        out[path + posixpath.sep + k] = value
+                    else:
+                        tree_out[k] = value
+                elif isinstance(v, Tree):
+                    if form == 'paths':
+                        stack.append((v, None, path + posixpath.sep + k))
+                    else:
+                        tree_out[k] = dict()
+                        stack.append((v, tree_out[k], ''))
+        return out
+
+    def to_tree(self):
+        """ Makes a new ``Tree`` that is a copy of the snapshot.
 
         Returns
         -------
-        available_validators : tuple of str
-            The names of the validators (first column in above table).
-        number_parameters : tuple of ints
-            The number of parameters each validator takes (second
-            column in the above table).
+        tree : Tree
+            A deep copy of the ``Tree`` as it was when the snapshot was
+            taken.
 
         See Also
         --------
-        validators
-        
+        Tree.clone
+        Tree.restore
+
         """
-        return (('GreaterThan', 'GreaterThanOrEqualTo', 'LessThan',
-                'LessThanOrEqualTo', 'Between', 'NotBetween',
-                'NotEqual'), (1, 1, 1, 1, 2, 2, 1))
+        return self._tree._clone(dict(), True, self._gen)
 
-    def is_valid(self, all_settings):
-        """ Checks and returns whether this setting is valid or not.
 
-        Parameters
-        ----------
-        all_settings : dict
-            All the settings from the root ``Tree`` all the way to each
-            end ``Leaf``. The keys are the POSIX paths to each ``Leaf``
-            and the key is the value of the setting of the ``Leaf``.
-            Generated by calling ``Tree.list()`` on the root ``Tree``.
+class _CompactSettings(Mapping):
+    """ Read-only view of the values of all the settings in a CompactTree.
 
-        Returns
-        -------
-        validity : bool
-            Whether this setting is valid (``True``) or not (``False``).
+    What validator functions are given by ``CompactTree.find_invalids``
+    (see ``_AllSettings``). Looking up a key finds the ``Leaf`` by going
+    down the arrays and hands out a copy of its value every time.
 
-        See Also
-        --------
-        Tree.list
-        
-        """
-        # Wrap in a try block to catch any exceptions that may be caused
-        # by invalid attribute values that could have slipped in.
-        try:
-            # Check that it is one of the allowed types, is an allowed
-            # value, and is not a forbidden value.
-            if self._valid_value_types is not None \
-                    and type(self._value) not in self._valid_value_types:
-                return False
-            if self._allowed_values is not None \
-                    and self._value not in self._allowed_values:
-                return False
-            if self._forbidden_values is not None \
-                    and self._value in self._forbidden_values:
-                return False
+    Parameters
+    ----------
+    tree : CompactTree
+        The ``CompactTree``.
 
-            # Check the value against all the simple validators. First,
-            # though, construct functions for the validators (true if
-            # valid and false otherwise).
-            vals = {'GreaterThan': lambda v, params: v > params,
-                    'LessThan': lambda v, params: v < params,
-                    'GreaterThanOrEqualTo':
-                    lambda v, params: v >= params,
-                    'LessThanOrEqualTo': lambda v, params: v <= params,
-                    'NotEqual': lambda v, params: v != params,
-                    'Between': lambda v, params:
-                    v >= min(params) and v <= max(params),
-                    'NotBetween': lambda v, params:
-                    v <= min(params) or v >= max(params)}
-            if self._validators is not None:
-                for val, params in self._validators:
-                    if not vals[val](self._value, params):
-                        return False
-
-            # Check the custom validator.
-            if self._validator_function is not None:
-                return self._validator_function(self._value,
-                                                all_settings)
-
-            # Must be valid since all tests were passed.
-            return True
-        except:
-            return False
+    """
+    __slots__ = ('_tree', '_paths')
+
+    def __init__(self, tree):
+        self._tree = tree
+        self._paths = None
+
+    def _find(self, key):
+        """ Gets the index of the Leaf at a path, or None."""
+        if not isinstance(key, str) or not key.startswith(posixpath.sep):
+            return None
+        try:
+            index, trailing, extra = self._tree._find(key)
+        except KeyError:
+            return None
+        if extra is not None or index == 0 \
+                or self._tree._kind_table()[self._tree._types[index]] \
+                != self._tree._leaf_kind:
+            return None
+        return index
+
+    def _get_paths(self):
+        """ Gets the sorted paths to every Leaf, listing them if needed.
+        """
+        if self._paths is None:
+            self._paths = self._tree.list_all(tp='leaf')
+        return self._paths
 
-    # Implement a dictionary interface for all the extra parameters
-    # by mapping the relevant dict functions to the functions inside
-    # _extra_parameters.
-    def __len__(self):
-        """ Returns the number of extra parameters."""
-        return len(self._extra_parameters)
-    
     def __getitem__(self, key):
-        """ Gets a particular extra parameter."""
-        return self._extra_parameters[key]
-    
-    def __setitem__(self, key, value):
-        """ Sets a particular extra parameter."""
-        self._extra_parameters[key] = value
-    
-    def __delitem__(self, key):
-        """ Removes a particular extra parameter."""
-        del self._extra_parameters[key]
-    
-    def __contains__(self, item):
-        """ Checks if a key is in the extra parameters."""
-        return self._extra_parameters.__contains__(item)
-    
-    def __iter__(self):
-        """ Returns an iterator over the extra parameters."""
-        return self._extra_parameters.__iter__()
-    
-    def keys(self):
-        """ Returns all the keys for the extra parameters."""
-        return self._extra_parameters.keys()
-    
-    def items(self):
-        """ Returns the items of the extra parameters."""
-        return self._extra_parameters.items()
+        index = self._find(key)
+        if index is None:
+            raise KeyError(key)
+        return self._tree._get_values([index])[0]
 
+    def __contains__(self, key):
+        return self._find(key) is not None
 
-class Tree(object):
-    """ Object to work with a tree of settings.
+    def __iter__(self):
+        return iter(self._get_paths())
 
-    Represents a tree of settings composed of one or more ``Tree`` that
-    can be nested and then one or more ``Leaf`` objects as the settings
-    themselves. The children of this ``Tree`` are ordered by the order
-    that each ``Tree`` and ``Leaf`` are added.
+    def __len__(self):
+        return len(self._get_paths())
+
+
+class CompactTree(object):
+    """ Compact read-only form of a ``Tree`` for very large trees.
+
+    Made from a ``Tree`` (it is a copy, so changing the ``Tree`` after
+    doesn't change it). Rather than a python object for each ``Tree``
+    and ``Leaf``, the structure is kept in arrays (``array.array``)
+    with one element per ``Tree`` and ``Leaf`` in depth first order:
+    the index of the ``Tree`` each is in, its name (as an index into a
+    table of the different names), and so on. Values that are ``int``
+    (that fit in 64 bits), ``float``, or ``bool`` are kept in an array
+    for each type, and all others in a ``list``. ``LeafSpec`` are shared
+    between the ``Leaf`` that had them.
+
+    It works like a ``Tree`` for getting things, listing them, checking
+    if they are there, and validating them, but nothing about it can be
+    changed. Values are handed out as deep copies (frozen ones are not
+    copied, see ``Leaf.copy_policy``). ``list_all``, ``get_values``,
+    and ``diff`` work on whole arrays at a time (with numpy if it is
+    available). Getting something by path goes down the arrays from the
+    root, finding each part among the children of the ``Tree`` before
+    it (those of a ``Tree`` with more than a few are sorted by name the
+    first time it is gone through). The paths to everything are only
+    made the first time something needs all of them (listing them,
+    ``get_values``, ``diff``, and validating).
+
+    Converting back to a ``Tree`` with ``to_tree`` gives an identical
+    copy of the ``Tree`` it was made from (except for attributes put
+    in the ``__dict__`` of subclasses of ``Tree`` and ``Leaf``, which
+    are not kept).
 
     Parameters
     ----------
-    children : anything that inherits collections.Mapping, optional
-        A ``dict`` or ``dict`` like object (inherits from
-        ``collections.Mapping``) of one or more ``Tree`` and/or
-        ``Leaf`` to be put into this ``Tree``. They are added in the
-        order that `children` is mapped. Each key is a POSIX path to
-        where to put the ``Leaf`` or ``Tree`` associated with it.
-    **keywords : optional
-        Aditional keyword arguments which are put in this ``Tree``.
+    tree : Tree
+        The ``Tree`` to make it from.
 
     Raises
     ------
     TypeError
-        If set to something invalid.
-
-    Notes
-    -----
-    Recursion is used very heavily in this class for all operations, so
-    the tree of settings should not be nested too deep.
+        If `tree` is not a ``Tree``.
 
     See Also
     --------
-    Leaf
-    collections.Mapping
+    Tree.compact
 
     """
-    def __init__(self, children=None, **keywords):
-        # Set _children to an empty ordered dict and then add the
-        # elements of children one by one if it is dict like
-        self._children = OrderedDict()
-        if children is not None:
-            if not isinstance(children, collections.Mapping):
-                raise TypeError('children must be a Mapping of '
-                                + 'Tree''s and Leaf''s.')
-            for k, v in children.items():
-                if isinstance(v, (Tree, Leaf)):
-                    self[k] = v
-                else:
-                    raise TypeError('children must be a Mapping of '
-                                    + 'Tree''s and Leaf''s.')
-
-        # Copy everything in keywords into the extra parameters
-        # dictionary.
-        self._extra_parameters = copy.deepcopy(keywords)
-
+    # The indices of the columns the values are kept in. Values of
+    # other types (or frozen values) are in the last column.
+    _int_column = 0
+    _float_column = 1
+    _bool_column = 2
+    _object_column = 3
+
+    # What each type of node (see _kind_table) is.
+    _tree_kind = 0
+    _leaf_kind = 1
+    _other_kind = 2
+
+    def __init__(self, tree):
+        if not isinstance(tree, Tree):
+            raise TypeError('tree must be a Tree.')
 
-    # Implement a dictionary interface for all the chilren.
+        # The structure. The root is the first and in no Tree (-1).
+        self._parents = array.array('l')
+        self._sizes = array.array('l')
+        self._names = array.array('l')
+        self._name_table = []
+        self._types = array.array('H')
+        self._type_table = []
+        self._policies = array.array('B')
+        self._specs = array.array('l')
+        self._spec_table = []
+        self._extra_parameters = dict()
+        self._frozen = set()
+
+        # Where the value of each is (the column and the position in
+        # it, which are -1 for Tree).
+        self._value_columns = array.array('b')
+        self._value_positions = array.array('l')
+        self._columns = (_int_array(), array.array('d'),
+                         array.array('B'), [])
+
+        # The paths to everything (in the same order) and the order
+        # of the sorted paths, made when first needed.
+        self._paths = None
+        self._order = None
+
+        # The children of each Tree gone through by path that has more
+        # than a few, sorted by name.
+        self._sorted_children = dict()
+
+        name_ids = dict()
+        type_ids = dict()
+        spec_ids = dict()
+        int_min = -(1 << (8 * self._columns[0].itemsize - 1))
+        int_max = -int_min - 1
+        policy_ids = (None, ) + copy_policies
+
+        # Go through everything depth first, putting each child on the
+        # stack with the index of its parent (in reverse order so that
+        # they come off in order).
+        stack = [(tree, -1, None)]
+        while len(stack) != 0:
+            node, parent, name = stack.pop()
+            index = len(self._parents)
+            self._parents.append(parent)
+            self._sizes.append(1)
+            if name is None:
+                self._names.append(-1)
+            else:
+                if name not in name_ids:
+                    name_ids[name] = len(self._name_table)
+                    self._name_table.append(name)
+                self._names.append(name_ids[name])
+            tp = type(node)
+            if tp not in type_ids:
+                type_ids[tp] = len(self._type_table)
+                self._type_table.append(tp)
+            self._types.append(type_ids[tp])
+
+            if isinstance(node, (Tree, Leaf)):
+                self._policies.append(policy_ids.index(node._copy_policy))
+                if node._extra_parameters:
+                    self._extra_parameters[index] = copy.deepcopy(
+                        node._extra_parameters)
+            else:
+                self._policies.append(0)
+
+            if isinstance(node, Tree):
+                self._specs.append(-1)
+                self._value_columns.append(-1)
+                self._value_positions.append(-1)
+                stack.extend([(v, index, k) for k, v in
+                              reversed(list(node._children.items()))])
+                continue
+
+            # A Leaf (or something invalid that slipped in, whose value
+            # is itself).
+            if isinstance(node, Leaf):
+                if id(node._spec) not in spec_ids:
+                    spec_ids[id(node._spec)] = len(self._spec_table)
+                    self._spec_table.append(node._spec)
+                self._specs.append(spec_ids[id(node._spec)])
+                value = node._value
+                if node._frozen:
+                    self._frozen.add(index)
+            else:
+                self._specs.append(-1)
+                value = node
+            vtp = type(value)
+            if index in self._frozen:
+                column = self._object_column
+            elif vtp is int and int_min <= value <= int_max:
+                column = self._int_column
+            elif vtp is float:
+                column = self._float_column
+            elif vtp is bool:
+                column = self._bool_column
+            else:
+                column = self._object_column
+                if index not in self._frozen:
+                    value = copy.deepcopy(value)
+            self._value_columns.append(column)
+            self._value_positions.append(len(self._columns[column]))
+            self._columns[column].append(value)
+
+        # The size of everything nested in each Tree (including itself)
+        # is added up going backwards, which gets to every child before
+        # the Tree it is in.
+        sizes = self._sizes
+        parents = self._parents
+        for index in range(len(parents) - 1, 0, -1):
+            sizes[parents[index]] += sizes[index]
 
     def __len__(self):
-        """ Returns the number of children in this Tree."""
-        return len(self._children)
+        """ Returns the number of children."""
+        return len(self._children(0))
 
     def __contains__(self, item):
         """ Checks if a key is in one of the children."""
         try:
-            junk = self[item]
-        except:
-            return False
-        else:
+            self._find(item)
             return True
+        except KeyError:
+            return False
 
     def __iter__(self):
         """ Returns an iterator over the children."""
-        return self._children.__iter__()
+        return iter(self.keys())
 
     def keys(self):
         """ Returns all the keys for the children."""
-        return self._children.keys()
+        return [self._name_table[self._names[i]]
+                for i in self._children(0)]
 
     def items(self):
-        """ Returns all the children and their names in this Tree."""
-        return self._children.items()
-
-    def __getitem__(self, path):
-        """ Gets by path.
+        """ Returns all the children and their names.
 
-        Gets by a POSIX style path. Each subdirectory in the path is a
-        ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
-        file part accesses the particular ``Leaf`` or ``Tree``. In all
-        cases, if a ``Leaf`` is reached in the path and there is more
-        path after that, then the rest references an extra parameter in
-        that ``Leaf``. The value of the ``Leaf`` or ``list`` of the
-        children of the ``Tree`` is obtained if the path does not end in
-        a trailing ``'/'``. If a trailing ``'/'`` is present, then the
-        ``Leaf`` or ``Tree`` pointed to by `path` is returned.
+        Each ``Tree`` and ``Leaf`` is made from what is in this
+        ``CompactTree`` like when getting it with a trailing ``'/'``.
 
-        Parameters
-        ----------
-        path : str
-            POSIX style path to the desired setting. ``'/'`` is the root
-            of this ``Tree``. A trailing ``'/'`` means return the Leaf
-            or Tree pointed to by `path` instead of its value
-            (``Leaf``) or a ``list`` of its children (``Tree``).
+        """
+        return [(self._name_table[self._names[i]], self._node(i))
+                for i in self._children(0)]
 
-        Returns
-        -------
-        value: Tree or Leaf or value or list of str, optional
-            The ``Leaf`` or ``Tree`` pointed to, the value of the
-            ``Leaf``, or a ``list`` of the children of the ``Tree``.
+    def __getitem__(self, path):
+        """ Gets by path.
 
-        Raises
-        ------
-        KeyError
-            If the setting pointed to by `path` cannot be found or
-            `path` is not an ``str``.
+        Works like getting from a ``Tree``, except that a ``Tree`` or
+        ``Leaf`` (with a trailing ``'/'``) is made from what is in this
+        ``CompactTree`` and is not in it.
 
         See Also
         --------
-        posixpath
-        Leaf.value
+        Tree.__getitem__
 
         """
-        return self._getsetdel_item(path, 'get')
-
-    def __setitem__(self, path, value):
-        """ Sets by path.
-
-        Sets by a POSIX style path. Each subdirectory in the path is a
-        ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
-        file part accesses the particular ``Leaf`` or ``Tree``. In all
-        cases, if a ``Leaf`` is reached in the path and there is more
-        path after that, then the rest references an extra parameter in
-        that ``Leaf`` which will be set to `value`. If `value` is a
-        ``Tree`` or ``Leaf``, then the location pointed to by `path` is
-        set to `value` even if parent ``Tree`` need to be
-        made. Otherwise, `path` must point to a ``Leaf``, in which case
-        its value is set to `leaf`.
- 
-        Parameters
-        ----------
-        path : str
-            POSIX style path to the desired setting. ``'/'`` is the root
-            of this ``Tree``.
-        value : Tree or Leaf or value, optional
-            The value to set. If it is a ``Tree`` or ``Leaf``, then
-            `path` points to the desired name for it. Otherwise, it is a
-            value and `path` must point to a ``Leaf`` which will have
-            its value set to `value`.
-
-        Raises
-        ------
-        KeyError
-            If the setting pointed to by `path` cannot be found or
-            `path` is not an ``str``.
-        TypeError
-            If trying to set a ``Tree`` to not a ``Tree`` or ``Leaf``.
+        index, trailing, extra = self._find(path)
+        if extra is not None:
+            return copy.deepcopy(
+                self._extra_parameters[extra[0]][extra[1]])
+        kind = self._kind_table()[self._types[index]]
+        if kind == self._tree_kind:
+            if trailing:
+                return self._node(index)
+            return [self._name_table[self._names[i]]
+                    for i in self._children(index)]
+        elif kind == self._leaf_kind:
+            if trailing:
+                return self._node(index)
+            return self._get_values([index])[0]
+        raise KeyError(path + ' is an invalid object.')
+
+    def get(self, path, default=None):
+        """ Gets by path, returning a default if it is not there.
 
         See Also
         --------
-        posixpath
-        Leaf.value
+        Tree.get
 
         """
-        self._getsetdel_item(path, 'set', value=value)
-
-    def __delitem__(self, path):
-        """ Deletes by path.
-
-        Deletes by a POSIX style path. Each subdirectory in the path is
-        a ``Tree`` that holds one or more ``Tree`` and/or ``Leaf``. The
-        file part accesses the particular ``Leaf`` or ``Tree``. In all
-        cases, if a ``Leaf`` is reached in the path and there is more
-        path after that, then the rest references an extra parameter in
-        that ``Leaf``. The ``Leaf``, ``Tree``, or ``Leaf`` extra
-        parameter pointed to by `path` is deleted.
+        try:
+            return self[path]
+        except KeyError:
+            return default
 
-        Parameters
-        ----------
-        path : str
-            POSIX style path to the desired setting.
+    def _kind_table(self):
+        """ Gets what kind each type in the table of types is."""
+        return [self._tree_kind if issubclass(tp, Tree)
+                else (self._leaf_kind if issubclass(tp, Leaf)
+                      else self._other_kind)
+                for tp in self._type_table]
 
-        Raises
-        ------
-        KeyError
-            If the setting pointed to by `path` cannot be found or
-            `path` is not an ``str``.
+    def _children(self, index):
+        """ Gets the indices of the children of a Tree in order.
 
-        See Also
-        --------
-        posixpath
-        Leaf.value
+        Each child comes right after everything nested in the one
+        before it.
 
         """
-        self._getsetdel_item(path, 'del')
+        children = []
+        sizes = self._sizes
+        i = index + 1
+        end = index + sizes[index]
+        while i < end:
+            children.append(i)
+            i += sizes[i]
+        return children
+
+    def _child(self, index, name):
+        """ Gets the index of the child of a Tree with a name, or None.
+
+        A ``Tree`` with only a few children is gone through. The
+        children of one with more are sorted by name the first time and
+        kept (only for the ``Tree`` that are gone through) to be
+        searched after that.
 
-    def _getsetdel_item(self, path, operation, value=None):
-        """ Gets, sets, or deletes by path.
+        """
+        name_table = self._name_table
+        names = self._names
+        children = self._sorted_children.get(index)
+        if children is None:
+            children = self._children(index)
+            if len(children) <= 8:
+                for i in children:
+                    if name_table[names[i]] == name:
+                        return i
+                return None
+            children = array.array(
+                'l', sorted(children, key=lambda i: name_table[names[i]]))
+            self._sorted_children[index] = children
+        lo = 0
+        hi = len(children)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if name_table[names[children[mid]]] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(children) and name_table[names[children[lo]]] == name:
+            return children[lo]
+        return None
 
-        Gets, sets, or deletes by a POSIX style path. Each subdirectory
-        in the path is a ``Tree`` that holds one or more ``Tree`` and/or
-        ``Leaf``. The file part accesses the particular ``Leaf`` or
-        ``Tree``. In all cases, if a ``Leaf`` is reached in the path and
-        there is more path after that, then the rest references an extra
-        parameter in that ``Leaf``.
+    def _get_paths(self):
+        """ Gets the paths to everything, making them if needed.
 
-        If doing a get `operation`, the value of the ``Leaf`` or
-        ``list`` of the children of the ``Tree`` is obtained if the path
-        does not end in a trailing ``'/'``. If a trailing ``'/'`` is
-        present, then the ``Leaf`` or ``Tree`` pointed to by `path` is
-        returned.
+        Returns
+        -------
+        paths : list of str
+            The POSIX path to each in the same order they are kept in
+            (``'/'`` for the root).
+        order : list of int
+            The indices in the order of their sorted paths.
 
-        If doing a set `operation` and `value` is a ``Tree`` or
-        ``Leaf``, then the location pointed to by `path` is set to
-        `value` even if parent ``Tree`` need to be made. Otherwise,
-        `path` must point to a ``Leaf``, in which case its value is set
-        to `leaf`.
+        """
+        if self._paths is None:
+            paths = [posixpath.sep]
+            names = self._names
+            name_table = self._name_table
+            parents = self._parents
+            for index in range(1, len(parents)):
+                parent = parents[index]
+                if parent == 0:
+                    prefix = ''
+                else:
+                    prefix = paths[parent]
+                paths.append(prefix + posixpath.sep
+                             + name_table[names[index]])
+            self._order = sorted(range(len(paths)),
+                                 key=paths.__getitem__)
+            self._paths = paths
+        return self._paths, self._order
 
-        If doing a del `operation`, the ``Leaf``, ``Tree``, or ``Leaf``
-        extra parameter  pointed to by `path` is deleted.
+    def _find(self, path):
+        """ Finds what is at a path.
 
-        Parameters
-        ----------
-        path : str
-            POSIX style path to the desired setting. ``'/'`` is the root
-            of this ``Tree``. A trailing ``'/'`` has no effect unless
-            we are doing a get 'operation' in which case its presence
-            means return the Leaf or Tree pointed to by `path` instead
-            of its value (``Leaf``) or a ``list`` of its children
-            (``Tree``).
-        operation : {'get', 'set', 'del'}
-            Whether to get, set, or delete.
-        value : Tree or Leaf or value, optional
-            When doing a set `operation`, the value to set. If it is a
-            ``Tree`` or ``Leaf``, then `path` points to the desired name
-            for it. Otherwise, it is a value and `path` must point to a
-            ``Leaf`` which will have its value set to `value`.
+        Goes down from the root one part of the path at a time (see
+        ``_child``), so the paths to everything are not needed.
 
         Returns
         -------
-        value: Tree or Leaf or value or list of str, optional
-            If doing a get `operation`, the ``Leaf`` or ``Tree``
-            pointed to, the value of the ``Leaf``, or a ``list`` of
-            the children of the ``Tree``.
+        index : int or None
+            The index of the ``Tree``, ``Leaf``, or other at `path`.
+        trailing : bool
+            Whether the path has a trailing ``'/'``.
+        extra : tuple or None
+            ``(index, subpath)`` if the path is to an extra parameter
+            of the ``Leaf`` at `index`, and ``None`` otherwise.
 
         Raises
         ------
         KeyError
-            If the setting pointed to by `path` cannot be found or
-            `path` is not an ``str``.
-        ValueError
-            `operation` is not one of the allowed operations.
-        TypeError
-            If trying to set a ``Tree`` to not a ``Tree`` or ``Leaf``.
-
-        See Also
-        --------
-        posixpath
-        Leaf.value
+            If `path` is not an ``str`` or there is nothing there.
 
         """
-        # Check that operation is one of the allowed values.
-        if operation not in ('get', 'set', 'del'):
-            raise ValueError('operation must be ''get'', ''set'', '
-                             + 'or ''del''.')
-
-        # Check that path is an str.
         if not isinstance(path, str):
             raise KeyError('path must be a str.')
+        key, names, trailing, is_root = _parse_path(path)
+        kinds = self._kind_table()
+        index = 0
+        for i, name in enumerate(names):
+            kind = kinds[self._types[index]]
+            if kind == self._leaf_kind:
+                # The rest is an extra parameter of the Leaf.
+                subpath = posixpath.sep.join(names[i:])
+                if trailing:
+                    subpath = subpath + posixpath.sep
+                if subpath not in self._extra_parameters.get(index, ()):
+                    raise KeyError('Couldn''t find ' + subpath + '.')
+                return None, trailing, (index, subpath)
+            elif kind != self._tree_kind:
+                raise KeyError(names[i - 1] + ' is not a Tree or Leaf.')
+            index = self._child(index, name)
+            if index is None:
+                raise KeyError('Couldn''t find ' + name + '.')
+        return index, trailing or is_root, None
+
+    def _get_values(self, indices):
+        """ Gets the values of the Leaf at each index to hand out.
+
+        The values in each column are gotten all at once. Those in the
+        last column are deep copied if they are not frozen.
 
-        # If operation is get and path is just '/', then return this
-        # Tree. If it is two in a row, return the list of all
-        # children.
-        if operation == 'get':
-            if path == 2 * posixpath.sep:
-                return self
-            elif path == posixpath.sep:
-                return list(self._children.keys())
-
-        # Sanitize the path normalizing out '../' and stuff.
-        spath = posixpath.normpath(path)
+        Parameters
+        ----------
+        indices : list of int
+            The indices of the ``Leaf``.
 
-        # '/' isn't allowed for set and del
-        if operation in ('set', 'del') \
-                and spath.count(posixpath.sep) == len(spath):
-            raise KeyError('Can''t set or del root Tree.')
+        Returns
+        -------
+        values : list
+            The values in the same order.
 
-        # Remove the leading '/'s if it is an absolute path.
-        while spath[0] == posixpath.sep:
-            spath = spath[1:]
-
-        # Now, the sanitizing would have removed any trailing '/', so
-        # one needs to be put back on if there was one and we are doing
-        # a get.
-        if operation == 'get' and path[-1] == posixpath.sep:
-            spath = spath + posixpath.sep
-
-        # Find the position of the first separator.
-        index = spath.find(posixpath.sep)
-
-        # The case of no separator, a trailing separator, and a
-        # separator in the middle all need to be handled separately.
-        if index == -1:
-            # As there was no separator, spath specifies the particular
-            # setting that is wanted. For a get, it must be in the
-            # Tree's children or it is an error. For a get, the value is
-            # returned for a Leaf and the list of children returned for
-            # a Tree. For a set, if value is a Tree or Leaf, then it is
-            # set. If value is just a value, the Leaf's value will be
-            # set if there is a Leaf there (otherwise an error is
-            # thrown). If it is a del, it is deleted if present and an
-            # error thrown if not.
-            if operation == 'get':
-                if spath not in self._children:
-                    raise KeyError('Couldn''t find ' + spath + '.')
-                elif isinstance(self._children[spath], Leaf):
-                    return self._children[spath].value
-                elif isinstance(self._children[spath], Tree):
-                    return list(self._children[spath].keys())
-                else:
-                    raise KeyError(spath + ' is an invalid object.')
-            else:
-                if operation == 'set' and isinstance(value, (Leaf,
-                                                             Tree)):
-                    self._children[spath] = value
-                elif spath not in self._children:
-                    raise KeyError('Couldn''t find ' + spath + '.')
-                elif operation == 'del':
-                    del self._children[spath]
-                else:
-                    if isinstance(self._children[spath], Tree):
-                        raise TypeError('Can''t set a Tree to a value.')
-                    elif isinstance(self._children[spath], Leaf):
-                        self._children[spath].value = value
+        """
+        values = [None] * len(indices)
+        objects = self._columns[self._object_column]
+        for c, positions, selected in self._gather(indices):
+            if c == self._object_column:
+                column_values = []
+                for i, p in zip(selected, positions):
+                    if indices[i] in self._frozen:
+                        column_values.append(_view(objects[p]))
                     else:
-                        raise KeyError(spath + ' is an invalid object.')
-
-        elif index == len(spath) - 1:
-            # This is a get (only way a trailing '/' is allowed) and the
-            # separator is at the very end, meaning that the actual Tree
-            # or Leaf is desired. If it is not in children, an error
-            # must be raised.
-            if spath[:-1] not in self._children:
-                raise KeyError('Couldn''t find ' + spath + '.')
-            else:
-                return self._children[spath[:-1]]
-        else:
-            # The separator is in the middle, meaning that there is more
-            # path after it. So, the part before and the part after need
-            # to be obtained. If the part before is not in this Tree's
-            # children, a Tree must be made if value is a Tree or Leaf
-            # and we are doing a set operation and an error must be
-            # riased otherwise. Otherwise, we need to recurse into that
-            # Tree or Leaf (means the remainder of the path is an extra
-            # parameter).
-            rootpath = spath[:index]
-            subpath = spath[(index + 1):]
-            if rootpath not in self._children:
-                if operation == 'set' \
-                        and isinstance(value, (Tree, Leaf)):
-                    self[rootpath] = Tree(children={subpath: value})
-                else:
-                    raise KeyError('Couldn''t find ' + rootpath + '.')
-            elif isinstance(self._children[rootpath], (Tree, Leaf)):
-                if operation == 'get':
-                    return self._children[rootpath][subpath]
-                elif operation == 'set':
-                    self._children[rootpath][subpath] = value
-                else:
-                    del self._children[rootpath][subpath]
+                        column_values.append(copy.deepcopy(objects[p]))
             else:
-                raise KeyError(rootpath + ' is not a Tree or Leaf. '
-                               'Only Trees and Leaves can hold '
-                               + 'things.')
+                column_values = self._take(c, positions)
+            for i, v in zip(selected, column_values):
+                values[i] = v
+        return values
 
-    def list_all(self, tp='all'):
-        """ List the children of the Tree recursively.
+    def _gather(self, indices):
+        """ Gets where the values of the Leaf at each index are.
 
-        Returns the list of the POSIX paths to all the children of
-        this ``Tree`` (including those nested within its children and
-        their children and so on) of particular types (``Tree``,
-        ``Leaf``, or all).
+        Parameters
+        ----------
+        indices : list of int
+            The indices of the ``Leaf``.
+
+        Yields
+        ------
+        column : int
+            The index of a column that some of them are in.
+        positions : list of int
+            The positions in the column of the values that are in it.
+        selected : list of int
+            The positions in `indices` of the ``Leaf`` whose values are
+            in the column.
+
+        """
+        if numpy is not None and len(indices) != 0:
+            indices = numpy.asarray(indices, dtype=numpy.intp)
+            columns = _as_numpy(self._value_columns)[indices]
+            positions = _as_numpy(self._value_positions)[indices]
+            for c in range(len(self._columns)):
+                selected = numpy.nonzero(columns == c)[0]
+                if len(selected) != 0:
+                    yield (c, positions[selected].tolist(),
+                           selected.tolist())
+        else:
+            by_column = [([], []) for c in self._columns]
+            for i, index in enumerate(indices):
+                if self._value_columns[index] >= 0:
+                    positions, selected = \
+                        by_column[self._value_columns[index]]
+                    positions.append(self._value_positions[index])
+                    selected.append(i)
+            for c, (positions, selected) in enumerate(by_column):
+                if len(selected) != 0:
+                    yield c, positions, selected
+
+    def _take(self, column, positions):
+        """ Gets the values at positions in a typed column."""
+        values = self._columns[column]
+        if numpy is not None:
+            values = _as_numpy(values)[positions]
+            if column == self._bool_column:
+                values = values.astype(bool)
+            return values.tolist()
+        elif column == self._bool_column:
+            return [bool(values[p]) for p in positions]
+        return [values[p] for p in positions]
+
+    def _select(self, tp):
+        """ Gets the indices of those of a type in order of their paths.
 
         Parameters
         ----------
-        tp : {'all', 'tree', 'leaf'}, optional
-            What kind of things to return the paths to: ``Tree``,
-            ``Leaf``, or both ('all').
+        tp : {'all', 'tree', 'leaf'}
+            What kind of things to get (``Tree``, ``Leaf``, or both).
+            The root is not included.
 
         Returns
         -------
-        paths : list of str
-            The paths to all the children at all depths of this ``Tree``
-            of the desired types.
+        indices : list of int
+            The indices in the order of their sorted paths.
 
         Raises
         ------
@@ -902,324 +6773,488 @@ class Tree(object):
             `tp` is not one of the valid values.
 
         """
-        # Check the validity of tp.
         if tp not in ('all', 'tree', 'leaf'):
             raise ValueError('tp is not ''all'', ''tree'', or'
                              + ' ''leaf''.')
+        paths, order = self._get_paths()
+        kinds = self._kind_table()
+        if tp == 'all':
+            wanted = [k != self._other_kind for k in kinds]
+        elif tp == 'tree':
+            wanted = [k == self._tree_kind for k in kinds]
+        else:
+            wanted = [k == self._leaf_kind for k in kinds]
+        if numpy is not None:
+            order = numpy.asarray(order[1:], dtype=numpy.intp)
+            types = _as_numpy(self._types)[order]
+            return order[numpy.asarray(wanted, dtype=bool)[types]].tolist()
+        types = self._types
+        return [i for i in order[1:] if wanted[types[i]]]
 
-        # Iterate through each child and grab the paths to all desired
-        # children that fit the type. For Trees, regardless of what type
-        # we are collecting, we have to recurse into them and prepend the
-        # name of the tree to the beginning (stripping the leading '/').
-        children = []
-        for k, v in self.items():
-            if isinstance(v, Leaf):
-                if tp != 'tree':
-                    children.append(k)
-            elif isinstance(v, Tree):
-                if tp != 'leaf':
-                    children.append(k)
-                children.extend([posixpath.join(k, pth[1:])
-                                for pth in v.list_all(tp=tp)])
-
-        # Prepend with a '/', sort them, and then return them.
-        return sorted([posixpath.sep + ch for ch in children])
+    def list_all(self, tp='all'):
+        """ List the children recursively.
+
+        See Also
+        --------
+        Tree.list_all
+
+        """
+        paths = self._get_paths()[0]
+        return [paths[i] for i in self._select(tp)]
+
+    def get_values(self, form='paths'):
+        """ Returns the ``Leaf`` values.
+
+        See Also
+        --------
+        Tree.get_values
+
+        """
+        if form == 'paths':
+            paths = self._get_paths()[0]
+            indices = self._select('leaf')
+            return dict(zip([paths[i] for i in indices],
+                            self._get_values(indices)))
+        elif form != 'nested':
+            raise ValueError('form must be either ''paths'' or'
+                             + ' ''nested''.')
+
+        # Going through in order gets to every Tree before what is in
+        # it, so the dict of the Tree each is in is already made.
+        kinds = [self._kind_table()[tp] for tp in self._types]
+        leaves = [i for i, k in enumerate(kinds) if k == self._leaf_kind]
+        values = dict(zip(leaves, self._get_values(leaves)))
+        out = dict()
+        dicts = {0: out}
+        for index in range(1, len(kinds)):
+            parent = self._parents[index]
+            if kinds[index] == self._other_kind or parent not in dicts:
+                continue
+            name = self._name_table[self._names[index]]
+            if kinds[index] == self._tree_kind:
+                dicts[index] = dict()
+                dicts[parent][name] = dicts[index]
+            else:
+                dicts[parent][name] = values[index]
+        return out
 
     def diff(self, tree):
-        """ Find locations of differences between two ``Tree``.
+        """ Find locations of differences between two trees.
 
-        Compares the individual elements this ``Tree`` and the one
-        provided (`tree`). The POSIX style paths to each ``Leaf``
-        that is different between the two are returned in
-        three lists. One list for those found in both, but had different
-        values. The second for ones found in this ``Tree``, but not
-        `tree`. And the third for ones found in `tree`, but not this
-        ``Tree``.
+        Works like ``Tree.diff``. Values in the same typed column in
+        both are compared all at once.
 
         Parameters
         ----------
-        tree : Tree
-            The ``Tree`` to compare to.
+        tree : CompactTree or Tree
+            What to compare to.
 
         Returns
         -------
         different_values : list
-            ``list`` of POSIX paths to each ``Leaf`` that is present in
-            both trees, but have different values.
         only_in_self : list
-            ``list`` of POSIX paths to each ``Leaf`` that is only
-            present in this ``Tree`` (not in `tree`).
         only_in_other : list
-            ``list`` of POSIX paths to each ``Leaf`` that is only
-            present in `tree` (not in this ``Tree``).
 
         Raises
         ------
         TypeError
-            If `tree` is not a ``Tree``.
+            If `tree` is not a ``CompactTree`` or ``Tree``.
 
-        Examples
+        See Also
         --------
-
-        A very simple ``Tree`` with three individual settings 'a',
-        'b', and 'c' is made. Another tree is made by copying it,
-        deleting 'b', changing the value of 'c', and adding another
-        setting 'd'. Then they are compared.
-
-        >>> import copy
-        >>> tree1 = Tree(children={
-                         'a': Leaf(value=2),
-                         'b': Leaf(value=10.2),
-                         'c': Leaf(value='foo')})
-        >>> tree2 = copy.deepcopy(tree1)
-        >>> del tree2['b']
-        >>> tree2['c'] = 'bar'
-        >>> tree2['d'] = Leaf(value=42)
-        >>> tree1.diff(tree2)
-        (['/c'], ['/b'], ['/d'])
+        Tree.diff
 
         """
-        # We must be given a Tree.
-        if not isinstance(tree, Tree):
-            raise TypeError('tree must be a Tree.')
-
-        # Get the lists of all the leaves of both, which we
-        # will need to compare them with, and pack them into sets (makes
-        # it easier to figure out which are in both, and which are not).
-        children = set(self.list_all(tp='leaf'))
-        tree_children = set(tree.list_all(tp='leaf'))
-
-        # Make lists for the leaves that are in one, or the other, or
-        # both.
-        only_in_self = list(children - tree_children)
-        only_in_tree = list(tree_children - children)
-        in_both = list(children & tree_children)
-
-        # Sort the lists for convenience.
-        only_in_self.sort()
-        only_in_tree.sort()
-        in_both.sort()
-
-        # Take only those in both that have different values.
-        different_values = []
-        for k in in_both:
-            if self[k] != tree[k]:
-                different_values.append(k)
-
+        if isinstance(tree, Tree):
+            tree = CompactTree(tree)
+        elif not isinstance(tree, CompactTree):
+            raise TypeError('tree must be a CompactTree or Tree.')
+
+        # The leaves in each, which are in order of their paths.
+        paths = self._get_paths()[0]
+        tree_paths = tree._get_paths()[0]
+        indices = dict([(paths[i], i) for i in self._select('leaf')])
+        tree_indices = dict([(tree_paths[i], i)
+                             for i in tree._select('leaf')])
+        only_in_self = sorted([k for k in indices
+                               if k not in tree_indices])
+        only_in_tree = sorted([k for k in tree_indices
+                               if k not in indices])
+        in_both = sorted([k for k in indices if k in tree_indices])
+
+        # Compare the values that are in the same typed column in both
+        # all at once, and all others one by one.
+        mine = [indices[k] for k in in_both]
+        theirs = [tree_indices[k] for k in in_both]
+        differ = [None] * len(in_both)
+        if numpy is not None and len(in_both) != 0:
+            mine = numpy.asarray(mine, dtype=numpy.intp)
+            theirs = numpy.asarray(theirs, dtype=numpy.intp)
+            columns = _as_numpy(self._value_columns)[mine]
+            tree_columns = _as_numpy(tree._value_columns)[theirs]
+            positions = _as_numpy(self._value_positions)[mine]
+            tree_positions = _as_numpy(tree._value_positions)[theirs]
+            for c in range(self._object_column):
+                selected = numpy.nonzero((columns == c)
+                                         & (tree_columns == c))[0]
+                if len(selected) != 0:
+                    different = \
+                        _as_numpy(self._columns[c])[positions[selected]] \
+                        != _as_numpy(tree._columns[c])[
+                            tree_positions[selected]]
+                    for i, d in zip(selected.tolist(),
+                                    different.tolist()):
+                        differ[i] = d
+            mine = mine.tolist()
+            theirs = theirs.tolist()
+        rest = [i for i, d in enumerate(differ) if d is None]
+        values = self._stored_values([mine[i] for i in rest])
+        tree_values = tree._stored_values([theirs[i] for i in rest])
+        for i, v1, v2 in zip(rest, values, tree_values):
+            differ[i] = _values_differ(v1, v2)
+        different_values = [k for k, d in zip(in_both, differ) if d]
         return (different_values, only_in_self, only_in_tree)
 
-    def find_invalids(self):
+    def find_invalids(self, incremental=False):
         """ Returns the paths to each invalid ``Leaf``.
 
-        Goes through each ``Leaf`` in this ``Tree`` and any nested under
-        it, checks their validity, and returns the POSIX paths to those
-        that are invalid.
+        Works like ``Tree.find_invalids``, checking the stored value of
+        each ``Leaf`` against its ``LeafSpec``. As nothing can be
+        changed, `incremental` makes no difference.
+
+        Parameters
+        ----------
+        incremental : bool, optional
+            Accepted to work like ``Tree.find_invalids``.
 
         Returns
         -------
         paths : list of str paths
-            The POSIX paths to each invalid ``Leaf``.
+            The POSIX paths to each invalid ``Leaf`` (sorted).
 
         See Also
         --------
         is_valid
-        Leaf.is_valid
+        Tree.find_invalids
 
         """
-        # Get the paths to every Leaf and construct a dict of them with
-        # the values of that particular leaf.
-        leaves = dict([(k, self[k]) for k in self.list_all(tp='leaf')])
-
-        # Check each leaf one by one for validity and gather those that
-        # are invalid and return them.
+        paths = self._get_paths()[0]
+        indices = self._select('leaf')
+        all_settings = _CompactSettings(self)
+        spec_table = self._spec_table
+        specs = self._specs
         invalids = []
-        for k in leaves:
-            if not self[k + posixpath.sep].is_valid(leaves):
-                invalids.append(k)
+        for i, value in zip(indices, self._stored_values(indices)):
+            # Like Leaf.is_valid, anything raised means it is invalid.
+            try:
+                valid = spec_table[specs[i]]._validator(value,
+                                                         all_settings)
+            except:
+                valid = False
+            if not valid:
+                invalids.append(paths[i])
         return invalids
 
-    def is_valid(self):
-        """ Returns the paths to each invalid ``Leaf``.
-
-        Goes through each ``Leaf`` in this ``Tree`` and any nested under
-        it, checks their validity, and returns the POSIX paths to those
-        that are invalid.
-
-        Returns
-        -------
-        validity : bool
-            ``True`` if every node is valid, and ``False`` otherwise.
-        paths : list of str paths
-            The POSIX paths to each invalid ``Leaf``.
+    def is_valid(self, incremental=False):
+        """ Returns whether every ``Leaf`` is valid.
 
         See Also
         --------
         find_invalids
-        Leaf.is_valid
+        Tree.is_valid
 
         """
-        return (0 == len(self.find_invalids()))
+        return (0 == len(self.find_invalids(incremental)))
+
+    def _stored_values(self, indices):
+        """ Gets the values of the Leaf at each index without copying."""
+        values = [None] * len(indices)
+        objects = self._columns[self._object_column]
+        for c, positions, selected in self._gather(indices):
+            if c == self._object_column:
+                column_values = [objects[p] for p in positions]
+            else:
+                column_values = self._take(c, positions)
+            for i, v in zip(selected, column_values):
+                values[i] = v
+        return values
 
-    def get_values(self, form='paths'):
-        """ Returns this ``Tree`` stripped just ``Leaf`` values.
+    def _node(self, index):
+        """ Makes the Tree or Leaf at an index and everything in it.
 
-        Parameters
-        ----------
-        form : {'paths', 'nested'}, optional
-            Whether to return a ``dict`` of POSIX paths to ``Leaf``
-            values (``'paths'``) or a group of nested ``dict``
-            representing the structure of this ``Tree`` with a
-            ``dict`` for each ``Tree`` and the values for each
-            ``Leaf``.
+        They are made directly (nothing is validated again), sharing
+        the ``LeafSpec`` and frozen values with this ``CompactTree``.
+
+        """
+        kinds = self._kind_table()
+        policies = (None, ) + copy_policies
+        end = index + self._sizes[index]
+        nodes = dict()
+        values = self._get_values(list(range(index, end)))
+        for i in range(index, end):
+            tp = self._type_table[self._types[i]]
+            kind = kinds[self._types[i]]
+            if kind == self._other_kind:
+                node = values[i - index]
+            elif kind == self._tree_kind:
+                node = tp.__new__(tp)
+                node._index = None
+                node._sorted_paths = None
+                node._validation = None
+                node._snapshots = None
+                node._version = 0
+                node._moves = 0
+                node._interned = 0
+                node._children = _ordered_dict()
+            else:
+                node = tp.__new__(tp)
+                node._frozen = i in self._frozen
+                if node._frozen:
+                    node._value = self._columns[self._object_column][
+                        self._value_positions[i]]
+                else:
+                    node._value = values[i - index]
+                node._spec = self._spec_table[self._specs[i]]
+            if kind != self._other_kind:
+                node._parent = None
+                node._name = None
+                node._others = None
+                node._path_cache = None
+                node._saved_gen = _snapshot_gen
+                node._history = None
+                node._copy_policy = policies[self._policies[i]]
+                node._extra_parameters = copy.deepcopy(
+                    self._extra_parameters.get(i))
+            nodes[i] = node
+            if i != index:
+                parent = nodes[self._parents[i]]
+                name = self._name_table[self._names[i]]
+                parent._children[name] = node
+                if kind != self._other_kind:
+                    node._parent = weakref.ref(parent)
+                    node._name = name
+        return nodes[index]
+
+    def to_tree(self):
+        """ Makes a ``Tree`` from this ``CompactTree``.
 
         Returns
         -------
-        output : dict
-            A ``dict`` with elements determined by `form`. If `form`
-            is ``'paths'``, then the POSIX paths to each ``Leaf`` will
-            be the keys and the ``Leaf`` values as the values. If
-            `form` is ``'nested'``, a group of nested ``dict`` is
-            returned representing the structure of this ``Tree``.
-            Each ``Tree`` is turned into a ``dict`` of its children
-            which will be the respective values of each ``Leaf`` and
-            another ``dict`` for each ``Tree``.
-
-        Raises
-        ------
-        ValueError
-            If `form` is not a valid value.
-
-        See Also
-        --------
-        list_all
-        set_values
+        tree : Tree
+            A copy of the ``Tree`` this was made from.
 
         """
-        if form == 'paths':
-            # Get the paths to every Leaf and construct a dict of them
-            # with the values of that particular leaf and return it.
-            return dict([(k, self[k])
-                        for k in self.list_all(tp='leaf')])
-        elif form == 'nested':
-            out = dict()
-            for k, v in self.items():
-                if isinstance(v, Leaf):
-                    out[k] = v.value
-                elif isinstance(v, Tree):
-                    out[k] = v.get_values(form=form)
-            return out
-        else:
-            raise ValueError('form must be either ''paths'' or'
-                             + ' ''nested''.')
+        return self._node(0)
 
-    def set_values(self, values):
-        """ Apply a group of values to several ``Leaf``.
 
-        Sets several ``Leaf`` all at once. Skips any attempt to set the
-        value of a ``Leaf`` that isn't present or set a ``Tree`` to a
-        value that is not a ``dict`` of each ``Leaf`` to set within it
-        (recursion).
+class GlobPattern(object):
+    """ Compiled glob pattern to match POSIX paths in a ``Tree`` with.
 
-        Parameters
-        ----------
-        values : dict or anything inheriting collections.Mapping
-            Each key is a POSIX path to set and the value can either
-            be a value to set a ``Leaf`` to if pointed at a ``Leaf``
-            or a ``dict`` (or something that inherits
-            ``collections.Mapping``) if pointing to a ``Tree`` in which
-            case it takes the same form as `values` should. Basically,
-            either output of ``get_values`` or mixed output form is
-            what works.
+    The pattern is a POSIX style path (normalized like any other path)
+    each of whose parts is matched against the name of a ``Tree`` or
+    ``Leaf`` at that depth. The parts can use the following wildcards.
+    They never match across a ``'/'``.
 
-        Raises
-        ------
-        TypeError
-            If `values` doesn't inherit from ``collections.Mapping``.
+    ==========  ===================================================
+    wildcard    matches
+    ==========  ===================================================
+    ``*``       any number of characters (including none)
+    ``?``       any single character
+    ``[abc]``   any character in the brackets (``fnmatch`` rules)
+    ``[!abc]``  any character not in the brackets
+    ``**``      a whole part only, any number of parts (including
+                none) at any depth
+    ==========  ===================================================
 
-        See Also
-        --------
-        get_values
-        collections.Mapping
+    Compiling is done once when the ``GlobPattern`` is made, so it can
+    be used for any number of ``Tree`` any number of times.
 
-        """
-        if not isinstance(values, collections.Mapping):
-            raise TypeError('values must be dict-like (inherit from '
-                            + 'collections.Mapping).')
-        for k, v in values.items():
-            if k in self:
-                path = k + posixpath.sep
-                if isinstance(self[path], Leaf):
-                    self[path].value = v
-                elif isinstance(self[path], Tree):
-                    if isinstance(v, collections.Mapping):
-                        self[path].set_values(v)
-                else:
-                    raise KeyError(k + ' is an invalid object.')
+    Parameters
+    ----------
+    pattern : str
+        The glob pattern.
 
-    # Implement an interface to extra_parameters mapping the dictionary
-    # interface for all the extra parameters by mapping the relevant
-    # dict functions to the functions to take their place (since dict
-    # access to Tree is already given for accessing children).
-    def extra_parameters_len(self):
-        """ Returns the number of extra parameters.
+    Raises
+    ------
+    TypeError
+        If `pattern` is not an ``str``.
 
-        Maps to ``__len__`` in the extra parameters.
+    Attributes
+    ----------
+    pattern : str
 
-        """
-        return len(self._extra_parameters)
+    See Also
+    --------
+    Tree.glob
+    Tree.iglob
+    fnmatch
 
-    def extra_parameters_getitem(self, key):
-        """ Gets a particular extra parameter.
+    """
+    # The kinds of the parts of the pattern.
+    _LITERAL, _WILDCARD, _RECURSIVE = 0, 1, 2
+
+    def __init__(self, pattern):
+        if not isinstance(pattern, str):
+            raise TypeError('pattern must be a str.')
+        self._pattern = pattern
+
+        # Split the normalized pattern into its parts, merging
+        # consecutive '**' (they match the same things as one), and
+        # compile the ones with wildcards into regular expressions.
+        parts = []
+        for part in _parse_path(pattern)[1]:
+            if part == '**':
+                if len(parts) == 0 or parts[-1][0] != self._RECURSIVE:
+                    parts.append((self._RECURSIVE, None))
+            elif re.search('[*?[]', part) is None:
+                parts.append((self._LITERAL, part))
+            else:
+                parts.append((self._WILDCARD,
+                              re.compile(fnmatch.translate(part)).match))
+        self._parts = tuple(parts)
+
+        # Matching is done by tracking the set of parts (their indices,
+        # with len(parts) meaning the whole pattern has been matched)
+        # that the next name along a path would be matched against. As
+        # '**' can match no parts, being at one means also being at the
+        # part after it.
+        closures = [frozenset([len(parts)])]
+        for i in reversed(range(len(parts))):
+            if parts[i][0] == self._RECURSIVE:
+                closures.append(closures[-1] | frozenset([i]))
+            else:
+                closures.append(frozenset([i]))
+        closures.reverse()
+        self._closures = tuple(closures)
 
-        Maps to ``__getitem__`` in the extra parameters.
+    @property
+    def pattern(self):
+        """ The glob pattern.
 
-        """
-        return self._extra_parameters[key]
+        str
 
-    def extra_parameters_setitem(self, key, value):
-        """ Sets a particular extra parameter.
+        """
+        return self._pattern
 
-        Maps to ``__setitem__`` in the extra parameters.
+    def __repr__(self):
+        return 'GlobPattern(' + repr(self._pattern) + ')'
 
-        """
-        self._extra_parameters[key] = value
+    def _step(self, states, name):
+        """ Matches a name against the parts in states.
 
-    def extra_parameters_delitem(self, key):
-        """ Removes a particular extra parameter.
+        Parameters
+        ----------
+        states : frozenset of int
+            The indices of the parts to match `name` against.
+        name : str
+            The name of the next part of the path.
 
-        Maps to ``__delitem__`` in the extra parameters.
+        Returns
+        -------
+        states : frozenset of int
+            The indices of the parts to match the name after `name`
+            against (empty if nothing can match anymore).
 
         """
-        del self._extra_parameters[key]
-
-    def extra_parameters_contains(self, item):
-        """ Checks if a key is in the extra parameters.
+        out = set()
+        for i in states:
+            if i == len(self._parts):
+                continue
+            kind, part = self._parts[i]
+            if kind == self._RECURSIVE:
+                out.update(self._closures[i])
+            elif (kind == self._LITERAL and name == part) \
+                    or (kind == self._WILDCARD and part(name)):
+                out.update(self._closures[i + 1])
+        return frozenset(out)
+
+    def _literals(self, states):
+        """ Gets the only names that could match the parts in states.
 
-        Maps to ``__contains__`` in the extra parameters.
+        Returns
+        -------
+        names : list of str or None
+            The names to look up if all the parts in `states` are
+            without wildcards, or ``None`` if any name could match.
 
         """
-        return self._extra_parameters.__contains__(item)
+        names = []
+        for i in states:
+            if i == len(self._parts):
+                continue
+            kind, part = self._parts[i]
+            if kind != self._LITERAL:
+                return None
+            if part not in names:
+                names.append(part)
+        return names
+
+    def match(self, path):
+        """ Checks whether a POSIX path matches this pattern.
 
-    def extra_parameters_iter(self):
-        """ Returns an iterator over the extra parameters.
+        Parameters
+        ----------
+        path : str
+            POSIX style path (normalized like any other path).
 
-        Maps to ``__iter__`` in the extra parameters.
+        Returns
+        -------
+        matches : bool
+            Whether `path` matches.
 
-        """
-        return self._extra_parameters.__iter__()
+        Raises
+        ------
+        TypeError
+            If `path` is not an ``str``.
 
-    def extra_parameters_keys(self):
-        """ Returns all the keys for the extra parameters.
+        """
+        if not isinstance(path, str):
+            raise TypeError('path must be a str.')
+        states = self._closures[0]
+        for name in _parse_path(path)[1]:
+            states = self._step(states, name)
+            if len(states) == 0:
+                return False
+        return len(self._parts) in states
 
-        Maps to ``keys`` in the extra parameters.
+    def _walk(self, tree):
+        """ Iterates over everything in a Tree matching this pattern.
 
-        """
-        return self._extra_parameters.keys()
+        Goes depth first through `tree` using an explicit stack, not
+        going into any ``Tree`` that nothing in could match.
 
-    def extra_parameters_items(self):
-        """ Returns the items of the extra parameters.
+        Parameters
+        ----------
+        tree : Tree
+            The ``Tree`` to look through.
 
-        Maps to ``items`` in the extra parameters.
+        Yields
+        ------
+        path : str
+            The absolute POSIX path in `tree` to what was found.
+        node : Tree or Leaf
+            What was found.
 
         """
-        return self._extra_parameters.items()
+        end = len(self._parts)
+        stack = [('', tree, self._closures[0])]
+        while len(stack) != 0:
+            path, node, states = stack.pop()
+            if end in states and len(path) != 0:
+                yield path, node
+            if not isinstance(node, Tree) \
+                    or (len(states) == 1 and end in states):
+                continue
+            names = self._literals(states)
+            if names is None:
+                children = list(node._children.items())
+            else:
+                children = [(k, node._children[k]) for k in names
+                            if k in node._children]
+            for k, v in reversed(children):
+                if not isinstance(v, (Tree, Leaf)):
+                    continue
+                child_states = self._step(states, k)
+                if len(child_states) != 0:
+                    stack.append((path + posixpath.sep + k, v,
+                                  child_states))
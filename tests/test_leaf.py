@@ -20,10 +20,18 @@ import posixpath
 import random
 import string
 import collections
+import copy
+import pickle
 
 from nose.tools import raises
+from nose.plugins.skip import SkipTest
 
-from SettingsTree import Leaf
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from SettingsTree import Leaf, LeafSpec
 
 
 random.seed()
@@ -77,6 +85,360 @@ def test_set_value():
     assert x == leaf.value
 
 
+# Test the copy policies.
+
+def test_copy_policy_default():
+    x = {'a': [1, 2]}
+    leaf = Leaf(value=x)
+    assert leaf.copy_policy is None
+    assert x == leaf.value
+    assert x is not leaf.value
+    assert x['a'] is not leaf.value['a']
+
+
+def test_copy_policy_shallow():
+    x = {'a': [1, 2]}
+    leaf = Leaf(value=x, copy_policy='shallow')
+    assert x is not leaf.value
+    assert x['a'] is leaf.value['a']
+
+
+def test_copy_policy_none():
+    x = {'a': [1, 2]}
+    leaf = Leaf(value=x, copy_policy='none')
+    assert x is leaf.value
+    leaf.copy_policy = 'deep'
+    assert x is not leaf.value
+
+
+@raises(TypeError)
+def test_copy_policy_invalid():
+    leaf = Leaf()
+    leaf.copy_policy = 'copy'
+
+
+def test_copy_policy_freeze():
+    x = {'a': [1, {'b': set([2])}], 'c': (3, [4])}
+    leaf = Leaf(value=x, copy_policy='freeze')
+    out = leaf.value
+    assert out is leaf.value
+    assert (1, {'b': frozenset([2])}) == out['a']
+    assert (3, (4,)) == out['c']
+    x['a'].append(5)
+    assert 2 == len(leaf.value['a'])
+    for obj, key in ((out, 'd'), (out['a'][1], 'b')):
+        try:
+            obj[key] = 1
+            assert False
+        except TypeError:
+            pass
+
+
+def test_copy_policy_freeze_unfreezable():
+    x = [bytearray(b'a')]
+    leaf = Leaf(value=x, copy_policy='freeze')
+    assert x == leaf.value
+    assert leaf.value is not leaf.value
+    leaf.value = (1, 2)
+    assert leaf.value is leaf.value
+
+
+def test_copy_policy_freeze_self_referential():
+    x = []
+    x.append(x)
+    d = {'a': 1}
+    d['d'] = d
+    for value in (x, d):
+        leaf = Leaf(value=value, copy_policy='freeze')
+        assert not leaf._frozen
+        out = leaf.value
+        assert out is not value
+        assert type(out) is type(value)
+    assert leaf.value['d']['d']['a'] == 1
+    shared = [1, [2]]
+    leaf.value = [shared, shared]
+    assert leaf._frozen
+    assert leaf.value[0] is leaf.value[1]
+
+
+def test_copy_policy_freeze_copy_pickle():
+    leaf = Leaf(value={'a': [1, 2]}, copy_policy='freeze')
+    for leaf2 in (copy.deepcopy(leaf),
+                  pickle.loads(pickle.dumps(leaf))):
+        assert {'a': (1, 2)} == leaf2.value
+        assert leaf2.value is leaf2.value
+
+
+# Test that there is no instance dict and that the extra parameters are
+# only allocated when needed.
+
+def test_slots():
+    leaf = Leaf(value=1)
+    assert not hasattr(leaf, '__dict__')
+    assert leaf._extra_parameters is None
+    assert 0 == len(leaf)
+    assert 'a' not in leaf
+    assert [] == list(leaf.keys())
+    leaf['a'] = 2
+    assert {'a': 2} == leaf._extra_parameters
+    leaf2 = copy.deepcopy(Leaf(value=1))
+    assert leaf2._extra_parameters is None
+
+
+@raises(KeyError)
+def test_extra_parameters_del_none():
+    leaf = Leaf()
+    del leaf['a']
+
+
+# Test copying.
+
+def test_copy_deepcopy():
+    leaf = Leaf(value=[1, 2], allowed_values=([1, 2], [3]),
+                validators=[('GreaterThan', 2)], x=[3])
+    leaf2 = copy.deepcopy(leaf)
+    assert [1, 2] == leaf2.value
+    assert leaf2._value is not leaf._value
+    assert leaf2['x'] is not leaf['x']
+    assert leaf2._allowed_values is leaf._allowed_values
+    assert leaf2._validators is leaf._validators
+    leaf3 = copy.copy(leaf)
+    assert leaf3._value is leaf._value
+    assert leaf3['x'] is leaf['x']
+    leaf3['z'] = 1
+    assert 'z' not in leaf
+
+
+# Test sharing constraints with LeafSpec.
+
+def test_spec_shared():
+    spec = LeafSpec(valid_value_types=int, allowed_values=[1, 2],
+                    validators=[('LessThan', 3)])
+    leaves = [Leaf(value=i, spec=spec) for i in range(4)]
+    for leaf in leaves:
+        assert leaf.spec is spec
+        assert (int, ) == leaf.valid_value_types
+        assert (1, 2) == leaf.allowed_values
+    assert [False, True, True, False] \
+        == [leaf.is_valid(dict()) for leaf in leaves]
+
+
+def test_spec_default():
+    assert Leaf().spec is Leaf(value=3).spec
+    assert Leaf(allowed_values=[1]).spec is not Leaf().spec
+
+
+def test_spec_set_constraint():
+    spec = LeafSpec(allowed_values=[1, 2])
+    leaf = Leaf(value=3, spec=spec)
+    leaf2 = Leaf(value=3, spec=spec)
+    leaf.allowed_values = [3]
+    assert leaf.spec is not spec
+    assert leaf2.spec is spec
+    assert (1, 2) == spec.allowed_values
+    assert leaf.is_valid(dict())
+    assert not leaf2.is_valid(dict())
+
+
+def test_spec_with_constraints():
+    spec = LeafSpec(allowed_values=[1, 2], forbidden_values=[2])
+    leaf = Leaf(value=2, spec=spec, forbidden_values=[1])
+    assert (1, 2) == leaf.allowed_values
+    assert (1, ) == leaf.forbidden_values
+    assert (2, ) == spec.forbidden_values
+
+
+def test_spec_replace():
+    spec = LeafSpec(valid_value_types=int)
+    spec2 = spec.replace(allowed_values=[1])
+    assert (int, ) == spec2.valid_value_types
+    assert (1, ) == spec2.allowed_values
+    assert spec.allowed_values is None
+
+
+def test_spec_copy_pickle():
+    spec = LeafSpec(allowed_values=[1, 2])
+    leaf = Leaf(value=1, spec=spec)
+    assert copy.deepcopy(leaf).spec is spec
+    assert copy.copy(spec) is spec
+    leaf2 = pickle.loads(pickle.dumps(leaf))
+    assert (1, 2) == leaf2.allowed_values
+    assert leaf2.is_valid(dict())
+
+
+@raises(TypeError)
+def test_spec_invalid():
+    Leaf(spec=dict(allowed_values=[1]))
+
+
+@raises(TypeError)
+def test_spec_set_invalid():
+    leaf = Leaf()
+    leaf.spec = 3
+
+
+@raises(TypeError)
+def test_spec_invalid_constraint():
+    LeafSpec(validators=[('Nonexistent', 3)])
+
+
+@raises(TypeError)
+def test_spec_replace_unknown():
+    LeafSpec().replace(value=3)
+
+
+def test_depends_on():
+    leaf = Leaf(depends_on='/a//b/')
+    assert ('/a/b', ) == leaf.depends_on
+    leaf.depends_on = ['/c/*', 'd']
+    assert ('/c/*', '/d') == leaf.depends_on
+    assert ('/a/b', ) == LeafSpec(depends_on=['/a/b']).depends_on
+    assert Leaf().depends_on is None
+    leaf2 = pickle.loads(pickle.dumps(leaf))
+    assert ('/c/*', '/d') == leaf2.depends_on
+    assert (frozenset(['/d']), ) == leaf2.spec._dependencies[:1]
+    assert '/c/x' == [k for k in ('/c/x', '/cx')
+                      if leaf2.spec._dependencies[1][0].match(k)][0]
+
+
+@raises(TypeError)
+def test_depends_on_invalid():
+    Leaf(depends_on=['/a', 3])
+
+
+# Test the validators compiled from the constraints.
+
+def test_compiled_validator_shared():
+    spec = LeafSpec(valid_value_types=int)
+    assert spec._validator is Leaf(spec=spec).spec._validator
+    assert Leaf()._spec._validator is Leaf(value=2)._spec._validator
+
+
+def test_compiled_validator_between_reversed():
+    leaf = Leaf(value=3, validators=[('Between', (5, 1))])
+    assert leaf.is_valid(dict())
+    leaf.validators = [('NotBetween', (5, 1))]
+    assert not leaf.is_valid(dict())
+    leaf.value = 5
+    assert leaf.is_valid(dict())
+
+
+def test_compiled_validator_changed():
+    leaf = Leaf(value=3, allowed_values=[3])
+    assert leaf.is_valid(dict())
+    leaf.allowed_values = [4]
+    assert not leaf.is_valid(dict())
+    leaf.allowed_values = None
+    leaf.validator_function = lambda v, s: v == s['/a']
+    assert leaf.is_valid({'/a': 3})
+    assert not leaf.is_valid({'/a': 4})
+    assert not leaf.is_valid(dict())
+
+
+def test_compiled_validator_damaged():
+    leaf = Leaf(value=3)
+    leaf._validators = (('Between', 3), )
+    assert not leaf.is_valid(dict())
+    leaf._validators = (('Nonexistent', 3), )
+    assert not leaf.is_valid(dict())
+
+
+def test_compiled_validator_pickle():
+    leaf = Leaf(value=3, validators=[('LessThan', 4)])
+    leaf2 = pickle.loads(pickle.dumps(leaf))
+    assert leaf2.is_valid(dict())
+    leaf2.value = 4
+    assert not leaf2.is_valid(dict())
+
+
+def test_allowed_forbidden_values_hashed():
+    allowed = ['c', 'a', 'b'] + [str(i) for i in range(1000)]
+    leaf = Leaf(value='999', allowed_values=allowed,
+                forbidden_values=('b', 'x'))
+    assert tuple(allowed) == leaf.allowed_values
+    assert ('b', 'x') == leaf.forbidden_values
+    assert leaf.is_valid(dict())
+    leaf.value = 'b'
+    assert not leaf.is_valid(dict())
+    leaf.value = 'z'
+    assert not leaf.is_valid(dict())
+
+
+def test_allowed_forbidden_values_mixed_numbers():
+    for value in (1, 1.0, True):
+        assert Leaf(value=value, allowed_values=[True]).is_valid(dict())
+        assert Leaf(value=value, allowed_values=[1.0]).is_valid(dict())
+        assert not Leaf(value=value,
+                        forbidden_values=[1]).is_valid(dict())
+    assert not Leaf(value=2, allowed_values=[True]).is_valid(dict())
+
+
+def test_allowed_forbidden_values_unhashable():
+    leaf = Leaf(value=[1], allowed_values=([1], 2))
+    assert leaf.is_valid(dict())
+    leaf = Leaf(value=[1], allowed_values=(1, 2))
+    assert not leaf.is_valid(dict())
+    leaf = Leaf(value={'a': 1}, forbidden_values=(1, 2))
+    assert leaf.is_valid(dict())
+    leaf = Leaf(value={'a': 1}, forbidden_values=(1, {'a': 1}))
+    assert not leaf.is_valid(dict())
+
+
+# Test numpy arrays and memoryview, which are stored read-only and not
+# copied when gotten.
+
+def test_numpy_array_value():
+    if numpy is None:
+        raise SkipTest('numpy is not available.')
+    x = numpy.arange(10.0)
+    leaf = Leaf(value=x)
+    out = leaf.value
+    assert numpy.array_equal(x, out)
+    assert not out.flags.writeable
+    assert numpy.shares_memory(out, leaf.value)
+    assert not numpy.shares_memory(out, x)
+    x[0] = 100.0
+    assert 0.0 == leaf.value[0]
+    try:
+        out[0] = 1.0
+        assert False
+    except ValueError:
+        pass
+
+
+def test_numpy_array_value_nocopy_policy():
+    if numpy is None:
+        raise SkipTest('numpy is not available.')
+    x = numpy.arange(10.0)
+    leaf = Leaf(value=x, copy_policy='none')
+    assert x is leaf.value
+    assert x.flags.writeable
+
+
+def test_numpy_array_value_copy_pickle():
+    if numpy is None:
+        raise SkipTest('numpy is not available.')
+    leaf = Leaf(value=numpy.arange(10.0))
+    for leaf2 in (copy.deepcopy(leaf),
+                  pickle.loads(pickle.dumps(leaf))):
+        assert numpy.array_equal(leaf.value, leaf2.value)
+        assert not leaf2.value.flags.writeable
+
+
+def test_memoryview_value():
+    x = bytearray(b'abcdefgh')
+    leaf = Leaf(value=memoryview(x))
+    out = leaf.value
+    assert b'abcdefgh' == out.tobytes()
+    assert out.readonly
+    x[0:1] = b'z'
+    assert b'abcdefgh' == leaf.value.tobytes()
+    for leaf2 in (copy.deepcopy(leaf),
+                  pickle.loads(pickle.dumps(leaf))):
+        assert b'abcdefgh' == leaf2.value.tobytes()
+        assert leaf2.value.readonly
+
+
 # Test all correct ways to set valid_value_types and a few incorrect
 # ones.
 
@@ -18,7 +18,9 @@
 
 import sys
 import copy
+import fnmatch
 import math
+import pickle
 import posixpath
 import random
 import string
@@ -29,8 +31,15 @@ else:
     from ordereddict import OrderedDict
 
 from nose.tools import raises
+from nose.plugins.skip import SkipTest
 
-from SettingsTree import Tree, Leaf
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import SettingsTree
+from SettingsTree import Tree, Leaf, LeafSpec, GlobPattern, CompactTree
 
 
 random.seed()
@@ -142,6 +151,49 @@ def test_not_in():
         assert name not in tree
 
 
+def test_in_nocopy():
+    class CopyCounter(object):
+        copies = 0
+
+        def __deepcopy__(self, memo):
+            CopyCounter.copies += 1
+            return CopyCounter()
+
+    tree = Tree(children={'a/b': Leaf(value=CopyCounter())})
+    copies = CopyCounter.copies
+    assert '/a/b' in tree
+    assert 'b' in tree['/a/']
+    assert '/a/c' not in tree
+    assert 3 not in tree
+    assert copies == CopyCounter.copies
+
+
+# Test get.
+
+def test_get_method():
+    name = 'aivnennb'
+    tree = Tree(children=random_path_leaves)
+    tree[name] = Leaf(**rand_params)
+    for k, v in random_path_leaves.items():
+        assert v.value == tree.get(k)
+        assert v == tree.get(k + posixpath.sep)
+        assert tree[posixpath.dirname(k)] \
+            == tree.get(posixpath.dirname(k))
+    for k, v in rand_params.items():
+        assert v == tree.get(posixpath.join(name, k))
+    assert tree == tree.get(2 * posixpath.sep)
+
+
+def test_get_method_default():
+    tree = Tree(children=random_path_leaves)
+    default = object()
+    assert tree.get('/avnevnaiv/a') is None
+    assert default is tree.get('/avnevnaiv/a', default)
+    assert default is tree.get(3, default)
+    for k in random_path_leaves:
+        assert default is tree.get(posixpath.join(k, 'a'), default)
+
+
 # Test __iter__
 def test_iteration():
     tree = Tree(children=random_leaves)
@@ -623,6 +675,1234 @@ def test_list_all_invalid_type():
     v = tree.list_all(tp='anvienviavjonba')
 
 
+# Test that the index of the root Tree is kept up to date.
+
+def test_index_set_del():
+    tree = Tree(children=random_path_leaves)
+    assert sorted(random_path_leaves.keys()) == tree.list_all(tp='leaf')
+    for k, v in random_path_leaves.items():
+        assert v == tree[k + posixpath.sep]
+    keys = sorted(random_path_leaves.keys())
+    for k in keys[::2]:
+        del tree[k]
+    for k in keys[1::2]:
+        tree[k] = Tree()
+    assert [] == tree.list_all(tp='leaf')
+    for k in keys:
+        assert (k in tree) == (k in keys[1::2])
+    assert set(keys[1::2]) <= set(tree.list_all(tp='tree'))
+
+
+def test_index_subtree():
+    name = 'nvienva'
+    tree = Tree(children={name: Tree(children=random_path_leaves)})
+    assert len(random_path_leaves) == len(tree.list_all(tp='leaf'))
+    subtree = tree[name + posixpath.sep]
+    subtree['a/b/c'] = Leaf(value=3)
+    assert 3 == tree[posixpath.join('/', name, 'a/b/c')]
+    del subtree['a/b']
+    assert posixpath.join('/', name, 'a/b/c') not in tree
+    assert posixpath.join('/', name, 'a') in tree
+    del tree[name]
+    assert [] == tree.list_all()
+    assert sorted(random_path_leaves.keys()) \
+        == subtree.list_all(tp='leaf')
+
+
+# Test the cache of parsed paths.
+
+def test_path_cache_hits():
+    SettingsTree.clear_path_cache()
+    tree = Tree(children=random_path_leaves)
+    info = SettingsTree.path_cache_info()
+    assert info.misses == len(random_path_leaves)
+    assert info.currsize == len(random_path_leaves)
+    for k, v in random_path_leaves.items():
+        assert v.value == tree[k]
+    info2 = SettingsTree.path_cache_info()
+    assert info2.misses == info.misses
+    assert info2.hits == info.hits + len(random_path_leaves)
+
+
+def test_path_cache_size():
+    maxsize = SettingsTree.path_cache_info().maxsize
+    try:
+        SettingsTree.set_path_cache_size(3)
+        tree = Tree(children=random_path_leaves)
+        assert 3 == SettingsTree.path_cache_info().currsize
+        SettingsTree.set_path_cache_size(0)
+        assert 0 == SettingsTree.path_cache_info().currsize
+        for k, v in random_path_leaves.items():
+            assert v.value == tree[k]
+    finally:
+        SettingsTree.set_path_cache_size(maxsize)
+
+
+@raises(ValueError)
+def test_path_cache_size_invalid_negative():
+    SettingsTree.set_path_cache_size(-1)
+
+
+# Test handles.
+
+def test_handle_get_set():
+    tree = Tree(children=random_path_leaves)
+    for k in random_path_leaves:
+        handle = tree.handle(k)
+        assert handle.leaf is tree[k + posixpath.sep]
+        assert tree[k] == handle.get()
+        x = random.random()
+        handle.set(x)
+        assert x == tree[k]
+        assert x == handle.get()
+
+
+def test_handle_unrelated_change():
+    tree = Tree(children={'a/b': Leaf(value=3)})
+    handle = tree.handle('/a/b')
+    tree['/a/c'] = Leaf(value=4)
+    del tree['/a/c']
+    tree['/d'] = Tree()
+    assert 3 == handle.get()
+
+
+def test_handle_stale():
+    for op in ('del', 'replace', 'replace_parent', 'del_in_subtree'):
+        tree = Tree(children={'a/b': Leaf(value=3)})
+        handle = tree.handle('/a/b')
+        if op == 'del':
+            del tree['/a/b']
+        elif op == 'replace':
+            tree['/a/b'] = Leaf(value=3)
+        elif op == 'replace_parent':
+            tree['/a'] = Tree(children={'b': Leaf(value=3)})
+        else:
+            del tree['/a/']['b']
+        try:
+            handle.get()
+        except KeyError:
+            threw_error = True
+        else:
+            threw_error = False
+        assert threw_error
+
+
+@raises(KeyError)
+def test_handle_invalid_tree():
+    tree = Tree(children={'a/b': Leaf(value=3)})
+    tree.handle('/a')
+
+
+@raises(KeyError)
+def test_handle_invalid_missing():
+    tree = Tree(children={'a/b': Leaf(value=3)})
+    tree.handle('/a/c')
+
+
+# Test operations on a Tree nested much deeper than the recursion
+# limit.
+
+def test_deep_tree():
+    depth = 3 * sys.getrecursionlimit()
+    names = ['n' + str(i) for i in range(depth)]
+    path = posixpath.sep + posixpath.join(*names)
+    tree = Tree(children={path: Leaf(value=1)})
+    assert 1 == tree[path]
+    assert path in tree
+    assert [path] == tree.list_all(tp='leaf')
+    assert depth - 1 == len(tree.list_all(tp='tree'))
+    subtree = tree[posixpath.sep + names[0] + posixpath.sep]
+    assert [path[len(names[0]) + 1:]] == subtree.list_all(tp='leaf')
+    tree.set_values({path: 2})
+    assert {path: 2} == tree.get_values(form='paths')
+    out = tree.get_values(form='nested')
+    for name in names:
+        out = out[name]
+    assert 2 == out
+    tree2 = pickle.loads(pickle.dumps(tree))
+    assert [path] == tree2.list_all(tp='leaf')
+    assert path == tree2[path + posixpath.sep].path
+    del tree[posixpath.sep + names[0]]
+    assert 0 == len(tree)
+
+
+def test_pickle_shared():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    tree['/d'] = tree['/a/b/']
+    tree2 = pickle.loads(pickle.dumps(tree))
+    assert tree2['/a/b/'] is tree2['/d/']
+    tree2['/d/e'] = Leaf(value=2)
+    assert ['/a', '/a/b', '/a/b/c', '/a/b/e', '/d', '/d/c',
+            '/d/e'] == tree2.list_all()
+
+
+@raises(ValueError)
+def test_set_tree_in_itself():
+    tree = Tree(children={'/a/b': Leaf(value=1)})
+    tree['/a/x'] = tree['/a/']
+
+
+@raises(ValueError)
+def test_set_tree_in_nested():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    tree.list_all()
+    tree['/a/b/x'] = tree['/a/']
+
+
+@raises(ValueError)
+def test_set_tree_in_nested_new():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    tree['/a/b/x/y'] = tree['/a/']
+
+
+@raises(ValueError)
+def test_set_tree_in_nested_shared():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    other = Tree()
+    other['/x'] = tree['/a/b/']
+    other['/x/y'] = tree['/a/']
+
+
+# Test get_many and set_many.
+
+def test_get_many():
+    for build_index in (False, True):
+        tree = Tree(children=random_path_leaves)
+        if build_index:
+            tree.list_all()
+        paths = list(random_path_leaves.keys())
+        random.shuffle(paths)
+        paths.extend([k + posixpath.sep for k in paths[:5]])
+        paths.extend([posixpath.dirname(k) for k in paths[:5]])
+        paths.extend([posixpath.sep, 2 * posixpath.sep])
+        assert [tree[k] for k in paths] == tree.get_many(paths)
+
+
+def test_get_many_extraParameter():
+    name = 'aivnennb'
+    tree = Tree(children={name: Leaf(**rand_params)})
+    paths = [posixpath.join(name, k) for k in rand_params]
+    assert list(rand_params.values()) == tree.get_many(paths)
+
+
+@raises(KeyError)
+def test_get_many_invalid_missing():
+    tree = Tree(children=random_path_leaves)
+    paths = list(random_path_leaves.keys()) + ['/avnevnaiv/a']
+    tree.get_many(paths)
+
+
+def test_set_many():
+    tree = Tree(children=copy.deepcopy(random_path_leaves))
+    values = dict([(k, random.random()) for k in random_path_leaves])
+    tree.set_many(values)
+    assert values == tree.get_values(form='paths')
+
+
+def test_set_many_leaves():
+    tree = Tree()
+    tree.set_many(random_path_leaves)
+    for k, v in random_path_leaves.items():
+        assert v == tree[k + posixpath.sep]
+
+
+@raises(KeyError)
+def test_set_many_invalid_missing():
+    tree = Tree(children=copy.deepcopy(random_path_leaves))
+    tree.set_many({'/avnevnaiv/a': 3})
+
+
+def test_set_many_atomic():
+    tree = Tree(children={'/m/01': Leaf(value=1),
+                          '/m/02': Leaf(value=2, valid_value_types=(int, )),
+                          '/m/03': Leaf(value=3)})
+    view = tree.view('/m')
+    for values in ({'/m/01': 100, '/m/04': 4},
+                   {'/m/01': 100, '/m/02': 'x'},
+                   {'/m/01': 100, '/m': 5},
+                   {'/m/01': 100, '/m/03/x': Leaf(value=1), '/': 1},
+                   {'/m/01': 100, '/x/': tree}):
+        try:
+            tree.set_many(values)
+        except (KeyError, TypeError, ValueError):
+            pass
+        else:
+            assert False
+        assert {'/m/01': 1, '/m/02': 2, '/m/03': 3} == tree.get_values()
+    try:
+        view.set_many({'01': 100, '02': 2.0})
+    except ValueError:
+        pass
+    else:
+        assert False
+    assert {'/m/01': 1, '/m/02': 2, '/m/03': 3} == tree.get_values()
+    tree.set_many({'/m/01': 100, '/m/03/x': 5, '/m/04/': Leaf(value=4),
+                   '/m/04': 40})
+    assert 100 == tree['/m/01'] and 5 == tree['/m/03/x']
+    assert 40 == tree['/m/04']
+
+
+# Test glob and iglob.
+
+def test_glob_wildcards():
+    tree = Tree(children=random_path_leaves)
+    for k in random_path_leaves:
+        parts = k.split(posixpath.sep)
+        for i in range(1, len(parts)):
+            parts2 = list(parts)
+            parts2[i] = random.choice(['*', '?' + parts[i][1:],
+                                       '[' + parts[i][0] + 'ab]*'])
+            pattern = posixpath.sep.join(parts2)
+            expected = [pth for pth in tree.list_all()
+                        if pth.count(posixpath.sep) == len(parts) - 1
+                        and fnmatch.fnmatchcase(pth, pattern)]
+            assert expected == tree.glob(pattern)
+            assert sorted(tree.iglob(pattern)) == expected
+
+
+def test_glob_recursive():
+    tree = Tree(children={'/services/a/timeout': Leaf(value=1),
+                          '/services/b/timeout': Leaf(value=2),
+                          '/services/b/x/timeout': Leaf(value=3),
+                          '/services/b/x/port': Leaf(value=4),
+                          '/timeout': Leaf(value=5)})
+    assert ['/services/a/timeout', '/services/b/timeout'] \
+        == tree.glob('/services/*/timeout')
+    assert ['/services/a/timeout', '/services/b/timeout',
+            '/services/b/x/timeout'] \
+        == tree.glob('/services/**/timeout')
+    assert [1, 2, 3, 5] == tree.glob('**/timeout', output='values')
+    assert tree.list_all() == tree.glob('/**')
+    assert tree.list_all(tp='tree') == tree.glob('/**', tp='tree')
+    assert ['/services/b', '/services/b/x'] \
+        == tree.glob('/services/b/**', tp='tree')
+    assert [tree['/services/b/x/port/']] \
+        == tree.glob('/*/?/*/p*', output='nodes')
+    assert [] == tree.glob('/services/c/*')
+
+
+def test_glob_compiled_reuse():
+    pattern = GlobPattern('/services/*/timeout')
+    assert pattern.match('/services/a/timeout')
+    assert pattern.match('services/a/../b/timeout')
+    assert not pattern.match('/services/a/b/timeout')
+    assert not pattern.match('/services/timeout')
+    for i in range(3):
+        tree = Tree(children={'/services/a/timeout': Leaf(value=i),
+                              '/services/b/port': Leaf(value=i)})
+        assert [i] == tree.glob(pattern, output='values')
+        assert ['/services/a/timeout'] == list(tree.iglob(pattern))
+
+
+@raises(TypeError)
+def test_glob_invalid_pattern():
+    tree = Tree(children=random_path_leaves)
+    tree.glob(3)
+
+
+@raises(ValueError)
+def test_glob_invalid_output():
+    tree = Tree(children=random_path_leaves)
+    tree.iglob('/*', output='anvien')
+
+
+# Test views.
+
+def test_view_access():
+    name = '/db/primary'
+    tree = Tree(children={'/global/x': Leaf(value=1)})
+    tree[name] = Tree(children=random_path_leaves)
+    view = tree.view(name)
+    assert name == view.prefix
+    assert view.node is tree[name + posixpath.sep]
+    assert len(tree[name]) == len(view)
+    assert list(tree[name]) == list(view)
+    for k, v in random_path_leaves.items():
+        assert k in view
+        assert v.value == view[k]
+        assert v.value == view.get(k)
+        assert name + k == view.abspath(k)
+        assert v.value == view.handle(k).get()
+    assert [name + k for k in sorted(random_path_leaves)] \
+        == view.list_all(tp='leaf')
+    assert view.list_all(tp='leaf') == view.glob('/**', tp='leaf')
+    assert dict([(name + k, v.value)
+                 for k, v in random_path_leaves.items()]) \
+        == view.get_values()
+    view['a/b'] = Leaf(value=4)
+    assert 4 == tree[name + '/a/b']
+    view['a/b'] = 5
+    assert 5 == tree[name + '/a/b']
+    del view['a']
+    assert name + '/a' not in tree
+
+
+def test_view_follows_prefix():
+    tree = Tree(children={'/db/primary/port': Leaf(value=1)})
+    view = tree.view('/db/primary')
+    tree['/db/primary'] = Tree(children={'port': Leaf(value=2)})
+    assert 2 == view['port']
+    del tree['/db']
+    try:
+        view['port']
+    except KeyError:
+        threw_error = True
+    else:
+        threw_error = False
+    assert threw_error
+
+
+def test_view_validation():
+    tree = Tree(children={'/global/max_port': Leaf(value=100)})
+    tree['/db/primary/port'] = Leaf(
+        value=80, validator_function=lambda x, y:
+        x <= y['/global/max_port'])
+    tree['/db/primary/other'] = Leaf(value=80,
+                                     validator_function=lambda x, y: False)
+    tree['/global/bad'] = Leaf(validator_function=lambda x, y: False)
+    view = tree.view('/db/primary')
+    assert ['/db/primary/other'] == view.find_invalids()
+    tree['/global/max_port'] = 50
+    assert ['/db/primary/other', '/db/primary/port'] \
+        == view.find_invalids()
+    del tree['/db/primary/other']
+    tree['/global/max_port'] = 100
+    assert view.is_valid()
+    assert not tree.is_valid()
+
+
+def test_view_of_nested():
+    tree = Tree(children={'/max_port': Leaf(value=100)})
+    tree['/x/db/port'] = Leaf(value=80, validator_function=lambda x, y:
+                              x <= y['/max_port'])
+    view = tree['/x/'].view('/db')
+    assert '/x/db' == view.prefix
+    assert '/x/db/port' == view.abspath('port')
+    assert ['/x/db/port'] == view.list_all()
+    assert ['/x/db/port'] == view.glob('*')
+    assert {'/x/db/port': 80} == view.get_values()
+    assert view.is_valid()
+    tree['/max_port'] = 50
+    assert ['/x/db/port'] == view.find_invalids()
+    assert ['/x/db/port'] == view.find_invalids(incremental=True)
+    assert '/x/db/port' == view.handle('port').path
+    assert '/x' == tree['/x/'].view('/').prefix
+
+
+@raises(KeyError)
+def test_view_invalid_leaf():
+    tree = Tree(children={'/db/primary/port': Leaf(value=1)})
+    tree.view('/db/primary/port')
+
+
+# Test the paths and roots of nodes.
+
+def test_path_root():
+    tree = Tree(children=copy.deepcopy(random_path_leaves))
+    assert posixpath.sep == tree.path
+    assert tree is tree.root
+    for k in tree.list_all():
+        node = tree[k + posixpath.sep]
+        assert k == node.path
+        assert tree is node.root
+    leaf = Leaf()
+    assert leaf.path is None
+    assert leaf.root is None
+
+
+def test_path_root_reparent():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    leaf = tree['/a/b/c/']
+    subtree = tree['/a/b/']
+    assert '/a/b/c' == leaf.path
+    tree['/x/y'] = subtree
+    del tree['/a']
+    assert '/x/y/c' == leaf.path
+    assert '/x/y' == subtree.path
+    tree2 = Tree()
+    tree2['/z'] = subtree
+    assert tree2 is leaf.root
+    assert '/z/c' == leaf.path
+    del tree2['/z/c']
+    assert leaf.root is None
+    assert leaf.path is None
+    del tree2['/z']
+    assert tree is subtree.root
+    assert '/x/y' == subtree.path
+    del tree['/x/y']
+    assert subtree is subtree.root
+    assert posixpath.sep == subtree.path
+
+
+def test_shared_subtree_other_tree():
+    sub = Tree({'x': Leaf(1)})
+    tree1 = Tree({'a': sub})
+    tree1.list_all()
+    handle = tree1.handle('/a/x')
+    tree2 = Tree({'b': sub})
+    del tree2['/b/x']
+    assert '/a/x' not in tree1
+    assert ['/a'] == tree1.list_all()
+    try:
+        tree1['/a/x']
+    except KeyError:
+        threw_error = True
+    else:
+        threw_error = False
+    assert threw_error
+    try:
+        handle.get()
+    except KeyError:
+        threw_error = True
+    else:
+        threw_error = False
+    assert threw_error
+
+
+def test_shared_subtree_same_tree():
+    tree = Tree(children={'/a/x': Leaf(value=1)})
+    tree.list_all()
+    tree['/b'] = tree['/a/']
+    tree['/a/y'] = Leaf(value=2)
+    assert 2 == tree['/a/y']
+    assert '/a/y' in tree
+    assert '/b/y' in tree
+    assert ['/a', '/a/x', '/a/y', '/b', '/b/x', '/b/y'] == tree.list_all()
+
+
+def test_shared_leaf_validation():
+    leaf = Leaf(value=1, valid_value_types=int)
+    tree1 = Tree(children={'/a': leaf})
+    tree2 = Tree(children={'/b': leaf})
+    assert tree1.is_valid(incremental=True)
+    assert tree2.is_valid(incremental=True)
+    tree2['/b'] = 'x'
+    assert ['/a'] == tree1.find_invalids(incremental=True)
+    assert ['/b'] == tree2.find_invalids(incremental=True)
+
+
+def test_shared_subtree_moved():
+    other = Tree(children={'/c': Leaf(value=1, valid_value_types=int)})
+    assert other.is_valid(incremental=True)
+    tree = Tree(children={'/old/a': Leaf(value=1)})
+    subtree = tree['/old/']
+    tree['/new'] = subtree
+    del tree['/old']
+    assert subtree._others is None
+    tree['/new/b'] = Leaf(value=2)
+    assert other._index is not None
+    assert other._validation is not None
+    assert ['/new', '/new/a', '/new/b'] == tree.list_all()
+
+
+def test_shared_changes_only_where_shared():
+    other = Tree(children={'/c': Leaf(value=1, valid_value_types=int)})
+    assert other.is_valid(incremental=True)
+    leaf = other['/c/']
+    assert '/c' == leaf.path
+    cache = leaf._path_cache
+    tree1 = Tree(children={'/a/b': Leaf(value=1)})
+    tree2 = Tree()
+    tree2['/x'] = tree1['/a/']
+    assert ['/a', '/a/b'] == tree1.list_all()
+    tree2['/x/d'] = Leaf(value=2)
+    tree1['/a/b'] = 3
+    assert other._index is not None
+    assert other._validation is not None
+    assert cache is leaf._path_cache
+    assert ['/a', '/a/b', '/a/d'] == tree1.list_all()
+    assert ['/x', '/x/b', '/x/d'] == tree2.list_all()
+
+
+def test_shared_parent_gone():
+    tree = Tree(children={'/a/b': Leaf(value=1)})
+    subtree = tree['/a/']
+    other = Tree()
+    other['/x'] = subtree
+    del other
+    assert tree is subtree.root
+    assert '/a/b' == subtree['/b/'].path
+    subtree['/c'] = Leaf(value=2)
+    assert ['/a', '/a/b', '/a/c'] == tree.list_all()
+
+
+def test_copy_subtree_detached():
+    tree = Tree(children={'/a/b/c': Leaf(value=1)})
+    tree.list_all()
+    for subtree in (copy.deepcopy(tree['/a/']),
+                    pickle.loads(pickle.dumps(tree['/a/']))):
+        assert subtree is subtree.root
+        assert '/b/c' == subtree['/b/c/'].path
+        subtree['/b/d'] = Leaf(value=2)
+        assert '/a/b/d' not in tree
+        assert ['/a', '/a/b', '/a/b/c'] == tree.list_all()
+
+
+
+# Test iter_prefix
+
+def test_iter_prefix():
+    tree = Tree(children=random_path_leaves)
+    assert tree.list_all() == list(tree.iter_prefix())
+    assert tree.list_all(tp='leaf') == list(tree.iter_prefix(tp='leaf'))
+    for path in tree.list_all(tp='tree'):
+        expected = [k for k in tree.list_all()
+                    if k.startswith(path + '/')]
+        assert expected == list(tree.iter_prefix(path))
+
+
+def test_iter_prefix_range_limit():
+    tree = Tree(children=dict([('/a/' + str(i), Leaf(value=i))
+                               for i in range(1000, 2000)]
+                              + [('/b', Leaf(value=0))]))
+    assert ['/a/1500', '/a/1501'] == list(
+        tree.iter_prefix('/a', start='/a/15', stop='/a/1502'))
+    assert ['/a/1000', '/a/1001', '/a/1002'] == list(
+        tree.iter_prefix('/a', limit=3))
+    assert 1000 == len(list(tree.iter_prefix('/a/')))
+    assert [] == list(tree.iter_prefix('/c'))
+
+
+def test_iter_prefix_subtree_mutation():
+    tree = Tree(children=dict(('/a/b/' + str(i), Leaf(value=i))
+                              for i in range(1000, 1600)))
+    subtree = tree['/a/']
+    assert subtree.list_all() == list(subtree.iter_prefix())
+    paths = []
+    for i, path in enumerate(subtree.iter_prefix('/b')):
+        paths.append(path)
+        if i == 300:
+            del tree['/a/b/1000']
+            tree['/a/b/1599a'] = Leaf(value=0)
+    assert 601 == len(paths)
+    assert '/b/1599a' == paths[-1]
+    assert paths == sorted(paths)
+    assert subtree.list_all() == list(subtree.iter_prefix())
+
+
+def test_iter_prefix_reparent():
+    tree = Tree(children=dict(('/b/' + str(i), Leaf(value=i))
+                              for i in range(1000, 1600)))
+    expected = tree.list_all()
+    other = Tree()
+    paths = []
+    for i, path in enumerate(tree.iter_prefix()):
+        paths.append(path)
+        if i == 300:
+            other['/x/y'] = tree
+        elif i == 500:
+            del other['/x/y']
+    assert expected == paths
+
+
+@raises(KeyError)
+def test_iter_prefix_invalid_prefix():
+    tree = Tree(children=random_path_leaves)
+    tree.iter_prefix(1)
+
+
+@raises(ValueError)
+def test_iter_prefix_invalid_tp():
+    tree = Tree(children=random_path_leaves)
+    tree.iter_prefix(tp='a')
+
+
+# Test copy policies
+
+def test_copy_policy_inherited():
+    x = [1, 2]
+    tree = Tree(children={'/a/b': Leaf(value=x),
+                          '/c': Leaf(value=x, copy_policy='deep')},
+                copy_policy='none')
+    assert tree['/a/b'] is tree['/a/b']
+    assert tree['/c'] is not tree['/c']
+    tree['/a/'].copy_policy = 'shallow'
+    assert tree['/a/b'] is not tree['/a/b']
+    assert tree.get_values(form='nested')['a']['b'] is not tree['/a/b/']._value
+    tree.copy_policy = None
+    assert tree['/c'] is not tree['/c']
+    tree['/a/'].copy_policy = None
+    assert tree['/a/b'] is not tree['/a/b']
+
+
+def test_copy_policy_cached():
+    x = [1, 2]
+    tree = Tree(children={'/a/b/c': Leaf(value=x)}, copy_policy='none')
+    leaf = tree['/a/b/c/']
+    assert leaf.value is leaf.value
+    assert 'none' == leaf._path_cache[4]
+    tree['/a/b/'].copy_policy = 'shallow'
+    assert leaf.value is not leaf.value
+    tree['/a/b/'].copy_policy = None
+    assert leaf.value is leaf.value
+    tree2 = Tree(copy_policy='shallow')
+    tree2['/d'] = tree['/a/']
+    assert leaf.value is not leaf.value
+    del tree2['/d/b/c']
+    leaf.value = x
+    assert leaf.value is not x
+
+
+def test_copy_policy_walkers():
+    x = [1, 2]
+    tree = Tree(children={'/a/b': Leaf(value=x)}, copy_policy='none')
+    tree['/a/b/'].value = x
+    assert x is tree.get_values(form='nested')['a']['b']
+    assert x is tree.get_values(form='paths')['/a/b']
+    assert ([], [], []) == tree.diff(copy.deepcopy(tree))
+
+
+@raises(TypeError)
+def test_copy_policy_invalid():
+    Tree(copy_policy=1)
+
+
+def test_diff_numpy_arrays():
+    if numpy is None:
+        raise SkipTest('numpy is not available.')
+    tree1 = Tree(children={'/a': Leaf(value=numpy.arange(10)),
+                           '/b': Leaf(value=numpy.arange(10))})
+    tree2 = copy.deepcopy(tree1)
+    tree2['/b'] = numpy.arange(1, 11)
+    assert (['/b'], [], []) == tree1.diff(tree2)
+    assert numpy.array_equal(numpy.arange(10),
+                             tree1.get_values(form='nested')['a'])
+
+
+def test_copy_policy_freeze():
+    tree = Tree(children={'/a/b': Leaf(value=[1, 2])},
+                copy_policy='freeze')
+    tree['/a/b'] = [3, 4]
+    assert tree['/a/b'] is tree['/a/b']
+    assert (3, 4) == tree.get_values(form='nested')['a']['b']
+    assert tree['/a/b'] is tree.get_values(form='paths')['/a/b']
+    tree2 = copy.deepcopy(tree)
+    assert ([], [], []) == tree.diff(tree2)
+
+
+def test_slots():
+    tree = Tree(children={'/a/b': Leaf(value=1)})
+    assert not hasattr(tree, '__dict__')
+    assert tree._extra_parameters is None
+    assert 0 == tree.extra_parameters_len()
+    tree.extra_parameters_setitem('x', 1)
+    assert 1 == tree.extra_parameters_getitem('x')
+    tree2 = pickle.loads(pickle.dumps(tree))
+    assert 1 == tree2.extra_parameters_getitem('x')
+    assert 1 == tree2['/a/b']
+    assert tree2['/a/b/']._extra_parameters is None
+    assert not hasattr(tree.view('/a'), '__dict__')
+    assert not hasattr(tree.handle('/a/b'), '__dict__')
+
+
+# Test clone, copy, and deepcopy
+
+def test_clone():
+    tree = Tree(children=random_path_leaves)
+    tree['/a/b'] = Leaf(value=[1, 2], allowed_values=([1, 2], [3]),
+                        x={'y': 1})
+    for tree2 in (tree.clone(), copy.deepcopy(tree)):
+        assert tree2 is tree2.root
+        assert tree.list_all() == tree2.list_all()
+        assert list(tree) == list(tree2)
+        assert ([], [], []) == tree.diff(tree2)
+        leaf = tree['/a/b/']
+        leaf2 = tree2['/a/b/']
+        assert '/a/b' == leaf2.path
+        assert leaf2._allowed_values is leaf._allowed_values
+        assert leaf2._value is not leaf._value
+        assert leaf2['x'] is not leaf['x']
+        tree2['/a/c'] = Leaf(value=1)
+        assert '/a/c' not in tree
+
+
+def test_clone_shallow():
+    tree = Tree(children={'/a/b': Leaf(value=[1, 2], x={'y': 1})})
+    for tree2 in (tree.clone(deep=False), copy.copy(tree)):
+        assert tree['/a/b/'] is not tree2['/a/b/']
+        assert tree['/a/b/']._value is tree2['/a/b/']._value
+        assert tree['/a/b/']['x'] is tree2['/a/b/']['x']
+        assert '/a/b' == tree['/a/b/'].path
+
+
+def test_clone_subtree_shared_leaf():
+    leaf = Leaf(value=1)
+    tree = Tree(children={'/a/b/c': leaf, '/a/d': leaf})
+    tree2 = tree['/a/'].clone()
+    assert tree2 is tree2.root
+    assert tree2['/b/c/'] is tree2['/d/']
+    assert tree2['/b/c/'] is not leaf
+
+
+# Test snapshots
+
+def test_snapshot():
+    tree = Tree(children={'/a/b': Leaf(value=[1]), '/a/c': Leaf(value=2),
+                          '/d': Leaf(value=3, x=1)})
+    values = tree.get_values()
+    paths = tree.list_all()
+    snap = tree.snapshot()
+    tree['/a/b'] = [4]
+    tree['/d/'].allowed_values = (5,)
+    tree['/d/x'] = 2
+    del tree['/a/c']
+    tree['/a/e/f'] = Leaf(value=6)
+    snap2 = tree.snapshot()
+    tree['/a/b'] = [7]
+    del tree['/a/']
+    assert values == snap.get_values()
+    assert paths == snap.list_all()
+    assert [1] == snap['/a/b']
+    assert 1 == snap['/d/x']
+    assert snap['/d/'].allowed_values is None
+    assert '/a/c' in snap and '/a/e' not in snap
+    assert ['b', 'c'] == snap['/a']
+    assert {'b': [1], 'c': 2} == snap['/a/'].get_values(form='nested')
+    assert [4] == snap2['/a/b']
+    assert 6 == snap2['/a/e/f']
+    assert ['/d'] == tree.list_all()
+    assert ([], [], []) == snap.to_tree().diff(
+        Tree(children={'/a/b': Leaf(value=[1]), '/a/c': Leaf(value=2),
+                       '/d': Leaf(value=3)}))
+
+
+def test_snapshot_values_copied():
+    tree = Tree(children={'/a': Leaf(value=[1])})
+    snap = tree.snapshot()
+    snap['/a'].append(2)
+    assert [1] == snap['/a']
+    assert [1] == snap.get('/a')
+    assert snap.get('/b') is None
+
+
+def test_snapshot_history_freed():
+    tree = Tree(children={'/a': Leaf(value=1)})
+    snap = tree.snapshot()
+    tree['/a'] = 2
+    assert tree['/a/']._history is not None
+    assert 1 == snap['/a']
+    del snap
+    tree['/a'] = 3
+    assert tree['/a/']._history is None
+    tree['/b'] = Leaf(value=4)
+    assert tree._history is None
+
+
+def test_snapshot_other_tree_no_history():
+    tree = Tree(children={'/a': Leaf(value=1)})
+    other = Tree(children={'/a': Leaf(value=1)})
+    snap = other.snapshot()
+    tree['/a'] = 2
+    tree['/b'] = Leaf(value=3)
+    assert tree['/a/']._history is None
+    assert tree._history is None
+    assert 1 == snap['/a']
+
+
+def test_snapshot_extra_parameters():
+    tree = Tree(children={'/a': Leaf(value=1)}, x=1)
+    snap = tree.snapshot()
+    tree.extra_parameters_setitem('x', 2)
+    tree.extra_parameters_setitem('y', 3)
+    assert 1 == snap.to_tree().extra_parameters_getitem('x')
+    assert not snap.to_tree().extra_parameters_contains('y')
+    tree.restore(snap)
+    assert 1 == tree.extra_parameters_getitem('x')
+    assert not tree.extra_parameters_contains('y')
+
+
+def test_snapshot_moved_out():
+    tree = Tree(children={'/a/b': Leaf(value=1)})
+    snap = tree.snapshot()
+    other = Tree()
+    other['/c'] = tree['/a/']
+    del tree['/a']
+    other['/c/b'] = 2
+    other['/c/d'] = Leaf(value=3)
+    assert 1 == snap['/a/b']
+    assert ['/a', '/a/b'] == snap.list_all()
+
+
+def test_snapshot_moved_in():
+    sub = Tree(children={'/b': Leaf(value=1)})
+    snap = sub.snapshot()
+    tree = Tree()
+    tree['/a'] = sub
+    sub['/b'] = 2
+    assert 1 == snap['/b']
+
+
+def test_restore():
+    tree = Tree(children={'/a/b': Leaf(value=1)})
+    snap = tree.snapshot()
+    tree['/a/b'] = 2
+    tree['/c'] = Leaf(value=3)
+    handle = tree.handle('/a/b')
+    tree.restore(snap)
+    assert ['/a', '/a/b'] == tree.list_all()
+    assert 1 == tree['/a/b']
+    assert '/a/b' == tree['/a/b/'].path
+    assert_stale = False
+    try:
+        handle.get()
+    except KeyError:
+        assert_stale = True
+    assert assert_stale
+
+
+@raises(TypeError)
+def test_restore_invalid():
+    tree = Tree()
+    tree.restore(Tree())
+
+
+# Test CompactTree.
+
+def make_compact_source():
+    spec = LeafSpec(valid_value_types=int)
+    return Tree(children={
+        '/a': Leaf(value=1, spec=spec), '/b': Leaf(value=2.5, x=[1]),
+        '/c/d': Leaf(value=True), '/c/e': Leaf(value=[1, 2]),
+        '/c/f': Leaf(value=2**70), '/c/g': Leaf(value=-3, spec=spec),
+        '/h': Leaf(value=(1, [2]), copy_policy='freeze'), '/i/': Tree()},
+        y=3)
+
+
+def check_compact(tree, compact):
+    assert tree.list_all() == compact.list_all()
+    assert tree.list_all(tp='leaf') == compact.list_all(tp='leaf')
+    assert tree.list_all(tp='tree') == compact.list_all(tp='tree')
+    assert tree.get_values() == compact.get_values()
+    assert tree.get_values(form='nested') \
+        == compact.get_values(form='nested')
+    assert list(tree) == list(compact)
+    for k in tree.list_all():
+        assert tree[k] == compact[k]
+    assert [1] == compact['/b/x']
+    assert '/c/d' in compact and '/b/x' in compact
+    assert '/q' not in compact and '/a/q' not in compact
+
+
+def test_compact():
+    tree = make_compact_source()
+    compact = tree.compact()
+    check_compact(tree, compact)
+    assert type(compact['/c/f']) is int
+    assert type(compact['/c/d']) is bool
+    compact['/c/e'].append(3)
+    assert [1, 2] == compact['/c/e']
+    tree['/a'] = 4
+    assert 1 == compact['/a']
+
+
+def test_compact_without_numpy():
+    original = SettingsTree.numpy
+    SettingsTree.numpy = None
+    try:
+        tree = make_compact_source()
+        check_compact(tree, CompactTree(tree))
+    finally:
+        SettingsTree.numpy = original
+
+
+def test_compact_to_tree():
+    tree = make_compact_source()
+    tree2 = CompactTree(tree).to_tree()
+    assert ([], [], []) == tree.diff(tree2)
+    assert tree2['/a/'].spec is tree['/a/'].spec
+    assert tree2['/a/'].spec is tree2['/c/g/'].spec
+    assert tree2['/h/']._frozen
+    assert 'freeze' == tree2['/h/'].copy_policy
+    assert [1] == tree2['/b/x']
+    assert 3 == tree2.extra_parameters_getitem('y')
+    assert '/c/d' == tree2['/c/d/'].path
+    tree2['/c/z'] = Leaf(value=1)
+    assert '/c/z' in tree2
+
+
+def test_compact_diff():
+    tree = make_compact_source()
+    tree2 = copy.deepcopy(tree)
+    tree2['/a'] = 5
+    tree2['/c/d'] = False
+    tree2['/c/e'] = [1, 2]
+    tree2['/c/g'] = -3.0
+    del tree2['/b']
+    tree2['/z'] = Leaf(value=1)
+    expected = (['/a', '/c/d'], ['/b'], ['/z'])
+    assert expected == tree.diff(tree2)
+    assert expected == CompactTree(tree).diff(tree2)
+    assert expected == CompactTree(tree).diff(CompactTree(tree2))
+
+
+def test_compact_pickle():
+    tree = make_compact_source()
+    compact = pickle.loads(pickle.dumps(CompactTree(tree)))
+    check_compact(tree, compact)
+
+
+def test_compact_lookup():
+    tree = make_compact_source()
+    for i in range(20):
+        tree['/w/k' + str(i)] = Leaf(value=i)
+    compact = tree.compact()
+    assert 7 == compact['/w/k7'] and 19 == compact['/w/k19']
+    assert '/w/k20' not in compact and '/w/k1/' in compact
+    assert [1] == compact['/b/x'] and '/b/x/' not in compact
+    assert 1 == compact['//c/../a/'].value
+    assert compact._paths is None
+    check_compact(tree, compact)
+
+
+@raises(KeyError)
+def test_compact_lookup_missing():
+    tree = Tree(children=dict([('/k' + str(i), Leaf(value=i))
+                               for i in range(20)]))
+    tree.compact()['/k20']
+
+
+def test_compact_items():
+    tree = make_compact_source()
+    compact = tree.compact()
+    items = compact.items()
+    assert list(tree.keys()) == [k for k, v in items]
+    for k, v in items:
+        assert type(tree[k + '/']) is type(v)
+    assert ([], [], []) == tree['/c/'].diff(dict(items)['c'])
+
+
+def test_compact_find_invalids():
+    tree = make_compact_source()
+    compact = tree.compact()
+    assert [] == compact.find_invalids() and compact.is_valid()
+    tree['/a/'].spec = LeafSpec(valid_value_types=str)
+    tree['/c/e/'].validator_function = lambda x, y: y['/c/f'] > 0
+    tree['/c/g/'].validator_function = lambda x, y: y['/q'] > 0
+    compact = tree.compact()
+    assert tree.find_invalids() == compact.find_invalids()
+    assert ['/a', '/c/g'] == compact.find_invalids(incremental=True)
+    assert not compact.is_valid()
+
+
+@raises(TypeError)
+def test_compact_diff_invalid():
+    CompactTree(Tree()).diff(dict())
+
+
+# Test dedupe.
+
+def make_dedupe_block(i):
+    return Tree(children={
+        '/a': Leaf(value=('x' * 20 + str(i % 1), 1.5),
+                   allowed_values=[1, (2, 3)]),
+        '/b': Leaf(value=[1, 2], note='y' * 20 + str(i % 1)),
+        '/c': Leaf(value={'d': [4]}, copy_policy='freeze'),
+        '/e': Leaf(value=1.0)}, tag=(1, 2))
+
+
+def test_dedupe():
+    tree = Tree()
+    for i in range(3):
+        tree['/r' + str(i) + '/'] = make_dedupe_block(i)
+    tree['/r3/'] = Tree(children={'/a': Leaf(value=1), '/e': Leaf(value=1)})
+    values = tree.get_values()
+    assert tree.dedupe() > 0
+    assert values == tree.get_values()
+    assert tree['/r0/a/']._value is tree['/r2/a/']._value
+    assert tree['/r0/a/'].spec is tree['/r2/a/'].spec
+    assert tree['/r0/b/']._value is not tree['/r2/b/']._value
+    assert tree['/r0/b/']._extra_parameters \
+        is tree['/r2/b/']._extra_parameters
+    assert tree['/r0/c/']._value is tree['/r2/c/']._value
+    assert tree['/r0/']._extra_parameters is tree['/r2/']._extra_parameters
+    assert type(tree['/r3/a']) is int and type(tree['/r3/e']) is int
+    assert type(tree['/r0/e']) is float
+    assert 0 == tree.dedupe()
+
+
+def test_dedupe_copy_on_write():
+    tree = Tree(children={'/a/': make_dedupe_block(0),
+                          '/b/': make_dedupe_block(1)})
+    tree.dedupe()
+    tree['/a/b/note'] = 1
+    tree['/a/'].extra_parameters_setitem('tag', 2)
+    assert 1 == tree['/a/b/note'] and 'y' * 20 + '0' == tree['/b/b/note']
+    del tree['/a/b/note']
+    assert '/a/b/note' not in tree and '/b/b/note' in tree
+    assert 2 == tree['/a/'].extra_parameters_getitem('tag')
+    assert (1, 2) == tree['/b/'].extra_parameters_getitem('tag')
+    tree['/a/a/'].allowed_values = [5]
+    assert (1, (2, 3)) == tree['/b/a/'].allowed_values
+    tree2 = pickle.loads(pickle.dumps(tree))
+    assert dict == type(tree2['/b/']._extra_parameters)
+    assert ([], [], []) == tree.diff(tree2)
+
+
+def test_dedupe_names():
+    tree = Tree(children={'/a/': Tree(), '/b/': Tree()})
+    tree['/a/'][''.join(['na', 'me'])] = Leaf(value=1)
+    tree['/b/'][''.join(['na', 'me'])] = Leaf(value=2)
+    tree.dedupe()
+    name_a = list(tree['/a/'].keys())[0]
+    name_b = list(tree['/b/'].keys())[0]
+    assert name_a is name_b
+    assert name_a is tree['/b/name/']._name
+    assert '/b/name' == tree['/b/name/'].path
+
+
+def make_dedupe_tree():
+    tree = Tree()
+    for i in range(3):
+        tree['/s' + str(i) + '/db/port'] = Leaf(value=5432,
+                                                valid_value_types=(int, ))
+        tree['/s' + str(i) + '/name'] = Leaf(value='n')
+    return tree
+
+
+def test_dedupe_subtrees():
+    tree = make_dedupe_tree()
+    tree['/s2/name'] = 'm'
+    values = tree.get_values()
+    assert tree.dedupe() > 0
+    assert values == tree.get_values()
+    assert tree._children['s0'] is tree._children['s1']
+    assert tree._children['s0'] is not tree._children['s2']
+    assert tree._children['s0']._children['db'] \
+        is tree._children['s2']._children['db']
+    assert tree.is_valid()
+    assert ['/s2/db/port'] == tree.glob('/s2/db/*')
+    assert 0 == tree.dedupe()
+
+
+def test_dedupe_subtrees_write():
+    tree = make_dedupe_tree()
+    tree.dedupe()
+    tree['/s1/db/port'] = 1
+    assert [5432, 1, 5432] == [tree['/s' + str(i) + '/db/port']
+                               for i in range(3)]
+    assert tree._children['s0'] is tree._children['s2']
+    assert tree._children['s0']._children['db'] \
+        is not tree._children['s1']._children['db']
+    del tree['/s2/name']
+    assert '/s2/name' not in tree and '/s0/name' in tree
+    tree.set_many({'/s0/db/port': 2})
+    tree.set_values({'s2': {'db': {'port': 3}}})
+    assert [2, 1, 3] == [tree['/s' + str(i) + '/db/port']
+                         for i in range(3)]
+    tree['/s0/db/port'] = 'x'
+    assert ['/s0/db/port'] == tree.find_invalids()
+
+
+def test_dedupe_subtrees_nodes():
+    tree = make_dedupe_tree()
+    tree.dedupe()
+    tree.find_invalids(incremental=True)
+    leaf = tree['/s1/db/port/']
+    leaf.value = 1
+    tree.handle('/s2/db/port').set(2)
+    tree.view('/s0')['name'] = 'v'
+    assert [5432, 1, 2] == [tree['/s' + str(i) + '/db/port']
+                            for i in range(3)]
+    assert ['v', 'n', 'n'] == [tree['/s' + str(i) + '/name']
+                               for i in range(3)]
+    assert [] == tree.find_invalids(incremental=True)
+
+
+@raises(TypeError)
+def test_dedupe_subtrees_leaf_immutable():
+    tree = make_dedupe_tree()
+    tree.dedupe()
+    dict(tree._children['s0'].items())['name'].value = 'x'
+
+
+@raises(TypeError)
+def test_dedupe_subtrees_tree_immutable():
+    tree = make_dedupe_tree()
+    tree.dedupe()
+    tree._children['s0']['other'] = Leaf(value=1)
+
+
+def test_dedupe_subtrees_copy():
+    tree = make_dedupe_tree()
+    tree.dedupe()
+    for tree2 in (pickle.loads(pickle.dumps(tree)), copy.deepcopy(tree)):
+        assert tree2._children['s0'] is tree2._children['s2']
+        tree2['/s0/db/port'] = 1
+        assert [1, 5432, 5432] == [tree2['/s' + str(i) + '/db/port']
+                                   for i in range(3)]
+    assert [5432] * 3 == [tree['/s' + str(i) + '/db/port']
+                          for i in range(3)]
+
+
+# Test memory_usage.
+
+def test_memory_usage():
+    tree = Tree(children={'/a': Leaf(value=[1, 2, 3]),
+                          '/b/c': Leaf(value='x' * 100,
+                                       allowed_values=['y' * 100]),
+                          '/b/d/e': Leaf(value=1.5, note='z' * 50)},
+                tag=3)
+    usage = tree.memory_usage()
+    assert usage.total == usage.nodes + usage.values \
+        + usage.constraints + usage.extra_parameters
+    assert 3 == usage.leaves and 3 == usage.trees
+    assert {list: 1, str: 1, float: 1} == usage.value_types
+    assert set(['/', '/b', '/b/d']) == set(usage.subtrees)
+    assert usage.total == usage.subtrees['/']
+    assert usage.subtrees['/b'] > usage.subtrees['/b/d'] > 0
+    assert usage.values >= sys.getsizeof([1, 2, 3]) \
+        + sys.getsizeof('x' * 100) + sys.getsizeof(1.5)
+    assert usage.constraints > sys.getsizeof('y' * 100)
+    assert usage.extra_parameters > sys.getsizeof('z' * 50)
+    assert tree.memory_usage(deep=False).values < usage.values
+    assert usage.total == tree.memory_usage().total
+
+
+def test_memory_usage_shared():
+    spec = LeafSpec(allowed_values=['y' * 1000])
+    size = sys.getsizeof(''.join(['x'] * 1000))
+    one = Tree(children={'/a': Leaf(value=''.join(['x'] * 1000),
+                                    spec=spec)})
+    tree = Tree(children=dict([('/a' + str(i),
+                                Leaf(value=''.join(['x'] * 1000),
+                                     spec=spec))
+                               for i in range(10)]))
+    assert one.memory_usage().constraints \
+        == tree.memory_usage().constraints
+    assert 10 * size == tree.memory_usage().values
+    tree.dedupe()
+    assert size == tree.memory_usage().values
+
+
+def test_constraints_shared():
+    values = [1, 2]
+    leaves = [Leaf(value=1, valid_value_types=int, allowed_values=values,
+                   validators=[('Between', (0, 10))]) for i in range(3)]
+    assert leaves[0].spec is leaves[1].spec is leaves[2].spec
+    values.append(3)
+    leaf = Leaf(value=3, valid_value_types=int, allowed_values=values)
+    assert (1, 2, 3) == leaf.allowed_values and leaf.is_valid({})
+    assert (1, 2) == leaves[0].allowed_values
+    assert (True, ) == Leaf(allowed_values=[True]).allowed_values
+    assert (1, ) == Leaf(allowed_values=[1]).allowed_values
+    assert type(Leaf(allowed_values=[1]).allowed_values[0]) is int
+    leaf = Leaf(value=[1], allowed_values=[[1]])
+    assert leaf.is_valid({}) and ([1], ) == leaf.allowed_values
+    spec = LeafSpec(forbidden_values=[0])
+    leaf = Leaf(value=1, spec=spec, valid_value_types=int)
+    assert (0, ) == leaf.forbidden_values
+    assert leaf.spec is not Leaf(value=1, valid_value_types=int).spec
+
+
+def test_memory_usage_numpy():
+    if numpy is None:
+        raise SkipTest('numpy is not available.')
+    tree = Tree(children={'/a': Leaf(value=numpy.zeros(1000))})
+    usage = tree.memory_usage()
+    assert usage.values >= 8000
+    assert {numpy.ndarray: 1} == usage.value_types
+    assert usage.values == tree.memory_usage(deep=False).values
+
 # Test diff
 
 def test_diff_identical():
@@ -800,6 +2080,115 @@ def test_validity_differentNumbersOfInvalids():
         assert (i != 0) != tree.is_valid()
 
 
+def test_validity_all_settings():
+    seen = []
+
+    def check(x, y):
+        seen.append((len(y), sorted(y), '/a/x' in y, '/a' in y,
+                     'a/x' in y, y.get('/a/x'), y.get('/a'), dict(y)))
+        y['/a/x'].append(2)
+        return True
+
+    tree = Tree(children={'/a/x': Leaf(value=[1]),
+                          '/b/f': Leaf(value=2, validator_function=check)})
+    assert tree.is_valid()
+    assert [(2, ['/a/x', '/b/f'], True, False, False, [1], None,
+             {'/a/x': [1], '/b/f': 2})] == seen
+    assert [1] == tree['/a/x']
+    assert not tree['/b/'].is_valid()
+    assert (1, ['/f'], False, False, False, None, None, {'/f': 2}) \
+        == seen[-1]
+
+
+def test_validity_incremental():
+    tree = Tree(children={'/a/x': Leaf(value=1, valid_value_types=int),
+                          '/a/y': Leaf(value='s', valid_value_types=int),
+                          '/b/z': Leaf(value=3, allowed_values=(1, 2))})
+    assert ['/a/y', '/b/z'] == tree.find_invalids(incremental=True)
+    assert not tree.is_valid(incremental=True)
+    tree['/a/y'] = 2
+    leaf = tree['/b/z/']
+    leaf.value = 2
+    assert tree.is_valid(incremental=True)
+    leaf.allowed_values = (1, )
+    tree['/a/x'] = 'q'
+    assert ['/a/x', '/b/z'] == tree.find_invalids(incremental=True)
+    assert tree.find_invalids() == tree.find_invalids(incremental=True)
+
+
+def test_validity_incremental_structure():
+    tree = Tree(children={'/a/x': Leaf(value='s', valid_value_types=int)})
+    assert ['/a/x'] == tree.find_invalids(incremental=True)
+    tree['/b'] = Tree(children={'c': Leaf(value=1.0,
+                                          valid_value_types=int)})
+    assert ['/a/x', '/b/c'] == tree.find_invalids(incremental=True)
+    subtree = tree['/a/']
+    del tree['/a']
+    assert ['/b/c'] == tree.find_invalids(incremental=True)
+    tree['/b/d'] = subtree
+    subtree['x'] = 2
+    assert ['/b/c'] == tree.find_invalids(incremental=True)
+    subtree['x'] = 'q'
+    assert ['/b/c', '/b/d/x'] == tree.find_invalids(incremental=True)
+    assert not subtree.is_valid(incremental=True)
+    assert tree.find_invalids() == tree.find_invalids(incremental=True)
+
+
+def test_validity_incremental_functions():
+    tree = Tree(children={'/global/max': Leaf(value=10),
+                          '/port': Leaf(value=8, validator_function=lambda
+                                        x, y: x <= y['/global/max'])})
+    view = tree.view('/global')
+    assert tree.is_valid(incremental=True)
+    tree['/global/max'] = 5
+    assert ['/port'] == tree.find_invalids(incremental=True)
+    assert [] == view.find_invalids(incremental=True)
+    tree['/port/'].validator_function = None
+    assert tree.is_valid(incremental=True)
+    assert copy.deepcopy(tree).is_valid(incremental=True)
+
+
+def test_validity_incremental_depends_on():
+    calls = []
+
+    def at_most(x, y):
+        calls.append(x)
+        return x <= y['/global/max']
+
+    def in_range(x, y):
+        calls.append(x)
+        return all([x > y[k] for k in y if k.startswith('/low/')])
+
+    tree = Tree(children={'/global/max': Leaf(value=10),
+                          '/global/other': Leaf(value=0),
+                          '/low/a': Leaf(value=1),
+                          '/port': Leaf(value=8, validator_function=at_most,
+                                        depends_on='/global/max'),
+                          '/high': Leaf(value=5, validator_function=in_range,
+                                        depends_on='/low/*')})
+    assert tree.is_valid(incremental=True)
+    assert 2 == len(calls)
+    tree['/global/other'] = 20
+    assert tree.is_valid(incremental=True)
+    assert 2 == len(calls)
+    tree['/global/max'] = 5
+    assert ['/port'] == tree.find_invalids(incremental=True)
+    assert [8] == calls[2:]
+    tree['/low/b'] = Leaf(value=6)
+    assert ['/high', '/port'] == tree.find_invalids(incremental=True)
+    assert [5] == calls[3:]
+    del tree['/low/b']
+    del tree['/global/max']
+    assert ['/port'] == tree.find_invalids(incremental=True)
+    assert 6 == len(calls)
+    tree['/port/'].depends_on = None
+    tree['/global/max'] = Leaf(value=9)
+    assert tree.is_valid(incremental=True)
+    assert tree.is_valid(incremental=True)
+    assert 8 == len(calls)
+    assert tree.find_invalids() == tree.find_invalids(incremental=True)
+
+
 # Do tests on the Tree's extra parameters abilities.
 
 def test_extra_parameters_contains():